@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+# benchmark.py — rendimiento del scraper contra fixture_server.py (sin tocar discogs.com)
+#
+#   python benchmark.py --target enrich --releases 500 --latency-ms 50
+#   python benchmark.py --target crawl --pages 4 --output bench.json --baseline bench_prev.json
+#
+# "enrich": solo enriquecimiento (ruta HTTP/API, sin navegador) sobre N releases.
+# "crawl": scrape_music_site completo (Playwright) contra el servidor local.
+# Informa docs/s, p50/p99 por etapa y pico de RSS; con --baseline compara docs/s y
+# termina con código 1 si empeora más de --max-regression.
+
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+
+from fixture_server import (FixtureServer, FIRST_RELEASE_ID, LATENCY_MS, JITTER_MS, RATE_429,
+                            synthetic_release)
+from crawl_metrics import METRICS, peak_rss_mb
+
+# ------------------ CONFIG ------------------
+BENCH_RELEASES = 500
+BENCH_PAGES = 4
+BENCH_OUTPUT = "bench_results.json"
+MAX_REGRESSION = 0.10          # caída de docs/s tolerada frente a --baseline
+# --------------------------------------------
+
+
+def _import_scraper(server_url):
+    # las URLs de Discogs se leen del entorno al importar: apuntarlas al servidor antes
+    os.environ["DISCOGS_BASE_URL"] = server_url
+    os.environ["DISCOGS_API_URL"] = server_url
+    import scrape_music_rag
+    return scrape_music_rag
+
+
+async def bench_enrich(smr, server_url, n_releases, mode, concurrency, api_workers, rate_limit):
+    # tarjetas como las de la búsqueda (título y artista), enriquecidas sin navegador
+    cards = []
+    for i in range(n_releases):
+        r = synthetic_release(FIRST_RELEASE_ID + i, server_url)
+        cards.append((i, r["title"], r["artists"][0]["name"], f"{server_url}/release/{r['id']}"))
+    limiter = smr.RateLimiter() if rate_limit else None
+    retry = smr.RetryPolicy()
+    session = smr.DiscogsSession(max_connections=concurrency + api_workers, limiter=limiter, retry=retry)
+    api = smr.DiscogsApiClient(session, base_url=server_url)
+    fast = smr.ReleaseFastPath(session, smr.USER_AGENT)
+    rt = smr.CrawlRuntime(None, None, None, smr.DETAIL_EXTRACTION, fast, api)
+    try:
+        if mode == "api":
+            records = await smr.enrich_cards_via_api(rt, api, 0, cards, api_workers)
+        else:
+            sem = asyncio.Semaphore(concurrency)
+
+            async def one(card):
+                async with sem:
+                    return await smr.enrich_card(rt, 0, card)
+
+            records = await asyncio.gather(*[one(c) for c in cards])
+    finally:
+        await session.aclose()
+    return [r for r in records if r], {"http": session.summary(), "retry": retry.summary(),
+                                       "path": rt.path_summary()}
+
+
+def bench_crawl(smr, pages, concurrency, enrich_mode, pagination, rate_limit):
+    docs = smr.scrape_music_site(max_pages=pages, concurrency=concurrency, enrich_mode=enrich_mode,
+                                 pagination=pagination, rate_limit=rate_limit,
+                                 http_cache=False, checkpoint=False)
+    return docs, {}
+
+
+def compare(result, baseline_path, max_regression):
+    with open(baseline_path, "r", encoding="utf-8") as f:
+        base = json.load(f)
+    before, after = base.get("docs_per_s") or 0, result["docs_per_s"]
+    change = (after - before) / before if before else 0.0
+    print(f"📈 docs/s: {before} -> {after} ({change:+.1%})")
+    for stage, st in result["stages"].items():
+        old = base.get("stages", {}).get(stage)
+        if old:
+            print(f"   {stage}: p50 {old['p50_ms']} -> {st['p50_ms']} ms, p99 {old['p99_ms']} -> {st['p99_ms']} ms")
+    return change >= -max_regression
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark del scraper contra el servidor de fixtures")
+    parser.add_argument("--target", choices=["enrich", "crawl"], default="enrich")
+    parser.add_argument("--releases", type=int, default=BENCH_RELEASES, help="releases a enriquecer (target enrich)")
+    parser.add_argument("--pages", type=int, default=BENCH_PAGES, help="páginas de búsqueda (target crawl)")
+    parser.add_argument("--enrich-mode", choices=["detail", "api"], default="detail")
+    parser.add_argument("--pagination", choices=["sequential", "parallel"], default="sequential")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--api-workers", type=int, default=8)
+    parser.add_argument("--rate-limit", action=argparse.BooleanOptionalAction, default=False,
+                        help="aplicar el limitador por host (por defecto no: se mide el scraper)")
+    parser.add_argument("--latency-ms", type=float, default=LATENCY_MS)
+    parser.add_argument("--jitter-ms", type=float, default=JITTER_MS)
+    parser.add_argument("--rate-429", type=float, default=RATE_429)
+    parser.add_argument("--fixtures-dir", default=None, help="grabaciones a servir (por defecto, solo sintético)")
+    parser.add_argument("--output", default=BENCH_OUTPUT, help="resultado en JSON")
+    parser.add_argument("--baseline", help="resultado anterior con el que comparar")
+    parser.add_argument("--max-regression", type=float, default=MAX_REGRESSION)
+    args = parser.parse_args(argv)
+
+    server = FixtureServer(port=0, latency_ms=args.latency_ms, jitter_ms=args.jitter_ms,
+                           rate_429=args.rate_429, fixtures_dir=args.fixtures_dir,
+                           n_releases=max(args.releases, args.pages * 50)).start()
+    print(f"🧪 Fixtures en {server.url} (latencia {args.latency_ms}±{args.jitter_ms} ms, 429 {args.rate_429:.0%})")
+    try:
+        smr = _import_scraper(server.url)
+        t0 = time.perf_counter()
+        if args.target == "enrich":
+            docs, extra = asyncio.run(bench_enrich(smr, server.url, args.releases, args.enrich_mode,
+                                                   args.concurrency, args.api_workers, args.rate_limit))
+        else:
+            docs, extra = bench_crawl(smr, args.pages, args.concurrency, args.enrich_mode,
+                                      args.pagination, args.rate_limit)
+        wall = time.perf_counter() - t0
+    finally:
+        server.stop()
+
+    snap = METRICS.snapshot()
+    result = {
+        "target": args.target, "enrich_mode": args.enrich_mode, "concurrency": args.concurrency,
+        "latency_ms": args.latency_ms, "jitter_ms": args.jitter_ms, "rate_429": args.rate_429,
+        "docs": len(docs), "wall_s": round(wall, 2),
+        "docs_per_s": round(len(docs) / wall, 2) if wall else 0.0,
+        "stages": {k: {m: v[m] for m in ("n", "errors", "p50_ms", "p99_ms", "mean_ms")}
+                   for k, v in snap["stages"].items()},
+        "peak_rss_mb": peak_rss_mb(),
+        "peak_rss_children_mb": peak_rss_mb(children=True),
+        "server": server.summary(),
+        **extra,
+    }
+    print(f"\n🏁 {result['docs']} docs en {result['wall_s']} s -> {result['docs_per_s']} docs/s")
+    for stage, st in result["stages"].items():
+        print(f"   {stage:<20} n={st['n']:<6} p50={st['p50_ms']} ms  p99={st['p99_ms']} ms  errores={st['errors']}")
+    print(f"   pico RSS: {result['peak_rss_mb']} MB (hijos: {result['peak_rss_children_mb']} MB)")
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(result, f, ensure_ascii=False, indent=2)
+    print(f"💾 Resultado en {args.output}")
+
+    if args.baseline and not compare(result, args.baseline, args.max_regression):
+        print(f"❌ Regresión de rendimiento mayor que {args.max_regression:.0%}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
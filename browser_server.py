@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+# browser_server.py — Chromium de larga duración al que se conectan los scrapers
+#
+#   python browser_server.py                       # deja el navegador escuchando
+#   python scrape_music_rag.py --browser-endpoint http://127.0.0.1:9222
+#
+# El navegador usa un contexto persistente (PROFILE_DIR): caché de disco, cookies y
+# sesión sobreviven entre ejecuciones, y cada crawl se ahorra el arranque en frío.
+# La API de Python de Playwright no expone launch_server(); se usa el endpoint CDP
+# de Chromium (--remote-debugging-port) y chromium.connect_over_cdp() en el cliente.
+
+import asyncio
+import argparse
+import json
+import signal
+from pathlib import Path
+
+from playwright.async_api import async_playwright
+
+# ------------------ CONFIG ------------------
+PROFILE_DIR = ".browser-profile"
+CDP_HOST = "127.0.0.1"
+CDP_PORT = 9222
+VIEWPORT = {"width": 1280, "height": 800}
+# --------------------------------------------
+
+
+class BrowserHandle:
+    # navegador + contexto que usa el scraper. Si viene del servidor (`remote`) el
+    # contexto es el persistente compartido: al terminar solo se cierran las pestañas
+    # abiertas en esta ejecución y se desconecta, sin cerrar el navegador.
+    def __init__(self, browser, context, remote=False):
+        self.browser = browser
+        self.context = context
+        self.remote = remote
+        self._initial_pages = set(context.pages) if remote else set()
+
+    async def close(self):
+        if self.remote:
+            for pg in list(self.context.pages):
+                if pg not in self._initial_pages:
+                    try:
+                        await pg.close()
+                    except Exception:
+                        pass
+        await self.browser.close()
+
+
+async def open_browser(p, endpoint=None, headless=True, user_agent=None, viewport=VIEWPORT):
+    # con `endpoint` intenta conectarse al servidor; si no responde, navegador local.
+    # "auto": el endpoint publicado por el servidor con el perfil por defecto
+    if endpoint == "auto":
+        endpoint = read_endpoint()
+    if endpoint:
+        try:
+            browser = await p.chromium.connect_over_cdp(endpoint)
+            if browser.contexts:
+                print(f"🔌 Conectado al navegador persistente en {endpoint}")
+                return BrowserHandle(browser, browser.contexts[0], remote=True)
+            await browser.close()
+            print(f"⚠️ {endpoint} no tiene contexto persistente; se lanza un navegador local.")
+        except Exception as e:
+            print(f"⚠️ No se pudo conectar a {endpoint} ({e}); se lanza un navegador local.")
+    browser = await p.chromium.launch(headless=headless)
+    context = await browser.new_context(user_agent=user_agent, viewport=viewport)
+    return BrowserHandle(browser, context)
+
+
+async def serve(profile_dir=PROFILE_DIR, host=CDP_HOST, port=CDP_PORT, headless=True, user_agent=None):
+    Path(profile_dir).mkdir(parents=True, exist_ok=True)
+    async with async_playwright() as p:
+        context = await p.chromium.launch_persistent_context(
+            profile_dir, headless=headless, user_agent=user_agent, viewport=VIEWPORT,
+            args=[f"--remote-debugging-port={port}", f"--remote-debugging-address={host}"],
+        )
+        endpoint = f"http://{host}:{port}"
+        # para descubrir el endpoint sin configurarlo a mano
+        (Path(profile_dir) / "endpoint.json").write_text(json.dumps({"endpoint": endpoint}), encoding="utf-8")
+        print(f"🌐 Navegador persistente escuchando en {endpoint} (perfil {profile_dir})")
+        print("   Ctrl-C para detenerlo.")
+
+        stop = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            try:
+                loop.add_signal_handler(sig, stop.set)
+            except NotImplementedError:  # Windows
+                pass
+        try:
+            await stop.wait()
+        finally:
+            (Path(profile_dir) / "endpoint.json").unlink(missing_ok=True)
+            await context.close()
+    print("👋 Navegador persistente detenido.")
+
+
+def read_endpoint(profile_dir=PROFILE_DIR):
+    # endpoint publicado por un servidor en marcha con ese perfil (o None)
+    path = Path(profile_dir) / "endpoint.json"
+    if not path.exists():
+        return None
+    return json.loads(path.read_text(encoding="utf-8")).get("endpoint")
+
+
+def main(argv=None):
+    # importado aquí: scrape_music_rag importa este módulo
+    from scrape_music_rag import HEADLESS, USER_AGENT
+
+    parser = argparse.ArgumentParser(description="Navegador Chromium persistente para el scraper")
+    parser.add_argument("--profile-dir", default=PROFILE_DIR, help="directorio del contexto persistente")
+    parser.add_argument("--host", default=CDP_HOST)
+    parser.add_argument("--port", type=int, default=CDP_PORT)
+    parser.add_argument("--headless", action=argparse.BooleanOptionalAction, default=HEADLESS)
+    args = parser.parse_args(argv)
+    asyncio.run(serve(args.profile_dir, args.host, args.port, args.headless, USER_AGENT))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+# corpus_io.py — lectura/escritura del corpus en JSON o JSON Lines (opcionalmente gzip)
+# El formato se deduce de la extensión: .json (array), .jsonl o .jsonl.gz (un
+# documento por línea). JSONL se escribe y se lee en flujo, con memoria constante.
+
+import gzip
+import json
+import os
+from pathlib import Path
+
+# ------------------ CONFIG ------------------
+JSONL_SUFFIXES = (".jsonl", ".jsonl.gz", ".ndjson", ".ndjson.gz")
+GZIP_LEVEL = 6
+# --------------------------------------------
+
+
+def is_jsonl(path):
+    return str(path).lower().endswith(JSONL_SUFFIXES)
+
+
+def open_text(path, mode="r", gz=None):
+    # abre en texto UTF-8, con gzip si el nombre acaba en .gz (o si gz=True)
+    path = str(path)
+    if gz is None:
+        gz = path.lower().endswith(".gz")
+    if gz:
+        return gzip.open(path, mode + "t", encoding="utf-8", compresslevel=GZIP_LEVEL)
+    return open(path, mode, encoding="utf-8")
+
+
+class _AtomicWriter:
+    # se escribe en <path>.part y se renombra al cerrar: un corte no deja un archivo
+    # a medias con el nombre definitivo (el .part sí es legible si es JSONL)
+    def __init__(self, path):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.tmp = self.path.with_name(self.path.name + ".part")
+        self._fh = open_text(self.tmp, "w", gz=self.path.name.lower().endswith(".gz"))
+        self.count = 0
+
+    def flush(self):
+        self._fh.flush()
+
+    def close(self):
+        self._fh.close()
+        os.replace(self.tmp, self.path)
+
+    def abort(self):
+        # sin salida: se descarta el temporal y se conserva el archivo anterior
+        self._fh.close()
+        self.tmp.unlink(missing_ok=True)
+
+
+class JsonArrayWriter(_AtomicWriter):
+    # array JSON escrito documento a documento (compatible con json.load)
+    def __init__(self, path):
+        super().__init__(path)
+        self._fh.write("[")
+
+    def write(self, doc):
+        self._fh.write(",\n" if self.count else "\n")
+        self._fh.write(json.dumps(doc, ensure_ascii=False))
+        self.count += 1
+
+    def close(self):
+        self._fh.write("\n]\n")
+        super().close()
+
+
+class JsonlWriter(_AtomicWriter):
+    # un documento por línea; `flush_every` documentos entre volcados a disco
+    def __init__(self, path, flush_every=None):
+        super().__init__(path)
+        self.flush_every = flush_every
+
+    def write(self, doc):
+        self._fh.write(json.dumps(doc, ensure_ascii=False))
+        self._fh.write("\n")
+        self.count += 1
+        if self.flush_every and self.count % self.flush_every == 0:
+            self.flush()
+
+
+def open_writer(path, flush_every=None):
+    return JsonlWriter(path, flush_every) if is_jsonl(path) else JsonArrayWriter(path)
+
+
+def iter_jsonl(path):
+    with open_text(path, "r") as f:
+        try:
+            for line in f:
+                if not line.strip():
+                    continue
+                try:
+                    yield json.loads(line)
+                except ValueError:
+                    # última línea a medio escribir tras un corte
+                    continue
+        except EOFError:
+            # .gz truncado: se aprovecha lo que se pudo leer
+            return
+
+
+def iter_docs(path):
+    # documentos de un corpus .json o .jsonl(.gz); el array JSON se carga entero
+    if is_jsonl(path):
+        yield from iter_jsonl(path)
+        return
+    with open_text(path, "r") as f:
+        yield from json.load(f)
+
+
+def write_docs(docs, path):
+    writer = open_writer(path)
+    try:
+        for d in docs:
+            writer.write(d)
+    except BaseException:
+        writer.abort()
+        raise
+    writer.close()
+    return writer.count
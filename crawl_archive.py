@@ -0,0 +1,282 @@
+#!/usr/bin/env python3
+# crawl_archive.py — captura de un crawl y reprocesado sin red (record & replay)
+#
+#   python scrape_music_rag.py --max-pages 40 --capture .archive       # graba mientras crawlea
+#   python crawl_archive.py replay --archive .archive --output replay.jsonl --workers 8
+#   python crawl_archive.py stats --archive .archive
+#
+# Formato (inspirado en WARC): index.jsonl con un registro por respuesta (uri, tipo,
+# estado, content-type, digest, tamaño, fecha) y los cuerpos en blobs/<sha[:2]>/<sha>.gz,
+# direccionados por contenido: una misma respuesta capturada dos veces ocupa un blob.
+# El replay repite la extracción de tarjetas y de releases (parsers HTML de
+# discogs_extract, equivalentes a EXTRACT_CARDS_JS / parse_release_page) en varios
+# procesos, a velocidad de disco.
+
+import argparse
+import gzip
+import hashlib
+import json
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+from multiprocessing import get_context
+from pathlib import Path
+from urllib.parse import urlparse
+
+from discogs_extract import (entity_key, parse_search_html, release_meta_from_html, map_release_json,
+                             merge_api_meta, build_record)
+from corpus_io import write_docs
+
+# ------------------ CONFIG ------------------
+ARCHIVE_DIR = ".archive"
+ARCHIVE_LEVEL = 6              # nivel gzip de los blobs
+INDEX_FLUSH_EVERY = 50         # registros entre volcados del índice
+REPLAY_WORKERS = os.cpu_count() or 4
+REPLAY_CHUNK = 64              # trabajos por envío a cada proceso
+REPLAY_OUTPUT = "music_data_replay.jsonl"
+# --------------------------------------------
+
+
+def archive_kind(url):
+    # search | release (HTML) | api (JSON de /releases/ o /masters/) | other
+    path = urlparse(url).path
+    if path.startswith(("/releases/", "/masters/")):
+        return "api"
+    if entity_key(path):
+        return "release"
+    if path.startswith("/search"):
+        return "search"
+    return "other"
+
+
+class CrawlArchive:
+    # escritura desde el bucle asyncio del crawl y desde hilos; lectura sin estado
+    # (los procesos del replay solo necesitan el directorio)
+    def __init__(self, directory=ARCHIVE_DIR):
+        self.dir = Path(directory)
+        self.blobs = self.dir / "blobs"
+        self.index_path = self.dir / "index.jsonl"
+        self._fh = None
+        self._lock = threading.Lock()
+        self._pending = 0
+        self.stats = {"records": 0, "bytes": 0, "blobs_written": 0, "blob_bytes": 0, "deduped": 0}
+
+    def blob_path(self, digest):
+        return self.blobs / digest[:2] / f"{digest}.gz"
+
+    def record(self, url, status, body, content_type="", kind=None, **extra):
+        # `extra`: campos propios del tipo (page para búsquedas, ref para xhr)
+        if isinstance(body, str):
+            body = body.encode("utf-8")
+        digest = hashlib.sha256(body).hexdigest()
+        path = self.blob_path(digest)
+        with self._lock:
+            if self._fh is None:
+                self.dir.mkdir(parents=True, exist_ok=True)
+                self._fh = open(self.index_path, "a", encoding="utf-8")
+            if path.exists():
+                self.stats["deduped"] += 1
+            else:
+                path.parent.mkdir(parents=True, exist_ok=True)
+                data = gzip.compress(body, compresslevel=ARCHIVE_LEVEL)
+                # varios procesos (shards) pueden compartir archivo: temporal por proceso
+                tmp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+                tmp.write_bytes(data)
+                os.replace(tmp, path)
+                self.stats["blobs_written"] += 1
+                self.stats["blob_bytes"] += len(data)
+            rec = {"type": "response", "uri": url, "kind": kind or archive_kind(url), "status": status,
+                   "content_type": content_type or "", "digest": f"sha256:{digest}", "length": len(body),
+                   "date": datetime.now(timezone.utc).isoformat(timespec="seconds")}
+            rec.update(extra)
+            self._fh.write(json.dumps(rec, ensure_ascii=False) + "\n")
+            self.stats["records"] += 1
+            self.stats["bytes"] += len(body)
+            self._pending += 1
+            if self._pending >= INDEX_FLUSH_EVERY:
+                self._fh.flush()
+                self._pending = 0
+
+    async def record_page(self, page, url, kind, status, **extra):
+        # HTML ya renderizado de una pestaña de Playwright, con el estado real de la
+        # navegación (un 404 o 429 no debe reprocesarse como página válida)
+        try:
+            html = await page.content()
+        except Exception as e:
+            print(f"   ⚠️ No se pudo capturar {url}: {e}")
+            return
+        self.record(url, status, html, "text/html", kind, **extra)
+
+    async def record_xhr(self, capture, ref):
+        # respuestas JSON de XhrCapture, asociadas a la página de release que las pidió
+        for r in capture.responses:
+            try:
+                body = await r.body()
+            except Exception:
+                continue
+            self.record(r.url, r.status, body, r.headers.get("content-type", ""), "xhr", ref=ref)
+
+    def close(self):
+        with self._lock:
+            if self._fh is not None:
+                self._fh.close()
+                self._fh = None
+
+    def summary(self):
+        out = dict(self.stats)
+        out["ratio"] = round(out["blob_bytes"] / out["bytes"], 3) if out["bytes"] else 0.0
+        return out
+
+    # ---------- LECTURA ----------
+    def iter_records(self):
+        if not self.index_path.exists():
+            return
+        with open(self.index_path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    yield json.loads(line)
+                except ValueError:
+                    # línea a medio escribir tras un corte
+                    continue
+
+    def read_body(self, digest):
+        digest = digest.split(":", 1)[-1]
+        return gzip.decompress(self.blob_path(digest).read_bytes())
+
+
+# ---------- REPLAY ----------
+def _replay_search(job):
+    archive_dir, page_idx, url, digest = job
+    html = CrawlArchive(archive_dir).read_body(digest).decode("utf-8", "replace")
+    base = f"{urlparse(url).scheme}://{urlparse(url).netloc}"
+    n_items, cards = parse_search_html(html, base)
+    return page_idx, url, n_items, cards
+
+
+def _replay_release(job):
+    # mismo orden que enrich_card: HTML de release -> metadata; API solo si falta algo
+    archive_dir, page_idx, idx, title, artist, url, html_digest, xhr_digests, api_digest = job
+    archive = CrawlArchive(archive_dir)
+    meta = {}
+    fetch_path = "replay"
+    if html_digest:
+        payloads = []
+        for d in xhr_digests:
+            try:
+                payloads.append(json.loads(archive.read_body(d)))
+            except ValueError:
+                continue
+        html = archive.read_body(html_digest).decode("utf-8", "replace")
+        meta = release_meta_from_html(html, title, artist, payloads)
+    if api_digest and ((not meta) or (not artist) or (not title)):
+        try:
+            api_meta = map_release_json(json.loads(archive.read_body(api_digest)))
+        except ValueError:
+            api_meta = None
+        if api_meta:
+            title, artist = merge_api_meta(meta, api_meta, title, artist)
+    source = f"{urlparse(url).scheme}://{urlparse(url).netloc}"
+    return build_record(page_idx, idx, title, artist, url, meta, fetch_path, source=source)
+
+
+def latest_records(archive):
+    # última captura correcta por (tipo, uri); los xhr se agrupan por la página que los pidió
+    latest, xhr = {}, {}
+    for rec in archive.iter_records():
+        if rec.get("status") != 200:
+            continue
+        if rec["kind"] == "xhr":
+            xhr.setdefault(rec.get("ref"), {})[rec["uri"]] = rec["digest"]
+        else:
+            latest[(rec["kind"], rec["uri"])] = rec
+    return latest, xhr
+
+
+def replay(archive_dir=ARCHIVE_DIR, output=REPLAY_OUTPUT, workers=REPLAY_WORKERS, chunk=REPLAY_CHUNK):
+    archive = CrawlArchive(archive_dir)
+    t0 = time.perf_counter()
+    latest, xhr = latest_records(archive)
+    searches = sorted((r for (k, _), r in latest.items() if k == "search"),
+                      key=lambda r: (r.get("page", 0), r["date"]))
+    releases = {entity_key(u): r for (k, u), r in latest.items() if k == "release"}
+    api = {entity_key(u.replace("/releases/", "/release/").replace("/masters/", "/master/")): r
+           for (k, u), r in latest.items() if k == "api"}
+    print(f"📦 Archivo {archive_dir}: {len(searches)} páginas de búsqueda, {len(releases)} releases, "
+          f"{len(api)} respuestas de API")
+
+    with ProcessPoolExecutor(max_workers=max(1, workers), mp_context=get_context("spawn")) as pool:
+        # 1) tarjetas: como en el crawl, una por entidad (gana la primera página)
+        cards = {}
+        n_pages = 0
+        jobs = [(archive_dir, r.get("page", i), r["uri"], r["digest"]) for i, r in enumerate(searches)]
+        for page_idx, url, n_items, page_cards in pool.map(_replay_search, jobs, chunksize=max(1, chunk // 8)):
+            n_pages += 1
+            for idx, title, artist, card_url in page_cards:
+                cards.setdefault(entity_key(card_url), (page_idx, idx, title, artist, card_url))
+        t_cards = time.perf_counter() - t0
+
+        # 2) releases: los de las tarjetas en su orden y después los capturados sin tarjeta
+        keys = dict.fromkeys(k for k in cards if k in releases or k in api)
+        for k in list(releases) + list(api):
+            keys.setdefault(k)
+        keys.pop(None, None)
+        jobs = []
+        for key in keys:
+            rel, api_rec = releases.get(key), api.get(key)
+            page_idx, idx, title, artist, url = cards.get(key) or (-1, 0, "", "", (rel or {}).get("uri", ""))
+            if not url:
+                continue
+            html_digest = rel["digest"] if rel else None
+            xhr_digests = list(xhr.get(rel["uri"], {}).values()) if rel else []
+            jobs.append((archive_dir, page_idx, idx, title, artist, url, html_digest, xhr_digests,
+                         api_rec["digest"] if api_rec else None))
+        docs = list(pool.map(_replay_release, jobs, chunksize=chunk))
+
+    n = write_docs(docs, output)
+    wall = time.perf_counter() - t0
+    print(f"✅ Replay: {len(cards)} tarjetas de {n_pages} páginas ({t_cards:.1f} s), "
+          f"{n} documentos en {wall:.1f} s ({n / wall if wall else 0:.1f} docs/s) -> {output}")
+    return docs
+
+
+def stats(archive_dir=ARCHIVE_DIR):
+    archive = CrawlArchive(archive_dir)
+    by_kind, digests, raw = {}, set(), 0
+    for rec in archive.iter_records():
+        st = by_kind.setdefault(rec["kind"], {"records": 0, "bytes": 0, "errors": 0})
+        st["records"] += 1
+        st["bytes"] += rec["length"]
+        if rec.get("status") != 200:
+            st["errors"] += 1
+        raw += rec["length"]
+        digests.add(rec["digest"])
+    stored = sum(archive.blob_path(d.split(":", 1)[-1]).stat().st_size for d in digests)
+    print(f"📦 {archive_dir}")
+    for kind, st in sorted(by_kind.items()):
+        print(f"   {kind:<8} {st['records']:>7} respuestas  {st['bytes'] / 1e6:>9.1f} MB  errores={st['errors']}")
+    print(f"   blobs únicos: {len(digests)} ({stored / 1e6:.1f} MB en disco de {raw / 1e6:.1f} MB capturados)")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Archivo de captura del crawl: replay y estadísticas")
+    sub = parser.add_subparsers(dest="command", required=True)
+    p_replay = sub.add_parser("replay", help="reprocesar el archivo sin red")
+    p_replay.add_argument("--archive", default=ARCHIVE_DIR)
+    p_replay.add_argument("--output", default=REPLAY_OUTPUT,
+                          help="corpus de salida: .json o .jsonl / .jsonl.gz (sin embeddings)")
+    p_replay.add_argument("--workers", type=int, default=REPLAY_WORKERS, help="procesos de parseo")
+    p_replay.add_argument("--chunk", type=int, default=REPLAY_CHUNK, help="trabajos por envío a cada proceso")
+    p_stats = sub.add_parser("stats", help="resumen del archivo por tipo de respuesta")
+    p_stats.add_argument("--archive", default=ARCHIVE_DIR)
+    args = parser.parse_args(argv)
+
+    if args.command == "replay":
+        replay(args.archive, args.output, args.workers, args.chunk)
+    else:
+        stats(args.archive)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+# crawl_checkpoint.py — checkpoints del crawl para poder reanudarlo (--resume)
+
+import json
+import os
+import time
+from pathlib import Path
+
+from discogs_extract import entity_key
+
+# ------------------ CONFIG ------------------
+CHECKPOINT_DIR = ".checkpoint"
+CHECKPOINT_EVERY = 25          # registros entre volcados a disco
+# --------------------------------------------
+
+
+class CrawlCheckpoint:
+    # dos ficheros en `directory`:
+    #   results.jsonl -> un registro terminado por línea (solo se añade)
+    #   state.json    -> URL/índice de la página de búsqueda en curso (escritura atómica)
+    # Los releases completados se deducen de results.jsonl al reanudar.
+    def __init__(self, directory=CHECKPOINT_DIR, every=CHECKPOINT_EVERY):
+        self.dir = Path(directory)
+        self.results_path = self.dir / "results.jsonl"
+        self.state_path = self.dir / "state.json"
+        self.every = max(1, every)
+        self.state = {}
+        self.completed = set()
+        self._fh = None
+        self._pending = 0
+
+    def _load(self):
+        state = None
+        if self.state_path.exists():
+            state = json.loads(self.state_path.read_text(encoding="utf-8"))
+        results = []
+        if self.results_path.exists():
+            with self.results_path.open("r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        results.append(json.loads(line))
+                    except ValueError:
+                        # última línea a medio escribir tras un corte
+                        continue
+        return state, results
+
+    def start(self, resume=False):
+        # devuelve (state, resultados ya completados); sin `resume` empieza de cero,
+        # pero el checkpoint anterior se aparta con fecha en vez de sobrescribirse
+        self.dir.mkdir(parents=True, exist_ok=True)
+        state, results = (None, [])
+        if resume:
+            state, results = self._load()
+            if state is None and not results:
+                print(f"ℹ️ No hay checkpoint en {self.dir}; se empieza desde el principio.")
+        elif self.state_path.exists() or self.results_path.exists():
+            stamp = self._backup()
+            print(f"⚠️ Checkpoint anterior de {self.dir} guardado como *.{stamp}.*; se empieza de cero. "
+                  f"Para continuarlo: renombra esos ficheros a results.jsonl / state.json y usa --resume.")
+        self.state = state or {}
+        self.completed = {k for k in (entity_key(r.get("url")) for r in results) if k}
+        # reescribir los resultados válidos deja el fichero sin líneas truncadas
+        with self.results_path.open("w", encoding="utf-8") as f:
+            for r in results:
+                f.write(json.dumps(r, ensure_ascii=False) + "\n")
+        self._fh = self.results_path.open("a", encoding="utf-8")
+        self._write_state()
+        return self.state, results
+
+    def _backup(self):
+        # results.jsonl -> results.<fecha>.jsonl, state.json -> state.<fecha>.json
+        base = stamp = time.strftime("%Y%m%d-%H%M%S")
+        n = 1
+        # dos arranques en el mismo segundo no deben pisar la copia anterior
+        while any(p.with_name(f"{p.stem}.{stamp}{p.suffix}").exists()
+                  for p in (self.results_path, self.state_path)):
+            n += 1
+            stamp = f"{base}-{n}"
+        for p in (self.results_path, self.state_path):
+            if p.exists():
+                os.replace(p, p.with_name(f"{p.stem}.{stamp}{p.suffix}"))
+        return stamp
+
+    def is_done(self, url):
+        return entity_key(url) in self.completed
+
+    def add(self, record):
+        self._fh.write(json.dumps(record, ensure_ascii=False) + "\n")
+        key = entity_key(record.get("url"))
+        if key:
+            self.completed.add(key)
+        self._pending += 1
+        if self._pending >= self.every:
+            self.flush()
+
+    def set_position(self, search_url, page_idx):
+        self.state.update({"search_url": search_url, "page_idx": page_idx})
+        self.flush()
+
+    def _write_state(self):
+        self.state["completed"] = len(self.completed)
+        self.state["updated_at"] = time.time()
+        tmp = self.state_path.with_suffix(".tmp")
+        tmp.write_text(json.dumps(self.state, ensure_ascii=False), encoding="utf-8")
+        os.replace(tmp, self.state_path)
+
+    def flush(self):
+        if self._fh is None:
+            return
+        self._fh.flush()
+        os.fsync(self._fh.fileno())
+        self._pending = 0
+        self._write_state()
+
+    def close(self):
+        if self._fh is not None:
+            self.flush()
+            self._fh.close()
+            self._fh = None
+
+    def clear(self):
+        # el crawl terminó y se guardó la salida: el checkpoint ya no hace falta
+        self.close()
+        for p in (self.results_path, self.state_path):
+            if p.exists():
+                p.unlink()
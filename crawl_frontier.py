@@ -0,0 +1,261 @@
+#!/usr/bin/env python3
+# crawl_frontier.py — frontera de URLs persistente (SQLAlchemy) compartida por varios workers
+# Cada elemento es una página de búsqueda ("search") o un release ("release") con su
+# prioridad, intentos y estado: pending -> leased -> done | dead. Un worker reclama un
+# lote con un lease temporal; si muere, el lease caduca y otro worker lo retoma.
+
+import json
+import os
+import socket
+import time
+import uuid
+from pathlib import Path
+
+from sqlalchemy import (Column, Float, Index, Integer, MetaData, String, Table, Text,
+                        create_engine, event, func, select, update, and_, or_)
+
+# ------------------ CONFIG ------------------
+FRONTIER_URL = os.environ.get("FRONTIER_URL", "sqlite:///.frontier/frontier.sqlite")
+LEASE_S = 300                  # tiempo que un worker retiene un elemento reclamado
+MAX_ATTEMPTS = 4               # intentos antes de pasar a dead-letter
+RETRY_DELAY_S = 30             # espera base antes de reintentar (se duplica por intento)
+PRIORITY_SEARCH = 10           # el descubrimiento va por delante del enriquecimiento
+PRIORITY_RELEASE = 0
+# --------------------------------------------
+
+STATES = ("pending", "leased", "done", "dead")
+
+metadata = MetaData()
+frontier = Table(
+    "frontier", metadata,
+    Column("id", Integer, primary_key=True),
+    Column("key", String, nullable=False, unique=True),      # "search:<url>" / "release:123"
+    Column("kind", String, nullable=False),                  # "search" | "release"
+    Column("url", String, nullable=False),
+    Column("priority", Integer, nullable=False, default=0),
+    Column("position", Integer, nullable=False, default=0),  # orden de salida (página, tarjeta)
+    Column("state", String, nullable=False, default="pending"),
+    Column("attempts", Integer, nullable=False, default=0),
+    Column("not_before", Float, nullable=False, default=0.0),
+    Column("lease_owner", String),
+    Column("lease_until", Float),
+    Column("payload", Text),                                  # JSON: título, artista, página...
+    Column("result", Text),                                   # JSON: registro enriquecido
+    Column("error", Text),
+    Column("updated_at", Float, nullable=False, default=0.0),
+)
+Index("frontier_claim", frontier.c.kind, frontier.c.state, frontier.c.priority)
+
+
+def worker_id():
+    # identificador único del proceso: host:pid:aleatorio (los workers no guardan estado)
+    return f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+
+
+def _insert_ignore(dialect):
+    if dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+    return insert(frontier).on_conflict_do_nothing(index_elements=["key"])
+
+
+class CrawlFrontier:
+    def __init__(self, url=FRONTIER_URL, lease_s=LEASE_S, max_attempts=MAX_ATTEMPTS,
+                 retry_delay_s=RETRY_DELAY_S):
+        self.lease_s = lease_s
+        self.max_attempts = max_attempts
+        self.retry_delay_s = retry_delay_s
+        connect_args = {}
+        if url.startswith("sqlite:///"):
+            Path(url[len("sqlite:///"):]).parent.mkdir(parents=True, exist_ok=True)
+            connect_args["timeout"] = 30
+        self.engine = create_engine(url, connect_args=connect_args)
+        if self.engine.dialect.name == "sqlite":
+            self._sqlite_immediate()
+        metadata.create_all(self.engine)
+        self.stats = {"claimed": 0, "done": 0, "retried": 0, "dead": 0, "lost_leases": 0}
+
+    def _sqlite_immediate(self):
+        # pysqlite abre transacciones diferidas: con BEGIN IMMEDIATE el reclamo
+        # (SELECT + UPDATE) toma el bloqueo de escritura desde el principio y dos
+        # workers no pueden llevarse el mismo elemento
+        @event.listens_for(self.engine, "connect")
+        def _connect(dbapi_conn, _record):
+            dbapi_conn.isolation_level = None
+            dbapi_conn.execute("PRAGMA journal_mode=WAL")
+
+        @event.listens_for(self.engine, "begin")
+        def _begin(conn):
+            conn.exec_driver_sql("BEGIN IMMEDIATE")
+
+    # ---------- ALTA ----------
+    def add_many(self, items):
+        # items: dicts con kind, key, url y opcionalmente priority, position, payload.
+        # Las claves ya conocidas se ignoran; devuelve cuántas se insertaron.
+        now = time.time()
+        rows = [{
+            "key": it["key"], "kind": it["kind"], "url": it["url"],
+            "priority": it.get("priority", 0), "position": it.get("position", 0),
+            "state": "pending", "attempts": 0, "not_before": 0.0,
+            "payload": json.dumps(it.get("payload") or {}, ensure_ascii=False),
+            "updated_at": now,
+        } for it in items]
+        if not rows:
+            return 0
+        with self.engine.begin() as conn:
+            before = conn.execute(select(func.count()).select_from(frontier)).scalar()
+            conn.execute(_insert_ignore(self.engine.dialect.name), rows)
+            after = conn.execute(select(func.count()).select_from(frontier)).scalar()
+        return after - before
+
+    # ---------- RECLAMO ----------
+    def claim(self, kind, owner, limit=1):
+        # reclama hasta `limit` elementos pendientes (o con lease caducado) por prioridad.
+        # Devuelve [{"id", "url", "attempts", "payload"}].
+        now = time.time()
+        c = frontier.c
+        claimable = and_(
+            c.kind == kind,
+            or_(and_(c.state == "pending", c.not_before <= now),
+                and_(c.state == "leased", c.lease_until < now)),
+        )
+        with self.engine.begin() as conn:
+            # leases caducados que ya agotaron sus intentos -> dead-letter
+            expired = conn.execute(
+                update(frontier)
+                .where(c.kind == kind, c.state == "leased", c.lease_until < now,
+                       c.attempts >= self.max_attempts)
+                .values(state="dead", error="lease caducado", lease_owner=None, updated_at=now)
+            ).rowcount
+            self.stats["dead"] += expired
+            rows = conn.execute(
+                select(c.id, c.url, c.attempts, c.payload, c.state)
+                .where(claimable)
+                .order_by(c.priority.desc(), c.position, c.id)
+                .limit(limit)
+            ).fetchall()
+            if not rows:
+                return []
+            self.stats["lost_leases"] += sum(1 for r in rows if r.state == "leased")
+            conn.execute(
+                update(frontier)
+                .where(c.id.in_([r.id for r in rows]))
+                .values(state="leased", lease_owner=owner, lease_until=now + self.lease_s,
+                        attempts=c.attempts + 1, updated_at=now)
+            )
+        self.stats["claimed"] += len(rows)
+        return [{"id": r.id, "url": r.url, "attempts": r.attempts + 1,
+                 "payload": json.loads(r.payload or "{}")} for r in rows]
+
+    def renew(self, ids, owner):
+        # prolonga los leases de un lote largo; devuelve cuántos seguían siendo nuestros
+        now = time.time()
+        c = frontier.c
+        with self.engine.begin() as conn:
+            return conn.execute(
+                update(frontier)
+                .where(c.id.in_(list(ids)), c.lease_owner == owner, c.state == "leased")
+                .values(lease_until=now + self.lease_s, updated_at=now)
+            ).rowcount
+
+    # ---------- CIERRE ----------
+    def complete(self, item_id, owner, result=None):
+        # solo cuenta si el lease sigue siendo nuestro (otro worker pudo retomarlo)
+        c = frontier.c
+        with self.engine.begin() as conn:
+            n = conn.execute(
+                update(frontier)
+                .where(c.id == item_id, c.lease_owner == owner, c.state == "leased")
+                .values(state="done", lease_owner=None, lease_until=None, error=None,
+                        result=json.dumps(result, ensure_ascii=False) if result is not None else None,
+                        updated_at=time.time())
+            ).rowcount
+        if n:
+            self.stats["done"] += 1
+        else:
+            self.stats["lost_leases"] += 1
+        return bool(n)
+
+    def fail(self, item_id, owner, error, attempts):
+        # reintento con espera exponencial o dead-letter al agotar MAX_ATTEMPTS
+        now = time.time()
+        c = frontier.c
+        if attempts >= self.max_attempts:
+            values = {"state": "dead"}
+            self.stats["dead"] += 1
+        else:
+            values = {"state": "pending", "not_before": now + self.retry_delay_s * 2 ** (attempts - 1)}
+            self.stats["retried"] += 1
+        with self.engine.begin() as conn:
+            conn.execute(
+                update(frontier)
+                .where(c.id == item_id, c.lease_owner == owner, c.state == "leased")
+                .values(lease_owner=None, lease_until=None, error=str(error)[:500],
+                        updated_at=now, **values)
+            )
+
+    def requeue_dead(self, kind=None):
+        # devuelve los elementos de dead-letter a la cola con los intentos a cero
+        c = frontier.c
+        cond = [c.state == "dead"] + ([c.kind == kind] if kind else [])
+        with self.engine.begin() as conn:
+            return conn.execute(
+                update(frontier).where(*cond)
+                .values(state="pending", attempts=0, not_before=0.0, error=None, updated_at=time.time())
+            ).rowcount
+
+    # ---------- CONSULTA ----------
+    def counts(self, kind=None):
+        # {kind: {state: n}}
+        c = frontier.c
+        q = select(c.kind, c.state, func.count()).group_by(c.kind, c.state)
+        if kind:
+            q = q.where(c.kind == kind)
+        out = {}
+        with self.engine.connect() as conn:
+            for k, state, n in conn.execute(q):
+                out.setdefault(k, {s: 0 for s in STATES})[state] = n
+        return out
+
+    def has_open(self, kind):
+        # ¿queda algo pendiente o en curso de este tipo? (los workers terminan si no)
+        c = frontier.c
+        with self.engine.connect() as conn:
+            return conn.execute(
+                select(func.count()).select_from(frontier)
+                .where(c.kind == kind, c.state.in_(("pending", "leased")))
+            ).scalar() > 0
+
+    def iter_results(self, kind="release", batch=500):
+        # resultados terminados en orden de salida, por lotes (memoria acotada)
+        c = frontier.c
+        last = (-1, -1)
+        while True:
+            with self.engine.connect() as conn:
+                rows = conn.execute(
+                    select(c.position, c.id, c.result)
+                    .where(c.kind == kind, c.state == "done", c.result.is_not(None),
+                           or_(c.position > last[0], and_(c.position == last[0], c.id > last[1])))
+                    .order_by(c.position, c.id)
+                    .limit(batch)
+                ).fetchall()
+            if not rows:
+                return
+            for r in rows:
+                yield json.loads(r.result)
+            last = (rows[-1].position, rows[-1].id)
+
+    def dead_letters(self, kind=None):
+        c = frontier.c
+        q = select(c.kind, c.url, c.attempts, c.error).where(c.state == "dead").order_by(c.id)
+        if kind:
+            q = q.where(c.kind == kind)
+        with self.engine.connect() as conn:
+            return [dict(r._mapping) for r in conn.execute(q)]
+
+    def close(self):
+        self.engine.dispose()
+
+    def summary(self):
+        return dict(self.stats)
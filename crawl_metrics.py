@@ -0,0 +1,230 @@
+#!/usr/bin/env python3
+# crawl_metrics.py — métricas del crawl por etapa y exportación JSON / Prometheus
+# Un registro por proceso (METRICS) al que todas las etapas reportan tiempos,
+# contadores y bytes. dump() escribe metrics.json y metrics.prom (formato de texto
+# de Prometheus, apto para el textfile collector de node_exporter).
+
+import json
+import os
+import re
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from pathlib import Path
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# ------------------ CONFIG ------------------
+METRICS_DIR = ".metrics"
+METRICS_INTERVAL_S = 30        # volcado periódico durante crawls largos (0 = solo al final)
+METRICS_PREFIX = "discogs_scraper"
+STAGE_SAMPLES = 5000           # muestras recientes por etapa para p50/p99
+QUANTILES = (0.5, 0.9, 0.99)
+SUMMARY_PREFIX = "summary"     # gauges volcados con absorb()
+LABELED_KEYS = {"hosts": "host"}  # claves de summary() cuyos hijos son valores de etiqueta
+# --------------------------------------------
+
+_NAME_RE = re.compile(r"[^a-zA-Z0-9_]")
+
+
+def _metric_name(*parts):
+    return _NAME_RE.sub("_", "_".join(p for p in parts if p)).lower()
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in sorted(labels.items())) + "}"
+
+
+def peak_rss_mb(children=False):
+    # pico de memoria residente del proceso (o de sus hijos ya terminados)
+    if resource is None:
+        return None
+    who = resource.RUSAGE_CHILDREN if children else resource.RUSAGE_SELF
+    # ru_maxrss: KiB en Linux
+    return round(resource.getrusage(who).ru_maxrss / 1024, 1)
+
+
+def _quantile(sorted_values, q):
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(q * len(sorted_values)))]
+
+
+class CrawlMetrics:
+    # etapas: n, tiempo total, errores, elementos procesados y muestras para cuantiles.
+    # contadores/gauges con etiquetas: {(nombre, ((k, v), ...)): valor}.
+    # Seguro entre hilos (el pipeline en flujo reporta desde sus propios hilos).
+    def __init__(self, prefix=METRICS_PREFIX):
+        self.prefix = prefix
+        self.started_at = time.time()
+        self._t0 = time.perf_counter()
+        self._lock = threading.Lock()
+        self.stages = {}
+        self.counters = {}
+        self.gauges = {}
+        self._stop = None
+
+    # ---------- REGISTRO ----------
+    def observe(self, stage, seconds, items=1, error=False):
+        with self._lock:
+            st = self.stages.get(stage)
+            if st is None:
+                st = self.stages[stage] = {"n": 0, "total_s": 0.0, "max_s": 0.0, "errors": 0,
+                                           "items": 0, "samples": deque(maxlen=STAGE_SAMPLES)}
+            st["n"] += 1
+            st["total_s"] += seconds
+            st["max_s"] = max(st["max_s"], seconds)
+            st["items"] += items
+            st["samples"].append(seconds)
+            if error:
+                st["errors"] += 1
+
+    @contextmanager
+    def stage(self, stage, items=1):
+        # with METRICS.stage("detail_goto"): ...  (también dentro de corrutinas)
+        t0 = time.perf_counter()
+        error = False
+        try:
+            yield
+        except BaseException:
+            error = True
+            raise
+        finally:
+            self.observe(stage, time.perf_counter() - t0, items, error)
+
+    def inc(self, name, n=1, **labels):
+        key = (name, tuple(sorted((k, str(v)) for k, v in labels.items())))
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + n
+
+    def gauge(self, name, value, **labels):
+        with self._lock:
+            self.gauges[(name, tuple(sorted((k, str(v)) for k, v in labels.items())))] = value
+
+    def absorb(self, component, summary):
+        # vuelca como gauges los valores numéricos del summary() de un componente
+        # (pool, sesión HTTP, caché, limitador...): {"a": {"b": 1}} -> summary_component_a_b.
+        # El prefijo "summary" los separa de los contadores homónimos (http_requests_total)
+        # y los diccionarios de LABELED_KEYS ({"hosts": {host: {...}}}) pasan a etiqueta,
+        # para no crear un nombre de métrica por host
+        def walk(prefix, key, value, labels):
+            if isinstance(value, bool):
+                self.gauge(prefix, int(value), **labels)
+            elif isinstance(value, (int, float)):
+                self.gauge(prefix, value, **labels)
+            elif isinstance(value, dict):
+                label = LABELED_KEYS.get(key)
+                for k, v in value.items():
+                    if label:
+                        walk(prefix, None, v, {**labels, label: k})
+                    else:
+                        walk(_metric_name(prefix, str(k)), str(k), v, labels)
+        walk(_metric_name(SUMMARY_PREFIX, component), None, summary or {}, {})
+
+    # ---------- LECTURA ----------
+    def snapshot(self):
+        elapsed = time.perf_counter() - self._t0
+        with self._lock:
+            stages = {}
+            for name, st in self.stages.items():
+                samples = sorted(st["samples"])
+                stages[name] = {
+                    "n": st["n"], "errors": st["errors"], "items": st["items"],
+                    "total_s": round(st["total_s"], 3),
+                    "mean_ms": round(st["total_s"] / st["n"] * 1000, 2) if st["n"] else 0.0,
+                    "p50_ms": round(_quantile(samples, 0.5) * 1000, 2),
+                    "p99_ms": round(_quantile(samples, 0.99) * 1000, 2),
+                    "max_ms": round(st["max_s"] * 1000, 2),
+                    # ritmo de la etapa en tiempo de reloj del proceso
+                    "items_per_s": round(st["items"] / elapsed, 3) if elapsed else 0.0,
+                }
+            counters = [{"name": n, "labels": dict(l), "value": v} for (n, l), v in sorted(self.counters.items())]
+            gauges = [{"name": n, "labels": dict(l), "value": v} for (n, l), v in sorted(self.gauges.items())]
+        return {"started_at": self.started_at, "elapsed_s": round(elapsed, 1),
+                "stages": stages, "counters": counters, "gauges": gauges}
+
+    def prometheus(self):
+        p = self.prefix
+        lines = []
+        with self._lock:
+            stages = {k: dict(v, samples=sorted(v["samples"])) for k, v in self.stages.items()}
+            counters = sorted(self.counters.items())
+            gauges = sorted(self.gauges.items())
+        elapsed = time.perf_counter() - self._t0
+
+        lines += [f"# HELP {p}_stage_seconds Duración de cada etapa del crawl.",
+                  f"# TYPE {p}_stage_seconds summary"]
+        for name, st in sorted(stages.items()):
+            for q in QUANTILES:
+                lines.append(f"{p}_stage_seconds{_labels({'stage': name, 'quantile': q})} "
+                             f"{_quantile(st['samples'], q):.6f}")
+            lines.append(f"{p}_stage_seconds_sum{_labels({'stage': name})} {st['total_s']:.6f}")
+            lines.append(f"{p}_stage_seconds_count{_labels({'stage': name})} {st['n']}")
+        for metric, key, help_text in (("stage_errors_total", "errors", "Etapas terminadas con excepción."),
+                                       ("stage_items_total", "items", "Elementos procesados por etapa.")):
+            lines += [f"# HELP {p}_{metric} {help_text}", f"# TYPE {p}_{metric} counter"]
+            for name, st in sorted(stages.items()):
+                lines.append(f"{p}_{metric}{_labels({'stage': name})} {st[key]}")
+
+        by_name = {}
+        for (name, labels), value in counters:
+            by_name.setdefault(name, []).append((labels, value))
+        for name, rows in by_name.items():
+            metric = _metric_name(p, name, "total")
+            lines.append(f"# TYPE {metric} counter")
+            lines += [f"{metric}{_labels(dict(l))} {v}" for l, v in rows]
+
+        by_name = {}
+        for (name, labels), value in gauges:
+            by_name.setdefault(name, []).append((labels, value))
+        for name, rows in by_name.items():
+            metric = _metric_name(p, name)
+            lines.append(f"# TYPE {metric} gauge")
+            lines += [f"{metric}{_labels(dict(l))} {v}" for l, v in rows]
+
+        lines += [f"# TYPE {p}_uptime_seconds gauge", f"{p}_uptime_seconds {elapsed:.1f}"]
+        return "\n".join(lines) + "\n"
+
+    # ---------- EXPORTACIÓN ----------
+    def dump(self, directory=METRICS_DIR):
+        # escritura atómica: quien lea (node_exporter, un dashboard) nunca ve un archivo a medias
+        d = Path(directory)
+        d.mkdir(parents=True, exist_ok=True)
+        for name, text in (("metrics.json", json.dumps(self.snapshot(), ensure_ascii=False, indent=2)),
+                           ("metrics.prom", self.prometheus())):
+            tmp = d / (name + ".tmp")
+            tmp.write_text(text, encoding="utf-8")
+            os.replace(tmp, d / name)
+
+    def start_periodic(self, directory=METRICS_DIR, interval_s=METRICS_INTERVAL_S):
+        if interval_s <= 0 or self._stop is not None:
+            return
+        self._stop = threading.Event()
+
+        def loop():
+            while not self._stop.wait(interval_s):
+                try:
+                    self.dump(directory)
+                except OSError as e:
+                    print(f"⚠️ No se pudieron volcar las métricas: {e}")
+
+        threading.Thread(target=loop, name="metrics", daemon=True).start()
+
+    def stop_periodic(self):
+        if self._stop is not None:
+            self._stop.set()
+            self._stop = None
+
+
+# registro del proceso: cada proceso del crawl (shards, workers) tiene el suyo
+METRICS = CrawlMetrics()
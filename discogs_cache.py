@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+# discogs_cache.py — caché HTTP persistente (SQLite) para las respuestas de la API
+
+import sqlite3
+import time
+import re
+import zlib
+from pathlib import Path
+
+# ------------------ CONFIG ------------------
+CACHE_FILE = ".cache/discogs_http.sqlite"
+CACHE_TTL_S = 7 * 24 * 3600    # frescura por defecto si la respuesta no trae max-age
+CACHE_MAX_MB = 512             # tamaño máximo; se expulsa por LRU al superarlo
+TOUCH_BATCH = 100              # accesos (last_access) acumulados antes de escribirlos
+# --------------------------------------------
+
+MAX_AGE_RE = re.compile(r"max-age=(\d+)")
+
+
+class HttpCache:
+    # respuestas por URL con su ETag/Last-Modified. Una entrada fresca se sirve sin
+    # red; una caducada se revalida con If-None-Match / If-Modified-Since (304).
+    def __init__(self, path=CACHE_FILE, ttl_s=CACHE_TTL_S, max_bytes=CACHE_MAX_MB * 1024 * 1024):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.ttl_s = ttl_s
+        self.max_bytes = max_bytes
+        # timeout alto: varios procesos (shard_crawl.py) pueden compartir la caché
+        self.db = sqlite3.connect(str(self.path), timeout=30)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.execute("""
+            CREATE TABLE IF NOT EXISTS responses (
+                url TEXT PRIMARY KEY,
+                body BLOB NOT NULL,
+                etag TEXT,
+                last_modified TEXT,
+                fetched_at REAL NOT NULL,
+                expires_at REAL NOT NULL,
+                last_access REAL NOT NULL,
+                size INTEGER NOT NULL
+            )""")
+        self.db.execute("CREATE INDEX IF NOT EXISTS responses_lru ON responses (last_access)")
+        self.db.commit()
+        self.total_bytes = self.db.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        self.stats = {"hits": 0, "misses": 0, "revalidated": 0, "refreshed": 0,
+                      "stored": 0, "evicted": 0}
+        # {url: last_access} pendientes: una lectura no abre transacción de escritura
+        # (que bloquearía a los demás procesos que comparten la caché)
+        self._touched = {}
+
+    def _expires_at(self, headers, now):
+        m = MAX_AGE_RE.search(headers.get("cache-control") or "")
+        return now + (int(m.group(1)) if m else self.ttl_s)
+
+    def lookup(self, url):
+        # devuelve (body, etag, last_modified, fresh) o None
+        row = self.db.execute(
+            "SELECT body, etag, last_modified, expires_at FROM responses WHERE url = ?", (url,)
+        ).fetchone()
+        if row is None:
+            self.stats["misses"] += 1
+            return None
+        now = time.time()
+        self._touched[url] = now
+        if len(self._touched) >= TOUCH_BATCH:
+            self._flush_touches()
+            self.db.commit()
+        body, etag, last_modified, expires_at = row
+        fresh = expires_at > now
+        if fresh:
+            self.stats["hits"] += 1
+        return zlib.decompress(body), etag, last_modified, fresh
+
+    def _flush_touches(self):
+        # dentro de la transacción del llamador, que hace el commit
+        if self._touched:
+            self.db.executemany("UPDATE responses SET last_access = ? WHERE url = ?",
+                                [(t, u) for u, t in self._touched.items()])
+            self._touched = {}
+
+    def conditional_headers(self, entry):
+        _, etag, last_modified, _ = entry
+        headers = {}
+        if etag:
+            headers["If-None-Match"] = etag
+        if last_modified:
+            headers["If-Modified-Since"] = last_modified
+        return headers
+
+    def revalidated(self, url, headers):
+        # 304: el cuerpo guardado sigue valiendo, solo se renueva la frescura
+        now = time.time()
+        self.db.execute("UPDATE responses SET expires_at = ?, fetched_at = ? WHERE url = ?",
+                        (self._expires_at(headers, now), now, url))
+        self.db.commit()
+        self.stats["revalidated"] += 1
+
+    def store(self, url, body, headers, replaced=False):
+        now = time.time()
+        blob = zlib.compress(body)
+        old = self.db.execute("SELECT size FROM responses WHERE url = ?", (url,)).fetchone()
+        self.db.execute(
+            "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (url, blob, headers.get("etag"), headers.get("last-modified"),
+             now, self._expires_at(headers, now), now, len(blob)),
+        )
+        self.total_bytes += len(blob) - (old[0] if old else 0)
+        self.stats["refreshed" if replaced else "stored"] += 1
+        if self.total_bytes > self.max_bytes:
+            # la expulsión LRU necesita los accesos al día
+            self._flush_touches()
+            self._evict()
+        self.db.commit()
+
+    def _evict(self):
+        # LRU: borrar las entradas menos usadas hasta quedar al 90% del máximo
+        target = int(self.max_bytes * 0.9)
+        rows = self.db.execute("SELECT url, size FROM responses ORDER BY last_access ASC")
+        doomed = []
+        for url, size in rows:
+            if self.total_bytes <= target:
+                break
+            doomed.append((url,))
+            self.total_bytes -= size
+        self.db.executemany("DELETE FROM responses WHERE url = ?", doomed)
+        self.stats["evicted"] += len(doomed)
+
+    def close(self):
+        self._flush_touches()
+        self.db.commit()
+        self.db.close()
+
+    def summary(self):
+        out = dict(self.stats)
+        out["size_mb"] = round(self.total_bytes / 1024 / 1024, 2)
+        return out
@@ -0,0 +1,437 @@
+#!/usr/bin/env python3
+# discogs_extract.py — mapeo de datos de Discogs (JSON de la API, JSON-LD, estado
+# embebido y HTML servido) a las claves de `metadata` que usa el scraper.
+# Sin dependencias de Playwright para poder reutilizarlo fuera del navegador.
+
+import json
+import re
+import time
+from html.parser import HTMLParser
+
+PROFILE_KEYS = ["label", "series", "format", "country", "released", "genre", "style"]
+META_KEYS = PROFILE_KEYS + ["image"]
+# claves en las que el valor del DOM es más completo que el estructurado
+DOM_FIRST_KEYS = ("format",)
+
+ENTITY_KEY_RE = re.compile(r"/(release|master)/(\d+)")
+RELEASE_HREF_RE = re.compile(r"/release/\d+|/master/\d+")
+
+# claves típicas de un release en la API / estado de la web
+_RELEASE_HINTS = ("genres", "styles", "labels", "formats", "country", "released", "images")
+
+
+def map_release_json(data):
+    # JSON con la forma de api.discogs.com/releases/{id} -> metadata
+    mapi = {}
+    # título y artistas
+    if data.get("title"):
+        mapi.setdefault("_title_from_api", data.get("title"))
+    artists = []
+    for a in data.get("artists") or []:
+        name = a.get("name") if isinstance(a, dict) else None
+        if name:
+            artists.append(name)
+    if artists:
+        mapi.setdefault("_artist_from_api", " & ".join(artists))
+
+    # labels
+    labs = [l.get("name") for l in data.get("labels") or [] if isinstance(l, dict) and l.get("name")]
+    if labs:
+        mapi.setdefault("label", ", ".join(labs))
+
+    # formats
+    fmts = []
+    for f in data.get("formats") or []:
+        if not isinstance(f, dict):
+            continue
+        name = f.get("name") or ""
+        desc = " ".join(f.get("descriptions") or [])
+        part = (name + " " + desc).strip()
+        if part:
+            fmts.append(part)
+    if fmts:
+        mapi.setdefault("format", "; ".join(fmts))
+
+    if data.get("country"):
+        mapi.setdefault("country", data.get("country"))
+    if data.get("released"):
+        mapi.setdefault("released", data.get("released"))
+    if data.get("genres"):
+        mapi.setdefault("genre", ", ".join(data.get("genres")))
+    if data.get("styles"):
+        mapi.setdefault("style", ", ".join(data.get("styles")))
+    if data.get("images"):
+        first = data.get("images")[0]
+        img = first.get("uri") or first.get("resource_url")
+        if img:
+            mapi.setdefault("image", img)
+
+    return mapi
+
+
+def _names(value):
+    # schema.org admite objeto, lista de objetos o texto
+    if not value:
+        return []
+    if isinstance(value, (str, dict)):
+        value = [value]
+    out = []
+    for v in value:
+        name = v.get("name") if isinstance(v, dict) else v
+        if isinstance(name, str) and name.strip():
+            out.append(name.strip())
+    return out
+
+
+def map_ld_json(obj):
+    # bloque <script type="application/ld+json"> de tipo MusicRelease/MusicAlbum
+    m = {}
+    if obj.get("name"):
+        m["_title_from_api"] = obj["name"]
+    artists = _names(obj.get("byArtist")) or _names((obj.get("releaseOf") or {}).get("byArtist"))
+    if artists:
+        m["_artist_from_api"] = " & ".join(artists)
+    labels = _names(obj.get("recordLabel"))
+    if labels:
+        m["label"] = ", ".join(labels)
+    fmt = obj.get("musicReleaseFormat")
+    if fmt:
+        fmts = fmt if isinstance(fmt, list) else [fmt]
+        # "http://schema.org/VinylFormat" -> "Vinyl"
+        fmts = [f.rsplit("/", 1)[-1].replace("Format", "") for f in fmts if isinstance(f, str)]
+        if fmts:
+            m["format"] = "; ".join(fmts)
+    country = _names(((obj.get("releasedEvent") or {}).get("location")))
+    if country:
+        m["country"] = country[0]
+    if obj.get("datePublished"):
+        m["released"] = str(obj["datePublished"])
+    genres = obj.get("genre")
+    if genres:
+        m["genre"] = ", ".join(genres) if isinstance(genres, list) else str(genres)
+    image = obj.get("image")
+    if isinstance(image, list):
+        image = image[0] if image else None
+    if isinstance(image, dict):
+        image = image.get("url") or image.get("contentUrl")
+    if image:
+        m["image"] = image
+    return m
+
+
+def find_release_like(obj, depth=0, max_depth=8):
+    # busca en un JSON arbitrario (estado embebido, respuesta XHR) un dict con
+    # forma de release: título + al menos dos claves típicas de la API
+    if depth > max_depth:
+        return None
+    if isinstance(obj, dict):
+        if obj.get("title") and sum(1 for k in _RELEASE_HINTS if obj.get(k)) >= 2:
+            return obj
+        children = obj.values()
+    elif isinstance(obj, list):
+        children = obj
+    else:
+        return None
+    for child in children:
+        found = find_release_like(child, depth + 1, max_depth)
+        if found is not None:
+            return found
+    return None
+
+
+def structured_meta(ld_blocks=(), state_blobs=(), payloads=()):
+    # combina las fuentes estructuradas por prioridad: XHR interceptadas, estado
+    # embebido y JSON-LD. Las claves de título/artista quedan como _*_from_api.
+    meta = {}
+    for blob in list(payloads) + list(state_blobs):
+        release = find_release_like(blob)
+        if release:
+            for k, v in map_release_json(release).items():
+                meta.setdefault(k, v)
+    for block in ld_blocks:
+        items = block.get("@graph", [block]) if isinstance(block, dict) else block
+        for item in items if isinstance(items, list) else [items]:
+            if not isinstance(item, dict):
+                continue
+            kind = item.get("@type")
+            kinds = kind if isinstance(kind, list) else [kind]
+            if any(k in ("MusicRelease", "MusicAlbum") for k in kinds):
+                for k, v in map_ld_json(item).items():
+                    meta.setdefault(k, v)
+    return meta
+
+
+def finalize_detail_meta(structured, dom, title="", artist=""):
+    # metadata final de una página de detalle: estructurado primero, DOM como respaldo.
+    # Igual que parse_release_page: título/artista solo si faltaban en la tarjeta.
+    m = {}
+    for k in META_KEYS:
+        if k in DOM_FIRST_KEYS:
+            # el perfil trae los descriptores ("Vinyl, LP, Album"); JSON-LD solo el tipo
+            v = dom.get(k) or structured.get(k)
+        else:
+            v = structured.get(k) or dom.get(k)
+        if v:
+            m[k] = v
+    if not title:
+        t = structured.get("_title_from_api") or dom.get("_title_from_detail")
+        if t:
+            m["_title_from_detail"] = t
+    if not artist:
+        a = structured.get("_artist_from_api") or dom.get("_artist_from_detail")
+        if a:
+            m["_artist_from_detail"] = a
+    return m
+
+
+# ---------- HTML SIN NAVEGADOR ----------
+class _ReleaseHTMLParser(HTMLParser):
+    # recoge lo mismo que EXTRACT_RELEASE_JS a partir del HTML servido (sin JS):
+    # scripts JSON-LD / estado embebido, pares dt/dd y th/td, h1, imagen y og:*
+    _TEXT_TAGS = ("dt", "dd", "th", "td", "h1", "script")
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.ld, self.state = [], []
+        self.dts, self.dds, self.rows = [], [], []
+        self.h1 = ""
+        self.image = None
+        self.og = {}
+        self._capture = None      # (tag, tipo de script) en curso
+        self._buf = []
+        self._row = {}
+
+    def handle_starttag(self, tag, attrs):
+        a = dict(attrs)
+        if tag == "meta" and (a.get("property") or "").startswith("og:"):
+            self.og[a["property"][3:]] = a.get("content") or ""
+        elif tag == "img" and self.image is None:
+            classes = (a.get("class") or "").split()
+            if "image_gallery_image" in classes or a.get("id") == "large_image":
+                self.image = a.get("src") or a.get("data-src")
+        elif tag == "tr":
+            self._row = {}
+        if tag in self._TEXT_TAGS and self._capture is None:
+            kind = None
+            if tag == "script":
+                if a.get("type") == "application/ld+json":
+                    kind = "ld"
+                elif a.get("id") in ("dsdata", "__NEXT_DATA__"):
+                    kind = "state"
+                else:
+                    return
+            self._capture = (tag, kind)
+            self._buf = []
+
+    def handle_data(self, data):
+        if self._capture is not None:
+            self._buf.append(data)
+
+    def handle_endtag(self, tag):
+        if self._capture is None or self._capture[0] != tag:
+            return
+        kind = self._capture[1]
+        raw = "".join(self._buf)
+        text = " ".join(raw.split())
+        self._capture = None
+        if tag == "script":
+            try:
+                (self.ld if kind == "ld" else self.state).append(json.loads(raw))
+            except ValueError:
+                pass
+        elif tag == "dt":
+            self.dts.append(text)
+        elif tag == "dd":
+            self.dds.append(text)
+        elif tag in ("th", "td"):
+            self._row.setdefault(tag, text)
+            if "th" in self._row and "td" in self._row:
+                self.rows.append((self._row["th"], self._row["td"]))
+                self._row = {}
+        elif tag == "h1" and not self.h1:
+            self.h1 = text
+
+
+def parse_release_html(html):
+    # HTML de una página de release -> {"ld", "state", "dom"} (misma forma que la
+    # evaluación en el navegador, para reutilizar structured_meta/finalize_detail_meta)
+    parser = _ReleaseHTMLParser()
+    parser.feed(html)
+    parser.close()
+    dom = {}
+    if parser.dts and len(parser.dts) == len(parser.dds):
+        for k, v in zip(parser.dts, parser.dds):
+            k = k.replace(":", "").lower()
+            if k in PROFILE_KEYS:
+                dom[k] = v
+    for k, v in parser.rows:
+        k = k.replace(":", "").lower()
+        if k in PROFILE_KEYS:
+            dom.setdefault(k, v)
+    image = parser.image or parser.og.get("image")
+    if image:
+        dom["image"] = image
+    if parser.h1 or parser.og.get("title"):
+        dom["_title_from_detail"] = parser.h1 or parser.og.get("title")
+    return {"ld": parser.ld, "state": parser.state, "dom": dom}
+
+
+def release_meta_from_html(html, title="", artist="", payloads=()):
+    # `payloads`: respuestas JSON xhr de la navegación (al reprocesar un archivo de captura)
+    data = parse_release_html(html)
+    structured = structured_meta(data["ld"], data["state"], payloads)
+    return finalize_detail_meta(structured, data["dom"], title, artist)
+
+
+def entity_key(url):
+    # clave estable de entidad Discogs a partir de la URL: "release:2980814" / "master:123"
+    m = ENTITY_KEY_RE.search(url or "")
+    return f"{m.group(1)}:{m.group(2)}" if m else None
+
+
+def merge_api_meta(meta, api_meta, title, artist):
+    # no sobreescribir keys existentes; usar valores API para completar faltantes.
+    # Título/artista de la API solo rellenan los de la tarjeta: nunca van a `meta`
+    for k, v in api_meta.items():
+        if k == "_title_from_api":
+            title = title or v
+        elif k == "_artist_from_api":
+            artist = artist or v
+        else:
+            meta.setdefault(k, v)
+    return title, artist
+
+
+def build_record(page_idx, idx, title, artist, url, meta, fetch_path="browser", source=""):
+    # si artista o título están vacíos, intentar obtenerlos desde metadata recogida
+    if not title and meta.get("_title_from_detail"):
+        title = meta.pop("_title_from_detail")
+    if not artist and meta.get("_artist_from_detail"):
+        artist = meta.pop("_artist_from_detail")
+
+    text_blob = " | ".join(filter(None, [
+        title,
+        artist,
+        meta.get("genre", ""),
+        meta.get("style", ""),
+        meta.get("country", ""),
+        meta.get("format", ""),
+        meta.get("label", "")
+    ]))
+
+    # clave estable de entidad ("release:2980814"); solo si la URL no la tiene se
+    # recurre al identificador posicional de antes
+    doc_id = entity_key(url) or f"pg{page_idx}_i{idx}_{int(time.time())}"
+    return {
+        "doc_id": doc_id,
+        "source": source,
+        "title": title,
+        "artist": artist,
+        "url": url,
+        "metadata": meta,
+        "text": text_blob,
+        "fetch_path": fetch_path
+    }
+
+
+# ---------- TARJETAS DE BÚSQUEDA SIN NAVEGADOR ----------
+# equivalente a EXTRACT_CARDS_JS sobre el HTML guardado (modo replay): mismos
+# selectores que CARD_SELECTOR / CARD_TITLE_SELECTOR / CARD_ARTIST_SELECTOR
+_CARD_CLASSES = {"card", "search_result", "card_release"}
+_CARD_TAGS = {"article", "li"}
+_TITLE_CLASSES = {"card__title", "search_result_title"}
+_ARTIST_CLASSES = {"card__artist", "search_result_artist", "card_release_artist", "artist"}
+_VOID_TAGS = {"area", "base", "br", "col", "embed", "hr", "img", "input", "link", "meta",
+              "source", "track", "wbr"}
+
+
+class _Node:
+    __slots__ = ("tag", "attrs", "classes", "children", "text")
+
+    def __init__(self, tag, attrs):
+        self.tag = tag
+        self.attrs = attrs
+        self.classes = set((attrs.get("class") or "").split())
+        self.children = []
+        self.text = []
+
+    def iter(self):
+        yield self
+        for c in self.children:
+            if isinstance(c, _Node):
+                yield from c.iter()
+
+    def inner_text(self):
+        parts = []
+
+        def walk(n):
+            for c in n.children:
+                if isinstance(c, _Node):
+                    if c.tag not in ("script", "style"):
+                        walk(c)
+                else:
+                    parts.append(c)
+        walk(self)
+        return " ".join("".join(parts).split())
+
+
+class _TreeParser(HTMLParser):
+    # árbol mínimo (etiquetas, atributos y texto) tolerante a cierres implícitos
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.root = _Node("#root", {})
+        self.stack = [self.root]
+
+    def handle_starttag(self, tag, attrs):
+        node = _Node(tag, {k: v or "" for k, v in attrs})
+        self.stack[-1].children.append(node)
+        if tag not in _VOID_TAGS:
+            self.stack.append(node)
+
+    def handle_startendtag(self, tag, attrs):
+        self.stack[-1].children.append(_Node(tag, {k: v or "" for k, v in attrs}))
+
+    def handle_endtag(self, tag):
+        for i in range(len(self.stack) - 1, 0, -1):
+            if self.stack[i].tag == tag:
+                del self.stack[i:]
+                return
+
+    def handle_data(self, data):
+        self.stack[-1].children.append(data)
+
+
+def _is_card(n):
+    return n.tag in _CARD_TAGS or bool(n.classes & _CARD_CLASSES)
+
+
+def _has_release_link(n):
+    return any(c.tag == "a" and RELEASE_HREF_RE.search(c.attrs.get("href", "")) for c in n.iter())
+
+
+def parse_search_html(html, base_url=""):
+    # -> (nº de elementos que casan con el selector de tarjeta, [(idx, title, artist, url)])
+    parser = _TreeParser()
+    parser.feed(html)
+    parser.close()
+    items = [n for n in parser.root.iter() if _is_card(n)]
+    cards = []
+    for idx, it in enumerate(items):
+        inner = list(it.iter())[1:]
+        # envoltorio de otra tarjeta con enlace a release (no un <li> de acciones o chips)
+        if any(_is_card(n) and _has_release_link(n) for n in inner):
+            continue
+        a = next((n for n in inner if n.tag == "a"), None)
+        href = a.attrs.get("href", "") if a is not None else ""
+        if not href or not RELEASE_HREF_RE.search(href):
+            continue
+        t = next((n for n in inner if n.tag == "h4" or n.classes & _TITLE_CLASSES
+                  or (n.tag == "a" and "card_release_title" in n.classes)), None)
+        title = t.inner_text() if t is not None else ""
+        if title.lower() in ("welcome", "bienvenido"):
+            continue
+        ar = next((n for n in inner if n.classes & _ARTIST_CLASSES), None)
+        artist = ar.inner_text() if ar is not None else ""
+        url = href if href.startswith("http") else (base_url + href)
+        cards.append((idx, title, artist, url))
+    return len(items), cards
@@ -0,0 +1,520 @@
+#!/usr/bin/env python3
+# discogs_http.py — acceso HTTP directo a Discogs (sin navegador)
+
+import os
+import re
+import json
+import time
+import asyncio
+import random
+from contextlib import asynccontextmanager
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlparse
+
+import httpx
+
+from discogs_extract import map_release_json, release_meta_from_html
+from crawl_metrics import METRICS
+
+# ------------------ CONFIG ------------------
+HTTP_TIMEOUT_S = 15
+HTTP2 = True                   # solo se activa si está instalado httpx[http2]
+KEEPALIVE_EXPIRY_S = 30
+API_BASE_URL = os.environ.get("DISCOGS_API_URL", "https://api.discogs.com")
+API_USER_AGENT = "discogs-scraper/1.0"
+# campos mínimos para aceptar una página obtenida sin navegador
+FAST_PATH_REQUIRED = ("genre", "format")
+# marcas de página de desafío anti-bot (Cloudflare y similares)
+CHALLENGE_MARKERS = ("cf-challenge", "challenge-platform", "Just a moment...", "cf_chl_opt")
+# límite inicial (peticiones/minuto) por host; la API lo corrige con X-Discogs-Ratelimit
+RATE_LIMITS = {
+    "www.discogs.com": 60,
+    "api.discogs.com": 60,
+    "i.discogs.com": 120,
+}
+RATE_SAFETY = 0.9              # quedarse un 10% por debajo del límite anunciado
+RATE_BURST_S = 5               # segundos de ráfaga que admite el bucket
+LOW_REMAINING = 3              # con tan pocas peticiones restantes se reduce la concurrencia
+AIMD_START = 2                 # concurrencia inicial por host
+AIMD_MAX = 16                  # concurrencia máxima por host
+AIMD_DECREASE = 0.5            # factor multiplicativo ante 429 / cuota agotada
+AIMD_BACKOFF_S = 60            # una reducción por ventana de cuota (minuto móvil de Discogs)
+MIN_RATE_PER_S = 1 / 60        # suelo del ritmo (cuota 0 anunciada o share 0)
+DEFAULT_RETRY_AFTER_S = 60
+RETRY_ATTEMPTS = 4             # intentos totales por llamada de red
+RETRY_BASE_S = 0.5             # backoff exponencial con jitter completo: U(0, base·2^n)
+RETRY_MAX_S = 20
+RETRY_STATUS = {408, 425, 429, 500, 502, 503, 504}
+# errores de navegación de Chromium que merece la pena reintentar
+RETRY_MESSAGES = ("net::ERR_CONNECTION", "net::ERR_TIMED_OUT", "net::ERR_NETWORK_CHANGED",
+                  "net::ERR_EMPTY_RESPONSE", "net::ERR_HTTP2", "net::ERR_NAME_NOT_RESOLVED")
+BREAKER_THRESHOLD = 5          # fallos seguidos que abren el circuito de un host
+BREAKER_COOLDOWN_S = 30
+# --------------------------------------------
+
+_api_host = urlparse(API_BASE_URL).netloc
+if _api_host and _api_host not in RATE_LIMITS:
+    # servidor local que sustituye a la API: mismo presupuesto que api.discogs.com
+    RATE_LIMITS[_api_host] = RATE_LIMITS["api.discogs.com"]
+
+ENTITY_URL_RE = re.compile(r"/(release|master)/(\d+)")
+
+
+def _h2_available():
+    try:
+        import h2  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def parse_retry_after(value, default=DEFAULT_RETRY_AFTER_S):
+    # Retry-After admite segundos o una fecha HTTP
+    if not value:
+        return default
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return default
+
+
+# ---------- LIMITADOR DE PETICIONES ----------
+class HostLimiter:
+    # token bucket (ritmo sostenido) + ventana de concurrencia AIMD para un host:
+    # cada respuesta sana suma 1/limit a la concurrencia y un 429 o una cuota casi
+    # agotada la multiplica por AIMD_DECREASE, como mucho una vez por ventana: las
+    # respuestas de la misma ráfaga no vuelven a reducirla hasta que pasen
+    # AIMD_BACKOFF_S o terminen las peticiones que ya estaban en vuelo.
+    # Retry-After pausa el host entero.
+    # `share`: fracción del límite del host que corresponde a este proceso cuando
+    # varios procesos (shard_crawl.py) reparten la misma cuota
+    def __init__(self, host, per_minute, share=1.0):
+        self.host = host
+        self.share = share
+        self._set_rate(per_minute)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.limit = float(AIMD_START)
+        self.in_flight = 0
+        self.blocked_until = 0.0
+        self.remaining = None
+        self._decreased_at = None
+        self._draining = None          # peticiones en vuelo al reducir (None: solo navegador)
+        self._cond = asyncio.Condition()
+        self.stats = {"requests": 0, "throttled_s": 0.0, "responses_429": 0,
+                      "increases": 0, "decreases": 0, "decreases_skipped": 0}
+
+    def _set_rate(self, per_minute):
+        self.per_minute = per_minute
+        self.rate = max(MIN_RATE_PER_S, per_minute / 60.0 * RATE_SAFETY * self.share)
+        self.capacity = max(1.0, self.rate * RATE_BURST_S)
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def take_token(self):
+        t0 = time.monotonic()
+        while True:
+            now = time.monotonic()
+            self._refill(now)
+            wait = self.blocked_until - now
+            if wait <= 0 and self.tokens >= 1:
+                self.tokens -= 1
+                break
+            await asyncio.sleep(wait if wait > 0 else (1 - self.tokens) / self.rate)
+        self.stats["requests"] += 1
+        self.stats["throttled_s"] += time.monotonic() - t0
+
+    async def acquire(self):
+        async with self._cond:
+            await self._cond.wait_for(lambda: self.in_flight < int(self.limit))
+            self.in_flight += 1
+        try:
+            await self.take_token()
+        except BaseException:
+            await self.release()
+            raise
+
+    async def release(self):
+        async with self._cond:
+            self.in_flight -= 1
+            if self._draining:
+                self._draining -= 1
+            self._cond.notify_all()
+
+    def observe(self, status, headers):
+        total = headers.get("x-discogs-ratelimit")
+        remaining = headers.get("x-discogs-ratelimit-remaining")
+        # una cuota de 0 no es un ritmo utilizable: se mantiene la anterior
+        if total and total.isdigit() and 0 < int(total) != self.per_minute:
+            self._set_rate(int(total))
+        if remaining and remaining.isdigit():
+            self.remaining = int(remaining)
+            # el servidor manda: nunca gastar más de lo que dice que queda
+            self.tokens = min(self.tokens, float(self.remaining))
+        if status == 429:
+            self.stats["responses_429"] += 1
+            pause = parse_retry_after(headers.get("retry-after"))
+            self.blocked_until = max(self.blocked_until, time.monotonic() + pause)
+        if status == 429 or (self.remaining is not None and self.remaining <= LOW_REMAINING):
+            if self._may_decrease():
+                self.limit = max(1.0, self.limit * AIMD_DECREASE)
+                self._decreased_at = time.monotonic()
+                self._draining = self.in_flight or None
+                self.stats["decreases"] += 1
+            else:
+                self.stats["decreases_skipped"] += 1
+        elif 200 <= status < 400 and self.limit < AIMD_MAX:
+            self.limit = min(float(AIMD_MAX), self.limit + 1.0 / self.limit)
+            self.stats["increases"] += 1
+
+    def _may_decrease(self):
+        # primera señal de la ventana, o ya respondió todo lo que estaba en vuelo
+        # (las peticiones del navegador no ocupan slot: para ellas solo cuenta el tiempo)
+        if self._decreased_at is None or self._draining == 0:
+            return True
+        return time.monotonic() - self._decreased_at >= AIMD_BACKOFF_S
+
+    def summary(self):
+        out = {k: round(v, 2) if isinstance(v, float) else v for k, v in self.stats.items()}
+        out.update({
+            "per_minute": self.per_minute,
+            "share": self.share,
+            "concurrency_limit": round(self.limit, 2),
+            "in_flight": self.in_flight,
+            "tokens": round(self.tokens, 2),
+            "remaining": self.remaining,
+            "paused_s": round(max(0.0, self.blocked_until - time.monotonic()), 1),
+        })
+        return out
+
+
+class RateLimiter:
+    # un HostLimiter por host de RATE_LIMITS; el resto de hosts no se limita
+    def __init__(self, limits=RATE_LIMITS, share=1.0):
+        self.hosts = {host: HostLimiter(host, per_min, share) for host, per_min in limits.items()}
+
+    def for_url(self, url):
+        return self.hosts.get(urlparse(url).netloc)
+
+    @asynccontextmanager
+    async def slot(self, url):
+        host = self.for_url(url)
+        if host is None:
+            yield
+            return
+        await host.acquire()
+        try:
+            yield
+        finally:
+            await host.release()
+
+    async def wait_token(self, url):
+        # peticiones del navegador: solo ritmo (la concurrencia la fija el pool de páginas)
+        host = self.for_url(url)
+        if host is not None:
+            await host.take_token()
+
+    def observe(self, url, status, headers):
+        host = self.for_url(url)
+        if host is not None:
+            host.observe(status, headers)
+
+    def summary(self):
+        return {host: lim.summary() for host, lim in self.hosts.items() if lim.stats["requests"]}
+
+
+# ---------- REINTENTOS ----------
+class CircuitOpenError(Exception):
+    # el host acumula demasiados fallos seguidos: no se le envían más peticiones
+    pass
+
+
+class RetryPolicy:
+    # reintentos con backoff exponencial + jitter para cualquier llamada de red
+    # (httpx o page.goto) y un circuit breaker por host. Las respuestas con estado
+    # reintentable que agotan los intentos se devuelven tal cual al llamador.
+    def __init__(self, max_attempts=RETRY_ATTEMPTS, base_s=RETRY_BASE_S, max_s=RETRY_MAX_S,
+                 retry_status=RETRY_STATUS, extra_exceptions=(), retry_messages=RETRY_MESSAGES):
+        self.max_attempts = max(1, max_attempts)
+        self.base_s = base_s
+        self.max_s = max_s
+        self.retry_status = set(retry_status)
+        self.retry_exceptions = (httpx.TimeoutException, httpx.NetworkError,
+                                 httpx.RemoteProtocolError) + tuple(extra_exceptions)
+        self.retry_messages = tuple(retry_messages)
+        self._breakers = {}
+        self.hosts = {}
+        self.failed_urls = []
+
+    def retryable(self, exc):
+        if isinstance(exc, self.retry_exceptions):
+            return True
+        msg = str(exc)
+        return any(m in msg for m in self.retry_messages)
+
+    def backoff(self, attempt, retry_after=None):
+        delay = random.uniform(0, min(self.max_s, self.base_s * (2 ** attempt)))
+        if retry_after is not None:
+            delay = max(delay, min(self.max_s, retry_after))
+        return delay
+
+    def _host_stats(self, host):
+        return self.hosts.setdefault(host, {"calls": 0, "retries": 0, "failures": 0,
+                                            "breaker_opens": 0, "breaker_rejects": 0})
+
+    def _check_breaker(self, host):
+        br = self._breakers.get(host)
+        if br and br["open_until"] > time.monotonic():
+            self._host_stats(host)["breaker_rejects"] += 1
+            raise CircuitOpenError(f"circuito abierto para {host}")
+
+    def _attempt_failed(self, host):
+        br = self._breakers.setdefault(host, {"consecutive": 0, "open_until": 0.0})
+        br["consecutive"] += 1
+        if br["consecutive"] >= BREAKER_THRESHOLD:
+            # tras el enfriamiento se deja pasar una llamada (semiabierto); si falla, se reabre
+            br["open_until"] = time.monotonic() + BREAKER_COOLDOWN_S
+            self._host_stats(host)["breaker_opens"] += 1
+
+    def _attempt_ok(self, host):
+        br = self._breakers.get(host)
+        if br:
+            br["consecutive"] = 0
+            br["open_until"] = 0.0
+
+    def _permanent_failure(self, host, url, reason):
+        self._host_stats(host)["failures"] += 1
+        if len(self.failed_urls) < 100:
+            self.failed_urls.append({"url": url, "reason": reason})
+
+    async def run(self, url, call, status_of=None, retry_after_of=None):
+        # `call` es una función sin argumentos que devuelve una corrutina nueva en cada intento
+        host = urlparse(url).netloc
+        st = self._host_stats(host)
+        st["calls"] += 1
+        for attempt in range(self.max_attempts):
+            self._check_breaker(host)
+            last = attempt == self.max_attempts - 1
+            retry_after = None
+            try:
+                result = await call()
+            except Exception as exc:
+                if not self.retryable(exc):
+                    self._permanent_failure(host, url, f"{type(exc).__name__}: {exc}")
+                    raise
+                self._attempt_failed(host)
+                if last:
+                    self._permanent_failure(host, url, f"{type(exc).__name__}: {exc}")
+                    raise
+            else:
+                status = status_of(result) if status_of else None
+                if status not in self.retry_status:
+                    self._attempt_ok(host)
+                    return result
+                self._attempt_failed(host)
+                if last:
+                    self._permanent_failure(host, url, f"HTTP {status}")
+                    return result
+                if retry_after_of is not None:
+                    retry_after = retry_after_of(result)
+            st["retries"] += 1
+            await asyncio.sleep(self.backoff(attempt, retry_after))
+
+    def summary(self):
+        total = {"calls": 0, "retries": 0, "failures": 0}
+        for st in self.hosts.values():
+            for k in total:
+                total[k] += st[k]
+        return {"total": total, "hosts": self.hosts, "failed_urls": self.failed_urls[:10]}
+
+
+# ---------- SESIÓN COMPARTIDA ----------
+class DiscogsSession:
+    # único cliente httpx para todo el crawl: keep-alive y pool de conexiones por
+    # host, HTTP/2 opcional y descompresión gzip/deflate automática. Cuenta las
+    # conexiones abiertas con la extensión "trace" de httpcore.
+    def __init__(self, max_connections=10, http2=HTTP2, timeout=HTTP_TIMEOUT_S, limiter=None, retry=None,
+                 archive=None):
+        self.limiter = limiter
+        self.retry = retry
+        # CrawlArchive (--capture): se guarda cada respuesta con cuerpo
+        self.archive = archive
+        self.http2 = bool(http2) and _h2_available()
+        if http2 and not self.http2:
+            print("ℹ️ HTTP/2 no disponible (pip install 'httpx[http2]'); se usa HTTP/1.1.")
+        self.client = httpx.AsyncClient(
+            http2=self.http2,
+            limits=httpx.Limits(max_connections=max_connections,
+                                max_keepalive_connections=max_connections,
+                                keepalive_expiry=KEEPALIVE_EXPIRY_S),
+            timeout=timeout,
+            follow_redirects=True,
+        )
+        self.stats = {"requests": 0, "connections_opened": 0, "http2_responses": 0,
+                      "bytes_wire": 0, "bytes_decoded": 0}
+
+    async def _trace(self, event, info):
+        if event == "connection.connect_tcp.complete":
+            self.stats["connections_opened"] += 1
+
+    async def get(self, url, headers=None):
+        if self.retry is None:
+            return await self._send(url, headers)
+        return await self.retry.run(
+            url, lambda: self._send(url, headers),
+            status_of=lambda r: r.status_code,
+            retry_after_of=lambda r: parse_retry_after(r.headers.get("retry-after"), default=None),
+        )
+
+    async def _send(self, url, headers):
+        self.stats["requests"] += 1
+        if self.limiter is None:
+            resp = await self.client.get(url, headers=headers, extensions={"trace": self._trace})
+        else:
+            async with self.limiter.slot(url):
+                resp = await self.client.get(url, headers=headers, extensions={"trace": self._trace})
+            self.limiter.observe(url, resp.status_code, resp.headers)
+        host = urlparse(url).netloc
+        METRICS.inc("http_requests", host=host, status=resp.status_code)
+        METRICS.inc("http_bytes", resp.num_bytes_downloaded, host=host)
+        if resp.http_version == "HTTP/2":
+            self.stats["http2_responses"] += 1
+        self.stats["bytes_wire"] += resp.num_bytes_downloaded
+        self.stats["bytes_decoded"] += len(resp.content)
+        if self.archive is not None and resp.status_code != 304:
+            self.archive.record(str(resp.url), resp.status_code, resp.content,
+                                resp.headers.get("content-type", ""))
+        return resp
+
+    async def aclose(self):
+        await self.client.aclose()
+
+    def summary(self):
+        out = dict(self.stats)
+        out["connections_reused"] = max(0, out["requests"] - out["connections_opened"])
+        out["http2"] = self.http2
+        return out
+
+
+# ---------- HTML DE RELEASE ----------
+class ReleaseFastPath:
+    # descarga la página de release con la sesión compartida y la parsea sin
+    # renderizar. fetch() devuelve None cuando hay que escalar a Playwright.
+    def __init__(self, session, user_agent, required=FAST_PATH_REQUIRED):
+        self.session = session
+        self.required = required
+        self.headers = {
+            "User-Agent": user_agent,
+            "Accept": "text/html,application/xhtml+xml",
+            "Accept-Language": "en-US,en;q=0.9",
+        }
+        self.stats = {"hits": 0, "challenges": 0, "incomplete": 0, "errors": 0}
+
+    async def fetch(self, url, title="", artist=""):
+        try:
+            resp = await self.session.get(url, headers=self.headers)
+        except (httpx.HTTPError, CircuitOpenError):
+            self.stats["errors"] += 1
+            return None
+        html = resp.text
+        if resp.status_code in (403, 429, 503) or any(m in html for m in CHALLENGE_MARKERS):
+            self.stats["challenges"] += 1
+            return None
+        if resp.status_code != 200:
+            self.stats["errors"] += 1
+            return None
+        meta = release_meta_from_html(html, title, artist)
+        if not all(meta.get(k) for k in self.required):
+            # contenido solo en JS o plantilla desconocida
+            self.stats["incomplete"] += 1
+            return None
+        self.stats["hits"] += 1
+        return meta
+
+    def summary(self):
+        return dict(self.stats)
+
+
+# ---------- API PÚBLICA ----------
+def api_path_for_url(url):
+    # /release/123-Foo -> "releases/123" ; /master/45-Bar -> "masters/45"
+    m = ENTITY_URL_RE.search(url or "")
+    if not m:
+        return None
+    kind, entity_id = m.groups()
+    return f"{kind}s/{entity_id}"
+
+
+class DiscogsApiClient:
+    # peticiones a api.discogs.com (o un servidor local equivalente vía
+    # DISCOGS_API_URL) sobre la sesión compartida. Devuelve la metadata con las
+    # mismas claves que el scraper.
+    def __init__(self, session, token=None, base_url=API_BASE_URL, cache=None):
+        self.session = session
+        self.cache = cache
+        self.base_url = base_url.rstrip("/")
+        self.headers = {"User-Agent": API_USER_AGENT}
+        if token:
+            self.headers["Authorization"] = f"Discogs token={token}"
+        self.stats = {"requests": 0, "ok": 0, "errors": 0}
+
+    async def get_json(self, path):
+        # con `cache` (discogs_cache.HttpCache) la caché es transparente: entrada
+        # fresca -> sin red; caducada -> petición condicional; 304 -> cuerpo guardado
+        self.stats["requests"] += 1
+        url = f"{self.base_url}/{path.lstrip('/')}"
+        headers = self.headers
+        entry = self._cache_call("lookup", url)
+        if entry is not None:
+            if entry[3]:
+                self.stats["ok"] += 1
+                self._archive_cached(url, entry[0])
+                return json.loads(entry[0])
+            headers = {**self.headers, **self.cache.conditional_headers(entry)}
+        try:
+            resp = await self.session.get(url, headers=headers)
+            if resp.status_code == 304 and entry is not None:
+                self._cache_call("revalidated", url, resp.headers)
+                self._archive_cached(url, entry[0])
+                data = json.loads(entry[0])
+            else:
+                resp.raise_for_status()
+                data = resp.json()
+                self._cache_call("store", url, resp.content, resp.headers, replaced=entry is not None)
+        except (httpx.HTTPError, CircuitOpenError, ValueError):
+            self.stats["errors"] += 1
+            return None
+        self.stats["ok"] += 1
+        return data
+
+    def _archive_cached(self, url, body):
+        # con --capture, lo servido por la caché (fresco o tras un 304) también se graba:
+        # la sesión solo ve las respuestas con cuerpo que llegan por red
+        archive = self.session.archive
+        if archive is not None:
+            archive.record(url, 200, body, "application/json", from_cache=True)
+
+    def _cache_call(self, method, *args, **kwargs):
+        # la caché es una optimización: si falla (bloqueo, archivo dañado) se sigue
+        # como si no hubiera entrada, sin perder la respuesta de la API
+        if self.cache is None:
+            return None
+        try:
+            return getattr(self.cache, method)(*args, **kwargs)
+        except Exception as e:
+            self.stats["cache_errors"] = self.stats.get("cache_errors", 0) + 1
+            print(f"      ⚠️ Caché HTTP no disponible ({method}): {e}")
+            return None
+
+    async def fetch_meta(self, path):
+        data = await self.get_json(path)
+        return map_release_json(data) if data else None
+
+    def summary(self):
+        return dict(self.stats)
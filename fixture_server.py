@@ -0,0 +1,298 @@
+#!/usr/bin/env python3
+# fixture_server.py — servidor local que imita a Discogs para pruebas y benchmarks
+#
+#   python fixture_server.py --latency-ms 80 --jitter-ms 40 --rate-429 0.02
+#   DISCOGS_BASE_URL=http://127.0.0.1:8765 DISCOGS_API_URL=http://127.0.0.1:8765 \
+#       python scrape_music_rag.py --max-pages 5
+#
+# Sirve búsqueda (/search/), páginas de release (/release/<id>), la API
+# (/releases/<id>, /masters/<id>) y portadas (/images/<id>.png). Si FIXTURES_DIR
+# tiene grabaciones se sirven tal cual; si no, se generan de forma determinista
+# con la misma forma que las páginas reales (tarjetas, JSON-LD, perfil dt/dd).
+
+import argparse
+import hashlib
+import json
+import random
+import re
+import struct
+import threading
+import time
+import zlib
+from html import escape
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import parse_qs, urlparse
+
+# ------------------ CONFIG ------------------
+HOST = "127.0.0.1"
+PORT = 8765
+FIXTURES_DIR = "fixtures/discogs"  # grabaciones: search_page_<n>.html, release_<id>.html, api_release_<id>.json
+LATENCY_MS = 50                 # latencia media por respuesta
+JITTER_MS = 20                  # ± variación uniforme sobre LATENCY_MS
+RATE_429 = 0.0                  # probabilidad de responder 429 (con Retry-After)
+RETRY_AFTER_S = 1
+N_RELEASES = 5000               # releases del catálogo sintético
+PER_PAGE = 50
+FIRST_RELEASE_ID = 100000
+COVER_VARIANTS = 24             # portadas distintas (varios releases comparten imagen)
+SEED = 1234
+# --------------------------------------------
+
+GENRES = ["Rock", "Electronic", "Jazz", "Hip Hop", "Funk / Soul", "Pop", "Classical", "Reggae"]
+STYLES = ["House", "Techno", "Punk", "Ambient", "Soul", "Bebop", "Dub", "Synth-pop", "Indie Rock"]
+COUNTRIES = ["US", "UK", "Germany", "France", "Japan", "Spain", "Brazil", "Netherlands"]
+FORMATS = [("Vinyl", ["LP", "Album"]), ("CD", ["Album"]), ("Vinyl", ['12"', "33 ⅓ RPM"]),
+           ("Cassette", ["Album"]), ("File", ["MP3", "Album"])]
+LABELS = ["Warp", "Blue Note", "Factory", "Motown", "Sub Pop", "XL Recordings", "ECM", "Island"]
+WORDS = ["Night", "Blue", "Echo", "Silver", "River", "Machine", "Golden", "Signal", "Garden",
+         "Electric", "Dream", "Paper", "Ocean", "Velvet", "Static", "Morning", "Fire", "Glass"]
+
+SEARCH_RE = re.compile(r"^/search/?$")
+RELEASE_RE = re.compile(r"^/(release|master)/(\d+)")
+API_RE = re.compile(r"^/(releases|masters)/(\d+)/?$")
+IMAGE_RE = re.compile(r"^/images/(\d+)\.png$")
+
+
+# ---------- CATÁLOGO SINTÉTICO ----------
+def synthetic_release(release_id, base_url):
+    # mismo id -> mismos datos en todas las ejecuciones
+    rnd = random.Random(release_id)
+    fmt_name, fmt_desc = rnd.choice(FORMATS)
+    genres = rnd.sample(GENRES, rnd.randint(1, 2))
+    return {
+        "id": release_id,
+        "title": " ".join(rnd.sample(WORDS, rnd.randint(1, 3))),
+        "artists": [{"name": f"The {rnd.choice(WORDS)} {rnd.choice(['Band', 'Collective', 'Trio', 'Project'])}"}],
+        "labels": [{"name": rnd.choice(LABELS), "catno": f"CAT-{release_id}"}],
+        "formats": [{"name": fmt_name, "descriptions": fmt_desc}],
+        "country": rnd.choice(COUNTRIES),
+        "released": str(rnd.randint(1960, 2024)),
+        "genres": genres,
+        "styles": rnd.sample(STYLES, rnd.randint(1, 2)),
+        "images": [{"uri": f"{base_url}/images/{release_id % COVER_VARIANTS}.png", "type": "primary"}],
+    }
+
+
+def _slug(text):
+    return re.sub(r"[^A-Za-z0-9]+", "-", text).strip("-")
+
+
+def search_html(page, per_page, n_releases, base_url):
+    first = (page - 1) * per_page
+    ids = range(FIRST_RELEASE_ID + first, FIRST_RELEASE_ID + min(first + per_page, n_releases))
+    cards = []
+    for rid in ids:
+        r = synthetic_release(rid, base_url)
+        artist = r["artists"][0]["name"]
+        cards.append(
+            f'<div class="card card_release">'
+            f'<a href="/release/{rid}-{_slug(artist)}-{_slug(r["title"])}">'
+            f'<h4 class="card__title">{escape(r["title"])}</h4></a>'
+            f'<div class="card__artist">{escape(artist)}</div></div>'
+        )
+    nav = ""
+    if first + per_page < n_releases:
+        nav = f'<a rel="next" class="pagination_next" href="/search/?q=&type=release&page={page + 1}&limit={per_page}">Next</a>'
+    return ("<!doctype html><html><head><title>Search</title></head><body>"
+            f'<div id="search_results">{"".join(cards)}</div>{nav}</body></html>')
+
+
+def release_html(r):
+    artist = r["artists"][0]["name"]
+    fmt = r["formats"][0]
+    ld = {
+        "@context": "http://schema.org", "@type": "MusicRelease",
+        "name": r["title"],
+        "releaseOf": {"@type": "MusicAlbum", "byArtist": [{"@type": "MusicGroup", "name": artist}]},
+        "recordLabel": [{"@type": "Organization", "name": l["name"]} for l in r["labels"]],
+        "musicReleaseFormat": f"http://schema.org/{fmt['name']}Format",
+        "datePublished": r["released"],
+        "genre": r["genres"],
+        "image": r["images"][0]["uri"],
+    }
+    profile = [
+        ("Label", r["labels"][0]["name"]), ("Format", f"{fmt['name']}, {', '.join(fmt['descriptions'])}"),
+        ("Country", r["country"]), ("Released", r["released"]),
+        ("Genre", ", ".join(r["genres"])), ("Style", ", ".join(r["styles"])),
+    ]
+    rows = "".join(f"<dt>{escape(k)}:</dt><dd>{escape(v)}</dd>" for k, v in profile)
+    return ("<!doctype html><html><head>"
+            f'<meta property="og:title" content="{escape(artist)} - {escape(r["title"])}">'
+            f'<meta property="og:image" content="{escape(r["images"][0]["uri"])}">'
+            f'<script type="application/ld+json">{json.dumps(ld)}</script></head><body>'
+            f'<h1>{escape(r["title"])}</h1><a class="artist" href="#">{escape(artist)}</a>'
+            f'<div class="profile"><dl>{rows}</dl></div>'
+            f'<img class="image_gallery_image" src="{escape(r["images"][0]["uri"])}">'
+            "</body></html>")
+
+
+def cover_png(variant, size=64):
+    # PNG RGB de un color por variante (portadas idénticas para probar la deduplicación)
+    rnd = random.Random(variant)
+    color = bytes(rnd.randrange(256) for _ in range(3))
+    raw = b"".join(b"\x00" + color * size for _ in range(size))
+
+    def chunk(tag, data):
+        return struct.pack(">I", len(data)) + tag + data + struct.pack(">I", zlib.crc32(tag + data))
+
+    return (b"\x89PNG\r\n\x1a\n"
+            + chunk(b"IHDR", struct.pack(">IIBBBBB", size, size, 8, 2, 0, 0, 0))
+            + chunk(b"IDAT", zlib.compress(raw))
+            + chunk(b"IEND", b""))
+
+
+# ---------- SERVIDOR ----------
+class FixtureServer:
+    def __init__(self, host=HOST, port=PORT, latency_ms=LATENCY_MS, jitter_ms=JITTER_MS,
+                 rate_429=RATE_429, fixtures_dir=FIXTURES_DIR, n_releases=N_RELEASES, seed=SEED):
+        self.latency_s = latency_ms / 1000
+        self.jitter_s = jitter_ms / 1000
+        self.rate_429 = rate_429
+        self.fixtures_dir = Path(fixtures_dir) if fixtures_dir else None
+        self.n_releases = n_releases
+        self._rnd = random.Random(seed)
+        self._lock = threading.Lock()
+        self.stats = {"requests": 0, "by_route": {}, "responses_429": 0, "not_modified": 0,
+                      "recorded": 0, "synthetic": 0}
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"   # keep-alive, como el sitio real
+
+            def do_GET(self):
+                server._handle(self)
+
+            def log_message(self, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer((host, port), Handler)
+        self.httpd.daemon_threads = True
+        self.url = f"http://{host}:{self.httpd.server_address[1]}"
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self.httpd.serve_forever, name="fixtures", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def _count(self, key, route=None):
+        with self._lock:
+            self.stats[key] += 1
+            if route:
+                self.stats["by_route"][route] = self.stats["by_route"].get(route, 0) + 1
+
+    def _delay(self):
+        with self._lock:
+            jitter = self._rnd.uniform(-self.jitter_s, self.jitter_s)
+            throttle = self._rnd.random() < self.rate_429
+        time.sleep(max(0.0, self.latency_s + jitter))
+        return throttle
+
+    def _recorded(self, name):
+        if self.fixtures_dir is None:
+            self._count("synthetic")
+            return None
+        path = self.fixtures_dir / name
+        if not path.exists():
+            self._count("synthetic")
+            return None
+        self._count("recorded")
+        return path.read_bytes()
+
+    def _route(self, path, query):
+        # -> (ruta, status, content-type, cuerpo)
+        if SEARCH_RE.match(path):
+            page = int((query.get("page") or ["1"])[0])
+            per_page = int((query.get("limit") or [str(PER_PAGE)])[0])
+            body = self._recorded(f"search_page_{page}.html")
+            if body is None:
+                body = search_html(page, per_page, self.n_releases, self.url).encode()
+            return "search", 200, "text/html; charset=utf-8", body
+        m = RELEASE_RE.match(path)
+        if m:
+            rid = int(m.group(2))
+            body = self._recorded(f"{m.group(1)}_{rid}.html")
+            if body is None:
+                body = release_html(synthetic_release(rid, self.url)).encode()
+            return "release", 200, "text/html; charset=utf-8", body
+        m = API_RE.match(path)
+        if m:
+            rid = int(m.group(2))
+            body = self._recorded(f"api_{m.group(1)[:-1]}_{rid}.json")
+            if body is None:
+                body = json.dumps(synthetic_release(rid, self.url)).encode()
+            return "api", 200, "application/json", body
+        m = IMAGE_RE.match(path)
+        if m:
+            return "image", 200, "image/png", cover_png(int(m.group(1)))
+        return "other", 404, "text/plain; charset=utf-8", b"not found"
+
+    def _handle(self, req):
+        parsed = urlparse(req.path)
+        throttle = self._delay()
+        route, status, ctype, body = self._route(parsed.path, parse_qs(parsed.query))
+        self._count("requests", route)
+        headers = {"Content-Type": ctype}
+        if route == "api":
+            headers["X-Discogs-Ratelimit"] = "6000"
+            headers["X-Discogs-Ratelimit-Remaining"] = "5999"
+        if throttle and route != "image":
+            self._count("responses_429")
+            status, body = 429, b'{"message": "You are making requests too quickly."}'
+            headers = {"Content-Type": "application/json", "Retry-After": str(RETRY_AFTER_S)}
+        elif status == 200:
+            etag = '"' + hashlib.sha1(body).hexdigest()[:16] + '"'
+            headers["ETag"] = etag
+            headers["Cache-Control"] = "max-age=60"
+            if req.headers.get("If-None-Match") == etag:
+                self._count("not_modified")
+                status, body = 304, b""
+        req.send_response(status)
+        for k, v in headers.items():
+            req.send_header(k, v)
+        req.send_header("Content-Length", str(len(body)))
+        req.end_headers()
+        req.wfile.write(body)
+
+    def summary(self):
+        with self._lock:
+            return json.loads(json.dumps(self.stats))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Servidor local de fixtures de Discogs")
+    parser.add_argument("--host", default=HOST)
+    parser.add_argument("--port", type=int, default=PORT)
+    parser.add_argument("--latency-ms", type=float, default=LATENCY_MS)
+    parser.add_argument("--jitter-ms", type=float, default=JITTER_MS)
+    parser.add_argument("--rate-429", type=float, default=RATE_429, help="probabilidad de responder 429")
+    parser.add_argument("--fixtures-dir", default=FIXTURES_DIR, help="grabaciones a servir antes que lo sintético")
+    parser.add_argument("--releases", type=int, default=N_RELEASES, help="tamaño del catálogo sintético")
+    args = parser.parse_args(argv)
+    server = FixtureServer(args.host, args.port, args.latency_ms, args.jitter_ms, args.rate_429,
+                           args.fixtures_dir, args.releases)
+    print(f"🧪 Fixtures de Discogs en {server.url} (latencia {args.latency_ms}±{args.jitter_ms} ms, "
+          f"429 {args.rate_429:.0%})")
+    print(f"   DISCOGS_BASE_URL={server.url} DISCOGS_API_URL={server.url}")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.httpd.server_close()
+        print(f"📊 Fixtures: {server.summary()}")
+
+
+if __name__ == "__main__":
+    main()
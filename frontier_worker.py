@@ -0,0 +1,319 @@
+#!/usr/bin/env python3
+# frontier_worker.py — workers sin estado sobre la frontera compartida (crawl_frontier.py)
+#
+#   python frontier_worker.py seed --pages 200        # encola las páginas de búsqueda
+#   python frontier_worker.py discover                # páginas de búsqueda -> releases
+#   python frontier_worker.py enrich --mode api       # releases -> registros
+#   python frontier_worker.py enrich --workers 3      # uno de 3 workers: 1/3 de la cuota por host
+#   python frontier_worker.py status                  # recuento por etapa y estado
+#   python frontier_worker.py export --output music_data.json
+#
+# Todo el estado vive en la frontera: para añadir capacidad basta con arrancar más
+# procesos `discover` o `enrich` (en esta u otra máquina con acceso a FRONTIER_URL).
+
+import os
+import json
+import time
+import asyncio
+import argparse
+from contextlib import aclosing, asynccontextmanager
+
+from playwright.async_api import async_playwright, TimeoutError as PlaywrightTimeoutError
+
+import scrape_music_rag as smr
+from crawl_frontier import (CrawlFrontier, FRONTIER_URL, PRIORITY_SEARCH, PRIORITY_RELEASE,
+                            worker_id)
+from discogs_extract import entity_key
+from browser_server import open_browser
+
+# ------------------ CONFIG ------------------
+IDLE_POLL_S = 5                # espera cuando no hay nada reclamable pero sí en curso
+POSITION_STRIDE = 1000         # posición de salida = página * STRIDE + nº de tarjeta en la página
+LEASE_RENEW_FRACTION = 3       # un lote en curso renueva sus leases cada lease_s / 3
+# --------------------------------------------
+
+
+def seed(frontier, pages, limit=smr.SEARCH_LIMIT, first_page=0):
+    items = []
+    for page_idx in range(first_page, pages):
+        url = smr.search_page_url(page_idx + 1, limit)
+        items.append({"kind": "search", "key": f"search:{url}", "url": url,
+                      "priority": PRIORITY_SEARCH, "position": page_idx,
+                      "payload": {"page_idx": page_idx}})
+    return frontier.add_many(items)
+
+
+def release_items(page_idx, cards, known=None):
+    # `idx` es la posición en CARD_SELECTOR (puede pasar de 1000); el orden de salida
+    # usa el de la tarjeta dentro de la página, siempre < SEARCH_LIMIT
+    items, skipped = [], 0
+    for pos, (idx, title, artist, url) in enumerate(cards):
+        if known and smr.is_known_card(known, (idx, title, artist, url)):
+            skipped += 1
+            continue
+        items.append({"kind": "release", "key": entity_key(url) or url, "url": url,
+                      "priority": PRIORITY_RELEASE, "position": page_idx * POSITION_STRIDE + pos,
+                      "payload": {"page_idx": page_idx, "idx": idx, "title": title, "artist": artist}})
+    return items, skipped
+
+
+@asynccontextmanager
+async def leases_kept(frontier, items, owner):
+    # un lote de páginas de detalle puede durar más que el lease: se renueva mientras
+    # se procesa para que otro worker no lo reclame a la vez
+    ids = [it["id"] for it in items]
+
+    async def loop():
+        while True:
+            await asyncio.sleep(frontier.lease_s / LEASE_RENEW_FRACTION)
+            frontier.renew(ids, owner)
+
+    task = asyncio.create_task(loop())
+    try:
+        yield
+    finally:
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+
+
+async def wait_or_stop(frontier, kinds, follow):
+    # sin nada reclamable: seguir esperando si hay elementos en curso de otros workers
+    # (su lease puede caducar, o el descubrimiento aún puede añadir releases) o si se
+    # pidió --follow; si no, terminar
+    if follow or any(frontier.has_open(k) for k in kinds):
+        await asyncio.sleep(IDLE_POLL_S)
+        return False
+    return True
+
+
+# ---------- DESCUBRIMIENTO ----------
+def rate_limiter(share):
+    # cada worker se queda con `share` de la cuota por host (--workers N -> 1/N)
+    return smr.RateLimiter(share=share) if smr.RATE_LIMIT else None
+
+
+async def discover(frontier, owner, search_contexts=smr.SEARCH_CONTEXTS, known=None, follow=False,
+                   rate_share=1.0):
+    stats = {"pages": 0, "releases_added": 0, "known_skipped": 0, "failed": 0}
+    async with async_playwright() as p:
+        browser = await p.chromium.launch(headless=smr.HEADLESS)
+        limiter = rate_limiter(rate_share)
+        retry = smr.RetryPolicy(max_attempts=smr.RETRY_ATTEMPTS, extra_exceptions=(PlaywrightTimeoutError,))
+        blocker = smr.ResourceBlocker(smr.BLOCK_PROFILE, limiter=limiter)
+        ready = smr.PageReadiness(smr.READINESS, retry=retry, limiter=limiter)
+        try:
+            while True:
+                claimed = frontier.claim("search", owner, limit=search_contexts)
+                if not claimed:
+                    if await wait_or_stop(frontier, ("search",), follow):
+                        break
+                    continue
+                by_idx = {it["payload"]["page_idx"]: it for it in claimed}
+                page_urls = [(idx, it["url"]) for idx, it in sorted(by_idx.items())]
+                pages = smr.iter_search_pages_parallel(browser, blocker, ready, page_urls, search_contexts)
+                async with leases_kept(frontier, claimed, owner), aclosing(pages):
+                    async for page_idx, url, n_items, cards in pages:
+                        it = by_idx[page_idx]
+                        if n_items is None:
+                            stats["failed"] += 1
+                            frontier.fail(it["id"], owner, "página de búsqueda no disponible", it["attempts"])
+                            continue
+                        items, skipped = release_items(page_idx, cards, known)
+                        added = frontier.add_many(items)
+                        frontier.complete(it["id"], owner, {"cards": len(cards), "added": added})
+                        stats["pages"] += 1
+                        stats["releases_added"] += added
+                        stats["known_skipped"] += skipped
+                        print(f"🔍 Página {page_idx + 1}: {len(cards)} tarjetas, {added} releases nuevos")
+        finally:
+            await browser.close()
+    print(f"📊 Descubrimiento: {stats}")
+    print(f"📊 Bloqueo de recursos: {blocker.summary()}")
+    if limiter is not None:
+        print(f"📊 Límite por host: {limiter.summary()}")
+    return stats
+
+
+# ---------- ENRIQUECIMIENTO ----------
+def settle(frontier, owner, claimed, records, stats):
+    # registro -> done; None (sin metadata de detalle ni de API) -> reintento con
+    # espera exponencial o dead-letter, según los intentos del elemento
+    for it, record in zip(claimed, records):
+        if record is None:
+            stats["failed"] += 1
+            frontier.fail(it["id"], owner, "enriquecimiento fallido: sin metadata de detalle ni de API",
+                          it["attempts"])
+        else:
+            stats["done"] += 1
+            frontier.complete(it["id"], owner, record)
+
+
+async def enrich(frontier, owner, mode=smr.ENRICH_MODE, concurrency=smr.CONCURRENCY,
+                 api_workers=smr.API_WORKERS, follow=False, browser_endpoint=smr.BROWSER_ENDPOINT,
+                 rate_share=1.0):
+    stats = {"done": 0, "failed": 0}
+    batch = api_workers if mode == "api" else concurrency
+    async with async_playwright() as p:
+        handle, pool, fast = None, None, None
+        limiter = rate_limiter(rate_share)
+        retry = smr.RetryPolicy(max_attempts=smr.RETRY_ATTEMPTS, extra_exceptions=(PlaywrightTimeoutError,))
+        blocker = smr.ResourceBlocker(smr.BLOCK_PROFILE, limiter=limiter)
+        ready = smr.PageReadiness(smr.READINESS, retry=retry, limiter=limiter)
+        session = smr.DiscogsSession(max_connections=concurrency + api_workers, limiter=limiter, retry=retry)
+        cache = smr.HttpCache() if smr.HTTP_CACHE else None
+        api = smr.DiscogsApiClient(session, token=os.environ.get("DISCOGS_TOKEN"), cache=cache)
+        try:
+            if mode != "api":
+                # solo el modo detalle necesita navegador
+                handle = await open_browser(p, browser_endpoint, headless=smr.HEADLESS,
+                                            user_agent=smr.USER_AGENT)
+                context = handle.context
+                await blocker.install(context, persistent=handle.remote)
+                pool = await smr.PagePool(context, size=concurrency, max_uses=smr.PAGE_MAX_USES,
+                                          setup=blocker.attach).start()
+                fast = smr.ReleaseFastPath(session, smr.USER_AGENT) if smr.FAST_PATH else None
+            rt = smr.CrawlRuntime(pool, blocker, ready, smr.DETAIL_EXTRACTION, fast, api)
+
+            while True:
+                claimed = frontier.claim("release", owner, limit=batch)
+                if not claimed:
+                    if await wait_or_stop(frontier, ("release", "search"), follow):
+                        break
+                    continue
+                cards = [(it["payload"].get("idx", 0), it["payload"].get("title", ""),
+                          it["payload"].get("artist", ""), it["url"]) for it in claimed]
+                async with leases_kept(frontier, claimed, owner):
+                    if mode == "api":
+                        records = await smr.enrich_cards_via_api(rt, api, 0, cards, api_workers,
+                                                                 allow_empty=False)
+                    else:
+                        records = await asyncio.gather(*[
+                            smr.enrich_card(rt, it["payload"].get("page_idx", 0), card, allow_empty=False)
+                            for it, card in zip(claimed, cards)
+                        ])
+                settle(frontier, owner, claimed, records, stats)
+                print(f"   ✅ {stats['done']} releases enriquecidos ({stats['failed']} fallidos)")
+        finally:
+            await session.aclose()
+            if cache is not None:
+                cache.close()
+            if pool is not None:
+                await pool.close()
+            if handle is not None:
+                await handle.close()
+    print(f"📊 Enriquecimiento: {stats}")
+    print(f"📊 Rutas de detalle: {rt.path_summary()}")
+    print(f"📊 Sesión HTTP: {session.summary()}")
+    if limiter is not None:
+        print(f"📊 Límite por host: {limiter.summary()}")
+    return stats
+
+
+# ---------- EXPORTACIÓN ----------
+def export(frontier, output, incremental=False):
+    docs = smr.dedupe_docs(list(frontier.iter_results("release")))
+    if not docs:
+        print("⚠️ La frontera no tiene releases terminados.")
+        return
+    if incremental:
+        existing = smr.load_corpus(output)
+        known = smr.corpus_index(existing)
+        reused = smr.reuse_embeddings(docs, known)
+        pending = [d for d in docs if "embedding" not in d]
+        print(f"♻️ Embeddings reutilizados: {reused}; por calcular: {len(pending)}")
+        if pending:
+            smr.embed_music_data(pending)
+        docs = smr.merge_into_corpus(existing, docs)
+    else:
+        docs = smr.embed_music_data(docs)
+    smr.save_json(docs, output)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Workers del crawl de Discogs sobre una frontera compartida")
+    parser.add_argument("--frontier", default=FRONTIER_URL, help="URL SQLAlchemy de la frontera")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    s = sub.add_parser("seed", help="encolar páginas de búsqueda")
+    s.add_argument("--pages", type=int, default=smr.MAX_PAGES)
+    s.add_argument("--first-page", type=int, default=0)
+    s.add_argument("--search-limit", type=int, default=smr.SEARCH_LIMIT)
+
+    def add_rate_args(sp):
+        # la cuota por host es de la IP, no del proceso: se reparte entre los workers
+        sp.add_argument("--workers", type=int, default=1,
+                        help="workers (discover + enrich) que comparten la cuota por host")
+        sp.add_argument("--rate-share", type=float,
+                        help="fracción de la cuota para este worker (por defecto 1/--workers)")
+
+    d = sub.add_parser("discover", help="páginas de búsqueda -> IDs de release")
+    d.add_argument("--search-contexts", type=int, default=smr.SEARCH_CONTEXTS)
+    d.add_argument("--incremental", action="store_true",
+                   help="no encolar releases que ya están sin cambios en --output")
+    d.add_argument("--output", default=smr.OUTPUT_FILE)
+    d.add_argument("--follow", action="store_true", help="seguir esperando trabajo nuevo")
+    add_rate_args(d)
+
+    e = sub.add_parser("enrich", help="releases -> registros (detalle o API)")
+    e.add_argument("--mode", choices=["detail", "api"], default=smr.ENRICH_MODE)
+    e.add_argument("--concurrency", type=int, default=smr.CONCURRENCY)
+    e.add_argument("--api-workers", type=int, default=smr.API_WORKERS)
+    e.add_argument("--follow", action="store_true", help="seguir esperando trabajo nuevo")
+    e.add_argument("--browser-endpoint", default=smr.BROWSER_ENDPOINT,
+                   help="navegador persistente de browser_server.py (modo detalle)")
+    add_rate_args(e)
+
+    sub.add_parser("status", help="recuento por etapa y estado, y dead-letter")
+
+    r = sub.add_parser("requeue", help="devolver a la cola los elementos en dead-letter")
+    r.add_argument("--kind", choices=["search", "release"])
+
+    x = sub.add_parser("export", help="volcar los releases terminados al corpus con embeddings")
+    x.add_argument("--output", default=smr.OUTPUT_FILE)
+    x.add_argument("--incremental", action="store_true")
+    return parser.parse_args(argv)
+
+
+def rate_share(args):
+    if args.rate_share is not None:
+        return min(1.0, max(0.01, args.rate_share))
+    return 1.0 / max(1, args.workers)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    frontier = CrawlFrontier(args.frontier)
+    owner = worker_id()
+    t0 = time.perf_counter()
+    try:
+        if args.command == "seed":
+            n = seed(frontier, args.pages, args.search_limit, args.first_page)
+            print(f"🌱 {n} páginas de búsqueda encoladas.")
+        elif args.command == "discover":
+            known = None
+            if args.incremental:
+                known = smr.corpus_index(smr.load_corpus(args.output))
+            share = rate_share(args)
+            print(f"🚀 Worker de descubrimiento {owner} ({share:.0%} de la cuota por host)")
+            asyncio.run(discover(frontier, owner, args.search_contexts, known, args.follow, share))
+        elif args.command == "enrich":
+            share = rate_share(args)
+            print(f"🚀 Worker de enriquecimiento {owner} (modo {args.mode}, {share:.0%} de la cuota por host)")
+            asyncio.run(enrich(frontier, owner, args.mode, args.concurrency, args.api_workers, args.follow,
+                               args.browser_endpoint, share))
+        elif args.command == "status":
+            print(json.dumps(frontier.counts(), indent=2))
+            for dl in frontier.dead_letters()[:20]:
+                print(f"   💀 {dl['kind']} {dl['url']} ({dl['attempts']} intentos): {dl['error']}")
+        elif args.command == "requeue":
+            print(f"♻️ {frontier.requeue_dead(args.kind)} elementos devueltos a la cola.")
+        elif args.command == "export":
+            export(frontier, args.output, args.incremental)
+        if args.command in ("discover", "enrich"):
+            print(f"📊 Frontera: {frontier.summary()} en {time.perf_counter() - t0:.1f} s")
+    finally:
+        frontier.close()
+
+
+if __name__ == "__main__":
+    main()
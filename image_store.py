@@ -0,0 +1,334 @@
+#!/usr/bin/env python3
+# image_store.py — descarga de portadas a un almacén local direccionado por contenido
+#
+#   python image_store.py --input music_data.json                 # reescribe el corpus
+#   python scrape_music_rag.py --images --image-dir images         # al terminar el crawl
+#
+# Las URLs de metadata["image"] se descargan con la sesión HTTP compartida (pool
+# acotado de IMAGE_WORKERS tareas, limitador por host de i.discogs.com), el tipo se
+# detecta por contenido con python-magic y cada imagen se guarda una sola vez como
+# full/<sha[:2]>/<sha>.<ext>, con su miniatura en thumbs/. En el documento, "image"
+# pasa a ser la ruta local; la URL original queda en "image_url" y la miniatura en
+# "thumbnail". urls.jsonl recuerda URL -> hash: lo ya descargado no se pide otra vez.
+
+import argparse
+import asyncio
+import hashlib
+import io
+import json
+import os
+import threading
+import time
+from pathlib import Path
+
+import httpx
+import magic
+
+from discogs_http import DiscogsSession, RateLimiter, RetryPolicy, CircuitOpenError
+from corpus_io import iter_docs, open_writer
+from crawl_metrics import METRICS
+
+try:
+    from PIL import Image
+except ImportError:  # miniaturas opcionales: pip install pillow
+    Image = None
+
+# ------------------ CONFIG ------------------
+IMAGE_DIR = "images"
+IMAGE_WORKERS = 8              # descargas simultáneas
+IMAGE_CHUNK = 500              # documentos en memoria al reescribir un corpus ya guardado
+MAX_IMAGE_BYTES = 10_000_000   # se descarta lo que supere este tamaño
+THUMB_SIZE = (150, 150)        # caja máxima; se conserva la proporción
+THUMB_QUALITY = 80             # JPEG
+# tipos aceptados (detectados por contenido, no por extensión ni cabecera)
+IMAGE_TYPES = {"image/jpeg": ".jpg", "image/png": ".png", "image/webp": ".webp", "image/gif": ".gif"}
+IMAGE_HEADERS = {
+    "User-Agent": ("Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 "
+                   "(KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36"),
+    "Accept": "image/avif,image/webp,image/*,*/*;q=0.8",
+}
+# --------------------------------------------
+
+
+class ImageStore:
+    # full/ y thumbs/ por hash SHA-256 del contenido + índice URL -> hash (urls.jsonl)
+    def __init__(self, directory=IMAGE_DIR):
+        self.dir = Path(directory)
+        self.index_path = self.dir / "urls.jsonl"
+        self._lock = threading.Lock()
+        # hash -> Event: quien guarda una imagen lo marca al terminar (original y
+        # miniatura); un duplicado simultáneo espera antes de reutilizar las rutas
+        self._claimed = {}
+        self.urls = {}
+        if self.index_path.exists():
+            with open(self.index_path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        rec = json.loads(line)
+                    except ValueError:
+                        continue
+                    self.urls[rec["url"]] = rec
+        self.stats = {"stored": 0, "deduped": 0, "thumbnails": 0, "thumbnail_errors": 0, "bytes_stored": 0}
+
+    def lookup(self, url):
+        # entrada de una URL ya descargada (si su archivo sigue en disco)
+        rec = self.urls.get(url)
+        if rec and (self.dir / rec["path"]).exists():
+            return rec
+        return None
+
+    def put(self, url, body):
+        # guarda el contenido (si no estaba) y devuelve la entrada del índice;
+        # ValueError si no es una imagen de un tipo aceptado
+        mime = magic.from_buffer(body[:4096], mime=True)
+        ext = IMAGE_TYPES.get(mime)
+        if ext is None:
+            raise ValueError(f"tipo no soportado: {mime}")
+        digest = hashlib.sha256(body).hexdigest()
+        rel = Path("full") / digest[:2] / f"{digest}{ext}"
+        thumb = Path("thumbs") / digest[:2] / f"{digest}.jpg"
+        path = self.dir / rel
+        with self._lock:
+            done = self._claimed.get(digest)
+            new = done is None and not path.exists()
+            if new:
+                done = self._claimed[digest] = threading.Event()
+                self.stats["stored"] += 1
+                self.stats["bytes_stored"] += len(body)
+            else:
+                self.stats["deduped"] += 1
+        if new:
+            try:
+                path.parent.mkdir(parents=True, exist_ok=True)
+                tmp = path.with_name(f"{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+                tmp.write_bytes(body)
+                os.replace(tmp, path)
+                if Image is None or not self._thumbnail(body, self.dir / thumb):
+                    thumb = None
+            except BaseException:
+                # sin original en disco: la próxima vez que aparezca se vuelve a intentar
+                with self._lock:
+                    self._claimed.pop(digest, None)
+                raise
+            finally:
+                done.set()
+        else:
+            if done is not None:
+                done.wait()
+            if not path.exists():
+                raise OSError(f"no se pudo guardar {rel.as_posix()}")
+            if not (self.dir / thumb).exists():
+                thumb = None
+        rec = {"url": url, "sha256": digest, "mime": mime, "size": len(body), "path": rel.as_posix(),
+               "thumb": thumb.as_posix() if thumb else None}
+        with self._lock:
+            self.urls[url] = rec
+            self.dir.mkdir(parents=True, exist_ok=True)
+            with open(self.index_path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(rec, ensure_ascii=False) + "\n")
+        return rec
+
+    def _thumbnail(self, body, dest):
+        with METRICS.stage("thumbnail"):
+            try:
+                with Image.open(io.BytesIO(body)) as im:
+                    im.thumbnail(THUMB_SIZE)
+                    dest.parent.mkdir(parents=True, exist_ok=True)
+                    tmp = dest.with_name(f"{dest.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+                    im.convert("RGB").save(tmp, "JPEG", quality=THUMB_QUALITY)
+                    os.replace(tmp, dest)
+            except Exception as e:
+                print(f"      ⚠️ Miniatura fallida para {dest.name}: {e}")
+                with self._lock:
+                    self.stats["thumbnail_errors"] += 1
+                return False
+        with self._lock:
+            self.stats["thumbnails"] += 1
+        return True
+
+    def local(self, rec):
+        # rutas que se escriben en metadata (relativas al directorio de trabajo)
+        return ((self.dir / rec["path"]).as_posix(),
+                (self.dir / rec["thumb"]).as_posix() if rec.get("thumb") else None)
+
+
+def new_stats():
+    return {"docs_with_image": 0, "urls": 0, "cached": 0, "downloaded": 0, "failed": 0, "not_image": 0,
+            "too_large": 0, "bytes": 0, "rewritten": 0, "wall_s": 0.0, "digests": set()}
+
+
+async def download_images(docs, store, session, workers=IMAGE_WORKERS, stats=None):
+    # descarga las portadas de `docs` y reescribe su metadata; los contadores se
+    # acumulan en `stats` (varios lotes de un mismo corpus) y se cierran con finish_stats
+    if stats is None:
+        stats = new_stats()
+    urls = {}
+    for d in docs:
+        url = (d.get("metadata") or {}).get("image")
+        if url and url.startswith(("http://", "https://")):
+            urls.setdefault(url, []).append(d)
+    stats["docs_with_image"] += sum(len(v) for v in urls.values())
+    stats["urls"] += len(urls)
+    results = {}
+    queue = asyncio.Queue()
+    for url in urls:
+        rec = store.lookup(url)
+        if rec is not None:
+            stats["cached"] += 1
+            results[url] = rec
+        else:
+            queue.put_nowait(url)
+
+    async def worker():
+        while True:
+            try:
+                url = queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            try:
+                with METRICS.stage("image_download"):
+                    resp = await session.get(url, headers=IMAGE_HEADERS)
+                if resp.status_code != 200:
+                    stats["failed"] += 1
+                    continue
+                body = resp.content
+                if len(body) > MAX_IMAGE_BYTES:
+                    stats["too_large"] += 1
+                    continue
+                stats["bytes"] += len(body)
+                # hash, magic y miniatura fuera del bucle de eventos
+                results[url] = await asyncio.to_thread(store.put, url, body)
+                stats["downloaded"] += 1
+            except ValueError as e:
+                print(f"      ⚠️ {url}: {e}")
+                stats["not_image"] += 1
+            except (httpx.HTTPError, CircuitOpenError) as e:
+                print(f"      ⚠️ Portada no descargada ({url}): {e}")
+                stats["failed"] += 1
+                METRICS.inc("errors", stage="image_download")
+            except Exception as e:
+                # imagen corrupta, disco, magic...: una portada no tumba el lote
+                print(f"      ⚠️ Portada descartada ({url}): {type(e).__name__}: {e}")
+                stats["failed"] += 1
+                METRICS.inc("errors", stage="image_store")
+
+    t0 = time.perf_counter()
+    pending = queue.qsize()
+    await asyncio.gather(*[worker() for _ in range(max(1, min(workers, pending)))])
+    stats["wall_s"] += time.perf_counter() - t0
+
+    for url, rec in results.items():
+        path, thumb = store.local(rec)
+        for d in urls[url]:
+            meta = d["metadata"]
+            meta["image_url"] = url
+            meta["image"] = path
+            if thumb:
+                meta["thumbnail"] = thumb
+    stats["rewritten"] += sum(len(urls[u]) for u in results)
+    stats["digests"].update(r["sha256"] for r in results.values())
+    return stats
+
+
+def finish_stats(stats, store, directory):
+    # tasas y deduplicación del total, a métricas y a consola
+    stats = dict(stats)
+    wall = stats["wall_s"]
+    stats["wall_s"] = round(wall, 2)
+    stats["images_per_s"] = round(stats["downloaded"] / wall, 1) if wall else 0.0
+    stats["mb_per_s"] = round(stats["bytes"] / 1e6 / wall, 2) if wall else 0.0
+    # portadas distintas frente a documentos con portada: misma imagen en varias URLs
+    # (reediciones, variantes) o varios documentos con la misma URL
+    unique = len(stats.pop("digests"))
+    stats["unique_images"] = unique
+    stats["dedupe_ratio"] = round(1 - unique / stats["rewritten"], 3) if stats["rewritten"] else 0.0
+    stats["store"] = dict(store.stats)
+    METRICS.absorb("images", stats)
+    print(f"🖼️ Portadas: {stats['downloaded']} descargadas ({stats['images_per_s']} img/s, "
+          f"{stats['mb_per_s']} MB/s), {stats['cached']} ya en {directory}, {stats['failed']} fallidas; "
+          f"{stats['unique_images']} distintas para {stats['rewritten']} documentos "
+          f"(deduplicación {stats['dedupe_ratio']:.1%})")
+    return stats
+
+
+def _image_session(workers, rate_limit):
+    if Image is None:
+        print("ℹ️ Pillow no instalado (pip install pillow): se guardan las portadas sin miniaturas.")
+    return DiscogsSession(max_connections=workers, limiter=RateLimiter() if rate_limit else None,
+                          retry=RetryPolicy())
+
+
+async def download_cover_images_async(docs, directory=IMAGE_DIR, workers=IMAGE_WORKERS, rate_limit=True,
+                                      session=None):
+    store = ImageStore(directory)
+    own = session is None
+    if own:
+        session = _image_session(workers, rate_limit)
+    try:
+        stats = await download_images(docs, store, session, workers)
+    finally:
+        if own:
+            await session.aclose()
+    return finish_stats(stats, store, directory)
+
+
+def download_cover_images(docs, directory=IMAGE_DIR, workers=IMAGE_WORKERS, rate_limit=True):
+    return asyncio.run(download_cover_images_async(docs, directory, workers, rate_limit))
+
+
+async def localize_corpus_async(path, output=None, directory=IMAGE_DIR, workers=IMAGE_WORKERS,
+                                rate_limit=True, chunk=IMAGE_CHUNK):
+    # corpus ya escrito (p.ej. por el pipeline en flujo) -> mismo corpus con rutas locales.
+    # Se lee y se escribe por lotes de `chunk` documentos (memoria constante con .jsonl;
+    # un .json se carga entero al leerlo) y la salida va a <out>.part hasta el final
+    out = output or path
+    store = ImageStore(directory)
+    session = _image_session(workers, rate_limit)
+    stats = new_stats()
+    writer = open_writer(out)
+    try:
+        batch = []
+        for doc in iter_docs(path):
+            batch.append(doc)
+            if len(batch) >= chunk:
+                await download_images(batch, store, session, workers, stats)
+                for d in batch:
+                    writer.write(d)
+                batch = []
+        if batch:
+            await download_images(batch, store, session, workers, stats)
+            for d in batch:
+                writer.write(d)
+    except BaseException:
+        writer.abort()
+        raise
+    finally:
+        await session.aclose()
+    writer.close()
+    print(f"📚 {writer.count} documentos de {path}")
+    stats = finish_stats(stats, store, directory)
+    print(f"💾 Corpus con rutas locales en {out}")
+    return stats
+
+
+def localize_corpus(path, output=None, directory=IMAGE_DIR, workers=IMAGE_WORKERS, rate_limit=True,
+                    chunk=IMAGE_CHUNK):
+    return asyncio.run(localize_corpus_async(path, output, directory, workers, rate_limit, chunk))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Descarga las portadas de un corpus a un almacén local")
+    parser.add_argument("--input", required=True, help="corpus .json o .jsonl(.gz)")
+    parser.add_argument("--output", help="corpus reescrito (por defecto, el mismo --input)")
+    parser.add_argument("--image-dir", default=IMAGE_DIR)
+    parser.add_argument("--workers", type=int, default=IMAGE_WORKERS, help="descargas simultáneas")
+    parser.add_argument("--chunk", type=int, default=IMAGE_CHUNK, help="documentos por lote al reescribir")
+    parser.add_argument("--rate-limit", action=argparse.BooleanOptionalAction, default=True,
+                        help="limitador por host (i.discogs.com)")
+    args = parser.parse_args(argv)
+
+    localize_corpus(args.input, args.output, args.image_dir, args.workers, args.rate_limit, args.chunk)
+
+
+if __name__ == "__main__":
+    main()
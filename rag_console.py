@@ -1,26 +1,37 @@
 #!/usr/bin/env python3
 # rag_console.py — búsqueda semántica sobre datos musicales
 
-import json
+import heapq
+import os
 import numpy as np
 from sentence_transformers import SentenceTransformer
 from pathlib import Path
 
+from corpus_io import is_jsonl, iter_docs
+
 # ------------------ CONFIG ------------------
-DATA_FILE = "music_data.json"
+DATA_FILE = os.environ.get("MUSIC_DATA_FILE", "music_data.json")  # .json o .jsonl(.gz)
 MODEL_NAME = "all-MiniLM-L6-v2"
 TOP_K = 3  # número de resultados más similares que se mostrarán
+SEARCH_CHUNK = 10000  # documentos por bloque al buscar directamente sobre un .jsonl
 # --------------------------------------------
 
 # ---------- CARGAR DATOS ----------
-def load_music_data():
-    path = Path(DATA_FILE)
-    if not path.exists():
-        print("⚠️ No se encuentra el archivo music_data.json. Ejecuta primero scrape_music_rag.py.")
+def check_data_file():
+    if not Path(DATA_FILE).exists():
+        print(f"⚠️ No se encuentra el archivo {DATA_FILE}. Ejecuta primero scrape_music_rag.py.")
         exit()
-    with path.open("r", encoding="utf-8") as f:
-        data = json.load(f)
-    return data
+
+
+def load_music_data():
+    check_data_file()
+    return list(iter_docs(DATA_FILE))
+
+
+def iter_music_data():
+    # documento a documento: con .jsonl no se carga el corpus entero en memoria
+    check_data_file()
+    return iter_docs(DATA_FILE)
 
 
 # ---------- CARGAR MODELO ----------
@@ -48,10 +59,47 @@ def semantic_search(query, docs, model, top_k=TOP_K):
     return [(docs[i], float(similarities[i])) for i in top_indices]
 
 
+def semantic_search_stream(query, docs_iter, model, top_k=TOP_K, chunk_size=SEARCH_CHUNK):
+    # igual que semantic_search pero por bloques: memoria acotada a `chunk_size`
+    # documentos más los `top_k` mejores vistos hasta el momento
+    query_emb = model.encode([query], convert_to_numpy=True)[0]
+    query_norm = np.linalg.norm(query_emb)
+    best = []  # montículo de (similitud, orden, doc)
+    seen = 0
+
+    def score(chunk):
+        nonlocal seen
+        doc_embs = np.array([d["embedding"] for d in chunk])
+        sims = np.dot(doc_embs, query_emb) / (np.linalg.norm(doc_embs, axis=1) * query_norm)
+        for d, s in zip(chunk, sims):
+            item = (float(s), -seen, d)
+            seen += 1
+            if len(best) < top_k:
+                heapq.heappush(best, item)
+            elif item[:2] > best[0][:2]:
+                heapq.heapreplace(best, item)
+
+    chunk = []
+    for d in docs_iter:
+        if "embedding" not in d:
+            continue
+        chunk.append(d)
+        if len(chunk) >= chunk_size:
+            score(chunk)
+            chunk = []
+    if chunk:
+        score(chunk)
+    return [(d, s) for s, _, d in sorted(best, key=lambda x: x[:2], reverse=True)]
+
+
 # ---------- MAIN ----------
 def main():
     print("🎧 Bienvenido al buscador musical RAG (por consola)")
-    docs = load_music_data()
+    # un .jsonl se recorre en cada consulta en vez de cargarlo (corpus muy grandes)
+    streaming = is_jsonl(DATA_FILE)
+    docs = None if streaming else load_music_data()
+    if streaming:
+        check_data_file()
     model = load_model()
 
     while True:
@@ -60,7 +108,10 @@ def main():
             print("👋 Adiós!")
             break
 
-        results = semantic_search(query, docs, model)
+        if streaming:
+            results = semantic_search_stream(query, iter_music_data(), model)
+        else:
+            results = semantic_search(query, docs, model)
         print("\n🎶 Resultados más parecidos:")
         for doc, score in results:
             print(f"\n🎵 {doc['title']} — {doc['artist']}")
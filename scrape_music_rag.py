@@ -4,272 +4,1222 @@
 import time
 import json
 from pathlib import Path
-from playwright.sync_api import sync_playwright
+from playwright.async_api import async_playwright
+from playwright.async_api import TimeoutError as PlaywrightTimeoutError
 from sentence_transformers import SentenceTransformer
+from discogs_extract import (PROFILE_KEYS, structured_meta, finalize_detail_meta, entity_key,
+                             merge_api_meta, build_record as build_record_for)
+from discogs_http import (DiscogsSession, ReleaseFastPath, DiscogsApiClient, RateLimiter, RetryPolicy,
+                          api_path_for_url, parse_retry_after, HTTP2, RETRY_ATTEMPTS)
+from discogs_cache import HttpCache, CACHE_FILE
+from crawl_checkpoint import CrawlCheckpoint, CHECKPOINT_DIR, CHECKPOINT_EVERY
+from stream_pipeline import StreamPipeline, EMBED_BATCH
+from corpus_io import is_jsonl, iter_docs, write_docs
+from browser_server import open_browser
+from crawl_metrics import METRICS, METRICS_DIR, METRICS_INTERVAL_S
+from crawl_archive import CrawlArchive
+from image_store import localize_corpus, IMAGE_DIR, IMAGE_WORKERS
 import re
 import os
-import urllib.request
-import urllib.error
+import argparse
+import asyncio
+from contextlib import asynccontextmanager, aclosing
+from urllib.parse import urlparse
 
 # ------------------ CONFIG ------------------
-BASE_URL = "https://www.discogs.com"
+BASE_URL = os.environ.get("DISCOGS_BASE_URL", "https://www.discogs.com")  # fixture_server.py en benchmarks
 OUTPUT_FILE = "music_data.json"
 MAX_PAGES = 1
 EMBED_MODEL = "all-MiniLM-L6-v2"
 HEADLESS = True                # ✅ Sin ventanas
 SLOW_MO_MS = 200
+CONCURRENCY = 4                # páginas de detalle abiertas en paralelo
+PAGE_MAX_USES = 50             # navegaciones por pestaña antes de recrearla
+BLOCK_PROFILE = "text"         # "off" | "text" | "allowlist" (ver ResourceBlocker)
+READINESS = "selector"         # "selector" | "legacy" (networkidle + esperas fijas)
+CARD_EXTRACTION = "batch"      # "batch" (un solo page.evaluate) | "legacy" (handle a handle)
+DETAIL_EXTRACTION = "oneshot"  # "oneshot" | "legacy" | "compare" (ambas, con tiempos)
+FAST_PATH = True               # probar primero el release por HTTP, sin navegador
+ENRICH_MODE = "detail"         # "detail" (página de release) | "api" (solo API de Discogs)
+API_WORKERS = 8                # peticiones simultáneas a la API en modo "api"
+RATE_LIMIT = True              # token bucket + AIMD por host de Discogs (ver discogs_http)
+HTTP_CACHE = True              # caché SQLite con revalidación para la API (ver discogs_cache)
+CHECKPOINT = True              # volcar progreso a CHECKPOINT_DIR para poder usar --resume
+PAGINATION = "sequential"      # "sequential" (botón siguiente) | "parallel" (?page=N en varios contextos)
+SEARCH_CONTEXTS = 4            # contextos de navegador para la paginación paralela
+SEARCH_LIMIT = 50              # resultados por página de búsqueda en modo paralelo (25/50/100/250)
+STREAM = False                 # scraping, embeddings y escritura solapados (stream_pipeline.py)
+BROWSER_ENDPOINT = os.environ.get("BROWSER_ENDPOINT")  # navegador persistente (browser_server.py); "auto" = el del perfil
+IMAGES = False                 # descargar portadas a IMAGE_DIR y reescribir metadata["image"] (image_store.py)
+CAPTURE_DIR = None             # directorio donde grabar todas las respuestas (crawl_archive.py replay)
 # --------------------------------------------
 
-def scrape_music_site(max_pages=MAX_PAGES):
-    print("🎵 Iniciando scraping musical en Discogs...")
-    results = []
+USER_AGENT = ("Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
+              "AppleWebKit/537.36 (KHTML, like Gecko) "
+              "Chrome/120.0.0.0 Safari/537.36")
+
+CARD_SELECTOR = ".card, .search_result, article, .card_release, li"
+CARD_TITLE_SELECTOR = "h4, .card__title, .search_result_title, a.card_release_title"
+CARD_ARTIST_SELECTOR = ".card__artist, .search_result_artist, .card_release_artist, .artist"
+RELEASE_HREF_RE = re.compile(r"/release/\d+|/master/\d+")
+RELEASE_ID_RE = re.compile(r"/(?:release|master)/(\d+)")
+
+# perfil de bloqueo de red: solo leemos texto y el atributo src de una imagen
+BLOCKED_RESOURCE_TYPES = {"image", "media", "font", "stylesheet"}
+BLOCKED_DOMAINS = (
+    "doubleclick.net", "googlesyndication.com", "googletagmanager.com",
+    "google-analytics.com", "googletagservices.com", "adservice.google.com",
+    "amazon-adsystem.com", "adnxs.com", "pubmatic.com", "rubiconproject.com",
+    "criteo.com", "criteo.net", "taboola.com", "outbrain.com", "scorecardresearch.com",
+    "quantserve.com", "quantcount.com", "facebook.net", "hotjar.com", "newrelic.com",
+    "nr-data.net", "sentry.io", "onetrust.com", "cookielaw.org",
+)
+ALLOWED_DOMAINS = ("discogs.com",)  # modo "allowlist": solo estos dominios pasan
+# peticiones del navegador que consumen token del limitador; las navegaciones lo
+# consumen en PageReadiness, antes de page.goto
+THROTTLED_RESOURCE_TYPES = {"document", "xhr", "fetch"}
+# contexto persistente (browser_server.py): con context.route() Playwright desactiva la
+# caché HTTP del navegador, así que allí se bloquea por CDP (Network.setBlockedURLs)
+# con patrones de URL equivalentes a BLOCKED_RESOURCE_TYPES / BLOCKED_DOMAINS
+BLOCKED_URL_PATTERNS = {
+    "image": ("*.png*", "*.jpg*", "*.jpeg*", "*.gif*", "*.webp*", "*.avif*", "*.svg*", "*.ico*"),
+    "media": ("*.mp4*", "*.webm*", "*.mp3*", "*.m4a*", "*.ogg*"),
+    "font": ("*.woff*", "*.ttf*", "*.otf*", "*.eot*"),
+    "stylesheet": ("*.css*",),
+}
+# selectores que indican que la página ya tiene lo que leen los extractores
+_CARD_RELEASE_LINK = (':is(.card, .search_result, article, .card_release, li) a[href*="/release/"], '
+                      ':is(.card, .search_result, article, .card_release, li) a[href*="/master/"]')
+READY_SELECTORS = {
+    "search": _CARD_RELEASE_LINK,
+    "pagination": _CARD_RELEASE_LINK,
+    "detail": '.releaseprofile, div.profile, .profile, dt, table th, script[type="application/ld+json"]',
+}
+READY_TIMEOUTS_MS = {"search": 20000, "pagination": 15000, "detail": 5000}
+# comportamiento anterior: (wait_until, timeout goto, espera fija) — solo si falla el selector
+LEGACY_WAITS = {
+    "search": ("networkidle", 90000, 3000),
+    "pagination": ("networkidle", 90000, 2000),
+    "detail": ("domcontentloaded", 15000, 500),
+}
+# tamaño medio aproximado por tipo, para estimar los bytes ahorrados al abortar
+EST_BYTES_BY_TYPE = {
+    "image": 60_000, "media": 500_000, "font": 40_000, "stylesheet": 30_000,
+    "script": 45_000, "xhr": 5_000, "fetch": 5_000, "document": 80_000,
+}
+
+
+# ---------- POOL DE PÁGINAS DE DETALLE ----------
+class PagePool:
+    # conjunto fijo de pestañas que se reciclan entre releases (se navega en sitio);
+    # una pestaña solo se recrea si crashea/se cierra o tras `max_uses` navegaciones
+    def __init__(self, context, size=CONCURRENCY, max_uses=PAGE_MAX_USES, setup=None):
+        self.context = context
+        # `setup(page)` (async) prepara cada pestaña nueva, p.ej. ResourceBlocker.attach
+        self.setup = setup
+        self.size = max(1, size)
+        self.max_uses = max_uses
+        self._idle = asyncio.Queue()
+        self._uses = {}
+        self._crashed = set()
+        self.stats = {"acquires": 0, "reuses": 0, "recreations": 0, "created": 0, "wait_s": 0.0}
+
+    async def _new_page(self):
+        page = await self.context.new_page()
+        if self.setup is not None:
+            await self.setup(page)
+        page.on("crash", lambda pg: self._crashed.add(pg))
+        self._uses[page] = 0
+        self.stats["created"] += 1
+        return page
+
+    async def _recreate(self, page):
+        self._uses.pop(page, None)
+        self._crashed.discard(page)
+        try:
+            if not page.is_closed():
+                await page.close()
+        except Exception:
+            pass
+        self.stats["recreations"] += 1
+        return await self._new_page()
+
+    async def start(self):
+        # pestañas precalentadas: se crean todas antes de empezar
+        for _ in range(self.size):
+            self._idle.put_nowait(await self._new_page())
+        return self
+
+    async def acquire(self):
+        t0 = time.perf_counter()
+        page = await self._idle.get()
+        self.stats["wait_s"] += time.perf_counter() - t0
+        self.stats["acquires"] += 1
+        try:
+            uses = self._uses.get(page, self.max_uses)
+            if page.is_closed() or page in self._crashed or uses >= self.max_uses:
+                page = await self._recreate(page)
+            elif uses > 0:
+                self.stats["reuses"] += 1
+        except Exception:
+            # nunca perder un hueco del pool aunque falle la recreación
+            self._idle.put_nowait(page)
+            raise
+        self._uses[page] += 1
+        return page
+
+    async def release(self, page):
+        if page.is_closed() or page in self._crashed:
+            try:
+                page = await self._recreate(page)
+            except Exception as e:
+                print(f"      ⚠️ No se pudo recrear la pestaña del pool: {e}")
+        self._idle.put_nowait(page)
+
+    @asynccontextmanager
+    async def page(self):
+        page = await self.acquire()
+        try:
+            yield page
+        finally:
+            await self.release(page)
+
+    async def close(self):
+        for page in list(self._uses):
+            try:
+                await page.close()
+            except Exception:
+                pass
+        self._uses.clear()
+
+    def summary(self):
+        acquires = self.stats["acquires"]
+        mean_wait = (self.stats["wait_s"] / acquires) if acquires else 0.0
+        return {
+            "size": self.size,
+            "acquires": acquires,
+            "reuses": self.stats["reuses"],
+            "recreations": self.stats["recreations"],
+            "created": self.stats["created"],
+            "mean_acquire_wait_ms": round(mean_wait * 1000, 2),
+        }
+
+
+# ---------- BLOQUEO DE RECURSOS ----------
+def _domain_matches(host, domains):
+    return any(host == d or host.endswith("." + d) for d in domains)
+
+
+class ResourceBlocker:
+    # intercepta todas las peticiones del contexto (context.route) y aborta las que
+    # no hacen falta para leer el texto de búsqueda/detalle:
+    #   "text"      -> aborta BLOCKED_RESOURCE_TYPES y dominios de BLOCKED_DOMAINS
+    #   "allowlist" -> además aborta todo host fuera de ALLOWED_DOMAINS
+    # Si se le pasa un RateLimiter, las llamadas xhr/fetch que deja pasar respetan
+    # además el ritmo por host y todas las respuestas alimentan el limitador.
+    # En el contexto persistente no se usa context.route() (desactivaría la caché
+    # HTTP compartida entre ejecuciones): se bloquea por CDP en cada pestaña (attach).
+    def __init__(self, profile=BLOCK_PROFILE, blocked_types=BLOCKED_RESOURCE_TYPES,
+                 blocked_domains=BLOCKED_DOMAINS, allowed_domains=ALLOWED_DOMAINS, limiter=None):
+        if profile not in ("off", "text", "allowlist"):
+            raise ValueError(f"Perfil de bloqueo desconocido: {profile}")
+        self.profile = profile
+        self.blocked_types = set(blocked_types)
+        self.blocked_domains = tuple(blocked_domains)
+        self.allowed_domains = tuple(allowed_domains)
+        self.limiter = limiter
+        self._current = {}    # page -> contadores de la navegación en curso
+        self._requests = {}   # request en vuelo -> contadores de la navegación que la lanzó
+        self.totals = {}      # kind -> sumas de las navegaciones cerradas (memoria constante)
+        self._routed = set()  # contextos con context.route (el resto se cuenta por eventos)
+        self.cdp = False
 
-    with sync_playwright() as p:
-        browser = p.chromium.launch(headless=HEADLESS)
-        context = browser.new_context(
-            user_agent="Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
-                       "AppleWebKit/537.36 (KHTML, like Gecko) "
-                       "Chrome/120.0.0.0 Safari/537.36",
-            viewport={"width": 1280, "height": 800},
+    async def install(self, context, persistent=False):
+        if self.profile == "off" and self.limiter is None:
+            return self
+        if self.profile != "off":
+            if persistent:
+                # solo se bloquea: no hay route, y el limitador ve las respuestas igualmente
+                self.cdp = True
+                if self.profile == "allowlist":
+                    print("ℹ️ Perfil allowlist no aplicable por CDP en el navegador persistente; se usa 'text'.")
+            else:
+                await context.route("**/*", self._handle)
+                self._routed.add(context)
+        context.on("response", self._on_response)
+        context.on("requestfailed", self._on_failed)
+        return self
+
+    def cdp_patterns(self):
+        patterns = []
+        for d in self.blocked_domains:
+            patterns += [f"*://{d}/*", f"*://*.{d}/*"]
+        for t in self.blocked_types:
+            patterns += BLOCKED_URL_PATTERNS.get(t, ())
+        return patterns
+
+    async def attach(self, page):
+        # pestañas del contexto persistente: bloqueo en el propio Chromium
+        if not self.cdp:
+            return
+        try:
+            cdp = await page.context.new_cdp_session(page)
+            await cdp.send("Network.enable")
+            await cdp.send("Network.setBlockedURLs", {"urls": self.cdp_patterns()})
+        except Exception as e:
+            print(f"      ⚠️ No se pudo activar el bloqueo por CDP: {e}")
+
+    def block_reason(self, resource_type, url):
+        if self.profile == "off":
+            return None
+        host = urlparse(url).hostname or ""
+        if self.profile == "allowlist" and not _domain_matches(host, self.allowed_domains):
+            return "domain"
+        if _domain_matches(host, self.blocked_domains):
+            return "domain"
+        if resource_type in self.blocked_types:
+            return "type"
+        return None
+
+    def _is_routed(self, request):
+        try:
+            return request.frame.page.context in self._routed
+        except Exception:
+            return False
+
+    def _counters(self, request):
+        try:
+            page = request.frame.page
+        except Exception:
+            return None
+        return self._current.setdefault(page, {
+            "allowed": 0, "blocked": 0, "bytes_loaded": 0, "bytes_saved_est": 0,
+        })
+
+    async def _handle(self, route):
+        request = route.request
+        reason = self.block_reason(request.resource_type, request.url)
+        c = self._counters(request)
+        if reason:
+            if c is not None:
+                c["blocked"] += 1
+                c["bytes_saved_est"] += EST_BYTES_BY_TYPE.get(request.resource_type, 10_000)
+            await route.abort("blockedbyclient")
+        else:
+            if c is not None:
+                c["allowed"] += 1
+                self._requests[request] = c
+            if self.limiter is not None and self._throttled(request):
+                await self.limiter.wait_token(request.url)
+            await route.continue_()
+
+    @staticmethod
+    def _throttled(request):
+        # el presupuesto por host cuenta páginas y llamadas a la API, no cada
+        # script o subrecurso que carga una página ya contada. Las navegaciones
+        # ya tomaron su token en PageReadiness
+        try:
+            if request.is_navigation_request():
+                return False
+        except Exception:
+            pass
+        return request.resource_type in THROTTLED_RESOURCE_TYPES
+
+    def _on_response(self, response):
+        if self.limiter is not None:
+            self.limiter.observe(response.url, response.status, response.headers)
+        c = self._requests.pop(response.request, None)
+        if c is None:
+            c = self._counters(response.request)
+            if c is None:
+                return
+            if not self._is_routed(response.request):
+                # sin route nadie contó la petición al salir
+                c["allowed"] += 1
+        try:
+            n = int(response.headers.get("content-length") or 0)
+        except ValueError:
+            return
+        if "kind" in c:
+            # respuesta tardía de una navegación ya cerrada (pestaña del pool reutilizada):
+            # se suma a su tipo, no a la navegación siguiente
+            self.totals[c["kind"]]["bytes_loaded"] += n
+            METRICS.inc("browser_bytes", n, kind=c["kind"])
+        else:
+            c["bytes_loaded"] += n
+
+    def _on_failed(self, request):
+        self._requests.pop(request, None)
+        if self.cdp and "BLOCKED_BY_CLIENT" in (request.failure or "") and not self._is_routed(request):
+            c = self._counters(request)
+            if c is not None:
+                c["blocked"] += 1
+                c["bytes_saved_est"] += EST_BYTES_BY_TYPE.get(request.resource_type, 10_000)
+
+    def take_page_stats(self, page, url, kind):
+        # cierra la contabilidad de una navegación (las pestañas del pool se reutilizan)
+        c = self._current.pop(page, None)
+        if c is None:
+            return None
+        entry = {"url": url, "kind": kind, **c}
+        c["kind"] = kind
+        t = self.totals.setdefault(kind, {"pages": 0, "allowed": 0, "blocked": 0,
+                                          "bytes_loaded": 0, "bytes_saved_est": 0})
+        t["pages"] += 1
+        for k in ("allowed", "blocked", "bytes_loaded", "bytes_saved_est"):
+            t[k] += entry[k]
+        METRICS.inc("browser_requests", c["allowed"], kind=kind)
+        METRICS.inc("browser_blocked_requests", c["blocked"], kind=kind)
+        METRICS.inc("browser_bytes", c["bytes_loaded"], kind=kind)
+        return entry
+
+    def summary(self):
+        out = {"profile": self.profile, "pages": sum(t["pages"] for t in self.totals.values())}
+        for kind in ("search", "detail"):
+            t = self.totals.get(kind)
+            if not t:
+                continue
+            n = t["pages"]
+            out[kind] = {
+                "pages": n,
+                "blocked_per_page": round(t["blocked"] / n, 1),
+                "allowed_per_page": round(t["allowed"] / n, 1),
+                "kb_loaded_per_page": round(t["bytes_loaded"] / n / 1024, 1),
+                "kb_saved_est_per_page": round(t["bytes_saved_est"] / n / 1024, 1),
+            }
+        return out
+
+
+# ---------- ESPERAS POR SELECTOR ----------
+class PageReadiness:
+    # navega con domcontentloaded y espera al selector que necesita el extractor de
+    # cada tipo de página; solo si no aparece a tiempo se recurre a networkidle + sleep
+    # La navegación en sí pasa por la RetryPolicy compartida si se le da una.
+    def __init__(self, mode=READINESS, selectors=READY_SELECTORS, timeouts_ms=READY_TIMEOUTS_MS, retry=None,
+                 limiter=None):
+        if mode not in ("selector", "legacy"):
+            raise ValueError(f"Modo de espera desconocido: {mode}")
+        self.mode = mode
+        self.retry = retry
+        # cada navegación (y cada reintento) consume un token del host de destino
+        self.limiter = limiter
+        self.selectors = selectors
+        self.timeouts_ms = timeouts_ms
+        self.stats = {}
+
+    def _stats(self, kind):
+        return self.stats.setdefault(kind, {"pages": 0, "goto_s": 0.0, "wait_s": 0.0, "fallbacks": 0})
+
+    async def _navigate(self, page, url, wait_until, timeout):
+        async def attempt():
+            if self.limiter is not None:
+                await self.limiter.wait_token(url)
+            return await page.goto(url, wait_until=wait_until, timeout=timeout)
+
+        if self.retry is None:
+            return await attempt()
+        return await self.retry.run(
+            url, attempt,
+            status_of=lambda r: r.status if r else None,
+            retry_after_of=lambda r: parse_retry_after(r.headers.get("retry-after"), default=None) if r else None,
         )
-        page = context.new_page()
 
-        search_url = f"{BASE_URL}/search/?q=&type=release"
-        print(f"🔍 Navegando a: {search_url}")
-        page.goto(search_url, wait_until="networkidle", timeout=90000)
-        page.wait_for_timeout(3000)
+    async def goto(self, page, url, kind):
+        # devuelve la respuesta de la navegación (None si Playwright no la da)
+        with METRICS.stage(f"{kind}_goto"):
+            return await self._goto(page, url, kind)
 
-        for page_idx in range(max_pages):
-            print(f"\n📄 Procesando página {page_idx + 1}...")
-            items = page.query_selector_all(".card, .search_result, article, .card_release, li")
-            if not items:
-                print("⚠️ No se encontraron resultados visibles.")
-                break
+    async def _goto(self, page, url, kind):
+        wait_until, goto_timeout, sleep_ms = LEGACY_WAITS[kind]
+        st = self._stats(kind)
+        st["pages"] += 1
+        t0 = time.perf_counter()
+        if self.mode == "legacy":
+            try:
+                resp = await self._navigate(page, url, wait_until, goto_timeout)
+            finally:
+                t1 = time.perf_counter()
+                st["goto_s"] += t1 - t0
+            await page.wait_for_timeout(sleep_ms)
+            st["wait_s"] += time.perf_counter() - t1
+            return resp
 
-            for idx, it in enumerate(items):
+        try:
+            resp = await self._navigate(page, url, "domcontentloaded", goto_timeout)
+        finally:
+            t1 = time.perf_counter()
+            st["goto_s"] += t1 - t0
+        try:
+            await page.wait_for_selector(self.selectors[kind], state="attached",
+                                         timeout=self.timeouts_ms[kind])
+        except PlaywrightTimeoutError:
+            # el selector no apareció: volver al comportamiento anterior
+            st["fallbacks"] += 1
+            if wait_until == "networkidle":
                 try:
-                    title_el = it.query_selector("h4, .card__title, .search_result_title, a.card_release_title")
-                    title = title_el.inner_text().strip() if title_el else ""
+                    await page.wait_for_load_state("networkidle", timeout=goto_timeout)
+                except PlaywrightTimeoutError:
+                    pass
+            await page.wait_for_timeout(sleep_ms)
+        finally:
+            st["wait_s"] += time.perf_counter() - t1
+        return resp
 
-                    artist_el = it.query_selector(".card__artist, .search_result_artist, .card_release_artist, .artist")
-                    artist = artist_el.inner_text().strip() if artist_el else ""
+    def summary(self):
+        out = {"mode": self.mode}
+        for kind, st in self.stats.items():
+            n = st["pages"] or 1
+            out[kind] = {
+                "pages": st["pages"],
+                "fallbacks": st["fallbacks"],
+                "goto_s": round(st["goto_s"], 2),
+                "wait_s": round(st["wait_s"], 2),
+                "mean_wait_ms": round(st["wait_s"] / n * 1000, 1),
+            }
+        return out
 
-                    anchor = it.query_selector("a")
-                    href = anchor.get_attribute("href") if anchor else ""
-                    if not href:
-                        continue
 
-                    # ✅ solo seguimos si es un release/master válido (con ID numérico)
-                    # Excluir rutas como /release/add y otras páginas no-numéricas
-                    if not re.search(r"/release/\d+|/master/\d+", href):
-                        continue
+def status_of(response):
+    # estado HTTP de una navegación; 0 si no hubo respuesta (about:blank, misma URL)
+    return response.status if response is not None else 0
 
-                    # evitar entradas de UI o banners genéricos
-                    if title and title.strip().lower() in ("welcome", "bienvenido"):
-                        continue
 
-                    url = href if href.startswith("http") else (BASE_URL + href)
+class TimingStats:
+    # acumulador sencillo de tiempos por nombre (n, total, media)
+    def __init__(self):
+        self.stats = {}
 
-                    # Intentar parsear la página de release para metadata más completa
-                    meta = {}
-                    try:
-                        def parse_release_page(page_obj):
-                            m = {}
-                            # intentos por varios selectores comunes en Discogs
-                            # perfil clave: pares label/value
-                            rows = page_obj.query_selector_all(".releaseprofile, div.profile, .profile")
-                            if rows:
-                                # si hay un contenedor grande, buscar hijos label/value
-                                pairs = page_obj.query_selector_all(".release .release-meta, .profile div, .release-profile div")
-                                for i in range(0, len(pairs) - 1):
-                                    try:
-                                        label = pairs[i].inner_text().strip().replace(":", "")
-                                        val = pairs[i + 1].inner_text().strip()
-                                    except Exception:
-                                        continue
-                                    if not label:
-                                        continue
-                                    key = label.lower()
-                                    if key in ["label", "series", "format", "country", "released", "genre", "style"]:
-                                        m[key] = val
-
-                            # fallback: buscar listas dt/dd o th/td
-                            dts = page_obj.query_selector_all("dt")
-                            dds = page_obj.query_selector_all("dd")
-                            if dts and dds and len(dts) == len(dds):
-                                for dt, dd in zip(dts, dds):
-                                    k = dt.inner_text().strip().replace(":", "").lower()
-                                    v = dd.inner_text().strip()
-                                    if k in ["label", "series", "format", "country", "released", "genre", "style"]:
-                                        m[k] = v
-
-                            # imagen: diferentes selectores según plantilla
-                            img = page_obj.query_selector("img.image_gallery_image") or page_obj.query_selector("img#large_image, .thumbnail img, .image_gallery img")
-                            if img:
-                                try:
-                                    m["image"] = img.get_attribute("src") or img.get_attribute("data-src")
-                                except Exception:
-                                    pass
-
-                            # intentar extraer artista/título desde la página de detalle si faltan
-                            try:
-                                if not title:
-                                    t = page_obj.query_selector("h1, .title, .release-title")
-                                    if t:
-                                        m.setdefault("_title_from_detail", t.inner_text().strip())
-                                if not artist:
-                                    a = page_obj.query_selector("a.artist, .artist_name, .release-artist")
-                                    if a:
-                                        m.setdefault("_artist_from_detail", a.inner_text().strip())
-                            except Exception:
-                                pass
-
-                            return m
-
-                        page2 = context.new_page()
-                        page2.goto(url, wait_until="domcontentloaded", timeout=15000)
-                        # esperar un poco para que cargue contenido dinámico
-                        page2.wait_for_timeout(500)
-                        meta = parse_release_page(page2)
-                        page2.close()
-                    except Exception as e:
-                        print(f"      ⚠️ Detalle omitido para {title or 'sin título'}: {e}")
-                        # no continuar: queremos incluir el item aunque falte metadata
+    def add(self, name, seconds):
+        st = self.stats.setdefault(name, {"n": 0, "total_s": 0.0})
+        st["n"] += 1
+        st["total_s"] += seconds
+
+    def count(self, name, n=1):
+        self.stats.setdefault(name, {"n": 0, "total_s": 0.0})["n"] += n
+
+    def summary(self):
+        out = {}
+        for name, st in self.stats.items():
+            out[name] = {"n": st["n"], "total_s": round(st["total_s"], 3)}
+            if st["total_s"]:
+                out[name]["mean_ms"] = round(st["total_s"] / st["n"] * 1000, 2)
+        return out
+
+
+class CrawlRuntime:
+    # objetos compartidos por todas las tareas de un crawl
+    def __init__(self, pool, blocker, readiness, detail_extraction=DETAIL_EXTRACTION, fast_path=None, api=None):
+        self.pool = pool
+        self.api = api
+        self.blocker = blocker
+        self.readiness = readiness
+        self.detail_extraction = detail_extraction
+        self.detail_timing = TimingStats()
+        self.fast_path = fast_path
+        self.path_counts = {"http": 0, "browser": 0, "api": 0}
+        self.checkpoint = None
+        self.archive = None
+
+    def record_done(self, record):
+        if record is not None:
+            METRICS.inc("records", fetch_path=record["fetch_path"])
+        if record is not None and self.checkpoint is not None:
+            self.checkpoint.add(record)
+        return record
+
+    def path_summary(self):
+        out = dict(self.path_counts)
+        detail_total = self.path_counts["http"] + self.path_counts["browser"]
+        out["http_hit_rate"] = round(self.path_counts["http"] / detail_total, 3) if detail_total else 0.0
+        if self.fast_path:
+            out["fast_path"] = self.fast_path.summary()
+        return out
+
+
+# ---------- TARJETAS DE RESULTADOS ----------
+# extracción de todas las tarjetas en un único viaje al navegador. Los contenedores
+# con otra tarjeta dentro que a su vez enlaza a un release/master (p.ej. el <li> de
+# la lista de resultados) no son resultados reales y se saltan; un <li>/<article>
+# anidado sin enlace (acciones, chips de formato) no invalida la tarjeta.
+# `idx` conserva la posición en CARD_SELECTOR.
+EXTRACT_CARDS_JS = """
+([cardSel, titleSel, artistSel, hrefPattern]) => {
+    const hrefRe = new RegExp(hrefPattern);
+    const items = Array.from(document.querySelectorAll(cardSel));
+    const hasReleaseLink = (el) =>
+        Array.from(el.querySelectorAll("a")).some(a => hrefRe.test(a.getAttribute("href") || ""));
+    const cards = [];
+    items.forEach((it, idx) => {
+        if (Array.from(it.querySelectorAll(cardSel)).some(hasReleaseLink)) return;
+        const a = it.querySelector("a");
+        const href = a ? a.getAttribute("href") : "";
+        if (!href || !hrefRe.test(href)) return;
+        const t = it.querySelector(titleSel);
+        const title = t ? t.innerText.trim() : "";
+        const low = title.toLowerCase();
+        if (low === "welcome" || low === "bienvenido") return;
+        const ar = it.querySelector(artistSel);
+        const artist = ar ? ar.innerText.trim() : "";
+        cards.push({idx, title, artist, href});
+    });
+    return {count: items.length, cards};
+}
+"""
+
+
+async def extract_search_cards(page, mode=CARD_EXTRACTION):
+    # devuelve (nº de elementos encontrados, [(idx, title, artist, url), ...])
+    t0 = time.perf_counter()
+    try:
+        n_items, cards = await _extract_search_cards(page, mode)
+    except Exception:
+        METRICS.observe("card_extraction", time.perf_counter() - t0, 0, error=True)
+        raise
+    METRICS.observe("card_extraction", time.perf_counter() - t0, len(cards))
+    return n_items, cards
+
+
+async def _extract_search_cards(page, mode):
+    if mode == "batch":
+        data = await page.evaluate(EXTRACT_CARDS_JS, [
+            CARD_SELECTOR, CARD_TITLE_SELECTOR, CARD_ARTIST_SELECTOR, RELEASE_HREF_RE.pattern,
+        ])
+        cards = []
+        for c in data["cards"]:
+            href = c["href"]
+            url = href if href.startswith("http") else (BASE_URL + href)
+            cards.append((c["idx"], c["title"], c["artist"], url))
+        return data["count"], cards
+    return await extract_search_cards_legacy(page)
+
+
+async def extract_search_cards_legacy(page):
+    cards = []
+    items = await page.query_selector_all(CARD_SELECTOR)
+    for idx, it in enumerate(items):
+        try:
+            title_el = await it.query_selector(CARD_TITLE_SELECTOR)
+            title = (await title_el.inner_text()).strip() if title_el else ""
+
+            artist_el = await it.query_selector(CARD_ARTIST_SELECTOR)
+            artist = (await artist_el.inner_text()).strip() if artist_el else ""
+
+            anchor = await it.query_selector("a")
+            href = await anchor.get_attribute("href") if anchor else ""
+            if not href:
+                continue
+
+            # ✅ solo seguimos si es un release/master válido (con ID numérico)
+            # Excluir rutas como /release/add y otras páginas no-numéricas
+            if not RELEASE_HREF_RE.search(href):
+                continue
+
+            # evitar entradas de UI o banners genéricos
+            if title and title.strip().lower() in ("welcome", "bienvenido"):
+                continue
+
+            url = href if href.startswith("http") else (BASE_URL + href)
+            cards.append((idx, title, artist, url))
+        except Exception as e:
+            print(f"   ⚠️ Error parseando item {idx}: {e}")
+            continue
+    return len(items), cards
+
+
+# ---------- PÁGINA DE DETALLE ----------
+# todo el perfil en una sola evaluación: JSON-LD, estado embebido y, como
+# respaldo, los mismos selectores DOM que parse_release_page_legacy (+ th/td)
+EXTRACT_RELEASE_JS = """
+(profileKeys) => {
+    const text = (el) => (el ? el.innerText.trim() : "");
+    const parseJson = (el) => { try { return JSON.parse(el.textContent); } catch (e) { return null; } };
+    const ld = Array.from(document.querySelectorAll('script[type="application/ld+json"]'))
+        .map(parseJson).filter(Boolean);
+    const state = Array.from(document.querySelectorAll('script#dsdata, script#__NEXT_DATA__'))
+        .map(parseJson).filter(Boolean);
+
+    const dom = {};
+    if (document.querySelector(".releaseprofile, div.profile, .profile")) {
+        const pairs = document.querySelectorAll(".release .release-meta, .profile div, .release-profile div");
+        for (let i = 0; i < pairs.length - 1; i++) {
+            const key = text(pairs[i]).replaceAll(":", "").toLowerCase();
+            if (key && profileKeys.includes(key)) dom[key] = text(pairs[i + 1]);
+        }
+    }
+    const dts = document.querySelectorAll("dt");
+    const dds = document.querySelectorAll("dd");
+    if (dts.length && dts.length === dds.length) {
+        dts.forEach((dt, i) => {
+            const key = text(dt).replaceAll(":", "").toLowerCase();
+            if (profileKeys.includes(key)) dom[key] = text(dds[i]);
+        });
+    }
+    document.querySelectorAll("table tr").forEach((tr) => {
+        const th = tr.querySelector("th");
+        const td = tr.querySelector("td");
+        if (!th || !td) return;
+        const key = text(th).replaceAll(":", "").toLowerCase();
+        if (profileKeys.includes(key) && !(key in dom)) dom[key] = text(td);
+    });
+    const img = document.querySelector("img.image_gallery_image")
+        || document.querySelector("img#large_image, .thumbnail img, .image_gallery img");
+    if (img) dom.image = img.getAttribute("src") || img.getAttribute("data-src");
+    const t = document.querySelector("h1, .title, .release-title");
+    if (t) dom._title_from_detail = text(t);
+    const a = document.querySelector("a.artist, .artist_name, .release-artist");
+    if (a) dom._artist_from_detail = text(a);
+    return {ld, state, dom};
+}
+"""
+
+
+class XhrCapture:
+    # guarda las respuestas JSON (xhr/fetch) de una navegación para poder leer
+    # el payload de la API interna en vez del DOM
+    def __init__(self, page):
+        self.page = page
+        self.responses = []
+
+    def _on_response(self, response):
+        try:
+            if response.request.resource_type not in ("xhr", "fetch"):
+                return
+            if "json" not in (response.headers.get("content-type") or ""):
+                return
+        except Exception:
+            return
+        self.responses.append(response)
+
+    def __enter__(self):
+        self.page.on("response", self._on_response)
+        return self
+
+    def __exit__(self, *exc):
+        self.page.remove_listener("response", self._on_response)
+        return False
+
+    async def payloads(self):
+        out = []
+        for r in self.responses:
+            try:
+                out.append(await r.json())
+            except Exception:
+                continue
+        return out
+
+
+async def parse_release_page(page_obj, title="", artist="", payloads=()):
+    data = await page_obj.evaluate(EXTRACT_RELEASE_JS, PROFILE_KEYS)
+    structured = structured_meta(data.get("ld") or [], data.get("state") or [], payloads)
+    return finalize_detail_meta(structured, data.get("dom") or {}, title, artist)
+
+
+async def extract_release_meta(rt, page_obj, title, artist, capture):
+    # parse_release_page según el modo configurado, con contadores de tiempo
+    mode = rt.detail_extraction
+    if mode == "legacy":
+        t0 = time.perf_counter()
+        meta = await parse_release_page_legacy(page_obj, title, artist)
+        rt.detail_timing.add("legacy", time.perf_counter() - t0)
+        return meta
+
+    t0 = time.perf_counter()
+    meta = await parse_release_page(page_obj, title, artist, await capture.payloads())
+    rt.detail_timing.add("oneshot", time.perf_counter() - t0)
+    if mode == "compare":
+        t0 = time.perf_counter()
+        old = await parse_release_page_legacy(page_obj, title, artist)
+        rt.detail_timing.add("legacy", time.perf_counter() - t0)
+        if old != meta:
+            rt.detail_timing.count("mismatches")
+    return meta
+
+
+async def parse_release_page_legacy(page_obj, title="", artist=""):
+    m = {}
+    # intentos por varios selectores comunes en Discogs
+    # perfil clave: pares label/value
+    rows = await page_obj.query_selector_all(".releaseprofile, div.profile, .profile")
+    if rows:
+        # si hay un contenedor grande, buscar hijos label/value
+        pairs = await page_obj.query_selector_all(".release .release-meta, .profile div, .release-profile div")
+        for i in range(0, len(pairs) - 1):
+            try:
+                label = (await pairs[i].inner_text()).strip().replace(":", "")
+                val = (await pairs[i + 1].inner_text()).strip()
+            except Exception:
+                continue
+            if not label:
+                continue
+            key = label.lower()
+            if key in PROFILE_KEYS:
+                m[key] = val
+
+    # fallback: buscar listas dt/dd o th/td
+    dts = await page_obj.query_selector_all("dt")
+    dds = await page_obj.query_selector_all("dd")
+    if dts and dds and len(dts) == len(dds):
+        for dt, dd in zip(dts, dds):
+            k = (await dt.inner_text()).strip().replace(":", "").lower()
+            v = (await dd.inner_text()).strip()
+            if k in PROFILE_KEYS:
+                m[k] = v
 
-                    # --- Fall back: intentar la API pública de Discogs si no hay metadata útil ---
+    # imagen: diferentes selectores según plantilla
+    img = await page_obj.query_selector("img.image_gallery_image") or await page_obj.query_selector("img#large_image, .thumbnail img, .image_gallery img")
+    if img:
+        try:
+            m["image"] = await img.get_attribute("src") or await img.get_attribute("data-src")
+        except Exception:
+            pass
+
+    # intentar extraer artista/título desde la página de detalle si faltan
+    try:
+        if not title:
+            t = await page_obj.query_selector("h1, .title, .release-title")
+            if t:
+                m.setdefault("_title_from_detail", (await t.inner_text()).strip())
+        if not artist:
+            a = await page_obj.query_selector("a.artist, .artist_name, .release-artist")
+            if a:
+                m.setdefault("_artist_from_detail", (await a.inner_text()).strip())
+    except Exception:
+        pass
+
+    return m
+
+
+# ---------- API PÚBLICA DE DISCOGS ----------
+async def fetch_discogs_release(api, release_id):
+    # el token (DISCOGS_TOKEN) y la conexión los pone el cliente compartido
+    return await api.fetch_meta(f"releases/{release_id}")
+
+
+# ---------- DOCUMENTO FINAL ----------
+def build_record(page_idx, idx, title, artist, url, meta, fetch_path="browser"):
+    return build_record_for(page_idx, idx, title, artist, url, meta, fetch_path, source=BASE_URL)
+
+
+async def enrich_card(rt, page_idx, card, allow_empty=True):
+    # `allow_empty=False` (frontier_worker.py): si ni el detalle ni la API dan
+    # metadata se devuelve None en vez de un registro vacío, para que se reintente
+    idx, title, artist, url = card
+    try:
+        # 1) ruta rápida: HTML por HTTP, sin navegador
+        meta = None
+        fetch_path = "browser"
+        if rt.fast_path is not None:
+            with METRICS.stage("detail_http"):
+                meta = await rt.fast_path.fetch(url, title, artist)
+            if meta is not None:
+                fetch_path = "http"
+
+        # 2) Intentar parsear la página de release en el navegador para metadata más completa
+        if meta is None:
+            meta = {}
+            try:
+                # el pool limita la concurrencia: como mucho `pool.size` detalles a la vez
+                async with rt.pool.page() as page2:
                     try:
-                        def fetch_discogs_release(release_id, token=None):
-                            api_url = f"https://api.discogs.com/releases/{release_id}"
-                            headers = {"User-Agent": "discogs-scraper/1.0"}
-                            if token:
-                                headers["Authorization"] = f"Discogs token={token}"
-                            req = urllib.request.Request(api_url, headers=headers)
-                            try:
-                                with urllib.request.urlopen(req, timeout=15) as resp:
-                                    data = json.load(resp)
-                            except Exception:
-                                return None
-
-                            mapi = {}
-                            # título y artistas
-                            if data.get("title"):
-                                mapi.setdefault("_title_from_api", data.get("title"))
-                            artists = []
-                            for a in data.get("artists", []):
-                                name = a.get("name")
-                                if name:
-                                    artists.append(name)
-                            if artists:
-                                mapi.setdefault("_artist_from_api", " & ".join(artists))
-
-                            # labels
-                            labs = [l.get("name") for l in data.get("labels", []) if l.get("name")]
-                            if labs:
-                                mapi.setdefault("label", ", ".join(labs))
-
-                            # formats
-                            fmts = []
-                            for f in data.get("formats", []):
-                                name = f.get("name") or ""
-                                desc = " ".join(f.get("descriptions") or [])
-                                part = (name + " " + desc).strip()
-                                if part:
-                                    fmts.append(part)
-                            if fmts:
-                                mapi.setdefault("format", "; ".join(fmts))
-
-                            if data.get("country"):
-                                mapi.setdefault("country", data.get("country"))
-                            if data.get("released"):
-                                mapi.setdefault("released", data.get("released"))
-                            if data.get("genres"):
-                                mapi.setdefault("genre", ", ".join(data.get("genres")))
-                            if data.get("styles"):
-                                mapi.setdefault("style", ", ".join(data.get("styles")))
-                            if data.get("images"):
-                                first = data.get("images")[0]
-                                img = first.get("uri") or first.get("resource_url")
-                                if img:
-                                    mapi.setdefault("image", img)
-
-                            return mapi
-
-                        needs_api = (not meta) or (not artist) or (not title)
-                        if needs_api:
-                            m = re.search(r"/(?:release|master)/(\d+)", url)
-                            if m:
-                                rid = m.group(1)
-                                token = os.environ.get("DISCOGS_TOKEN")
-                                api_meta = fetch_discogs_release(rid, token=token)
-                                if api_meta:
-                                    print(f"      ℹ️ Metadata obtenida vía API para release {rid}")
-                                    # no sobreescribir keys existentes; usar valores API para completar faltantes
-                                    for k, v in api_meta.items():
-                                        if k == "_title_from_api" and not title:
-                                            title = v
-                                        elif k == "_artist_from_api" and not artist:
-                                            artist = v
-                                        else:
-                                            meta.setdefault(k, v)
-                    except Exception as e:
-                        print(f"      ⚠️ Fallback API falló para {url}: {e}")
-
-                    # si artista o título están vacíos, intentar obtenerlos desde metadata recogida
-                    if not title and meta.get("_title_from_detail"):
-                        title = meta.pop("_title_from_detail")
-                    if not artist and meta.get("_artist_from_detail"):
-                        artist = meta.pop("_artist_from_detail")
-
-                    text_blob = " | ".join(filter(None, [
-                        title,
-                        artist,
-                        meta.get("genre", ""),
-                        meta.get("style", ""),
-                        meta.get("country", ""),
-                        meta.get("format", ""),
-                        meta.get("label", "")
-                    ]))
-
-                    doc_id = f"pg{page_idx}_i{idx}_{int(time.time())}"
-                    results.append({
-                        "doc_id": doc_id,
-                        "source": BASE_URL,
-                        "title": title,
-                        "artist": artist,
-                        "url": url,
-                        "metadata": meta,
-                        "text": text_blob
-                    })
-                except Exception as e:
-                    print(f"   ⚠️ Error parseando item {idx}: {e}")
-                    continue
-
-            # --- PAGINACIÓN ---
+                        with XhrCapture(page2) as capture:
+                            # esperar a que cargue el perfil (o, si no aparece, un poco de contenido dinámico)
+                            resp = await rt.readiness.goto(page2, url, "detail")
+                        if rt.archive is not None:
+                            await rt.archive.record_page(page2, url, "release", status_of(resp))
+                            await rt.archive.record_xhr(capture, url)
+                        if status_of(resp) >= 400:
+                            # página de error (404, 429 agotado...): nada que parsear
+                            raise RuntimeError(f"HTTP {status_of(resp)}")
+                        with METRICS.stage("parse_release_page"):
+                            meta = await extract_release_meta(rt, page2, title, artist, capture)
+                    finally:
+                        rt.blocker.take_page_stats(page2, url, "detail")
+            except Exception as e:
+                print(f"      ⚠️ Detalle omitido para {title or 'sin título'}: {e}")
+                METRICS.inc("errors", stage="detail")
+                # no continuar: queremos incluir el item aunque falte metadata
+        rt.path_counts[fetch_path] += 1
+
+        # --- Fall back: intentar la API pública de Discogs si no hay metadata útil ---
+        try:
+            needs_api = (not meta) or (not artist) or (not title)
+            if needs_api:
+                m = RELEASE_ID_RE.search(url)
+                if m:
+                    rid = m.group(1)
+                    with METRICS.stage("api_fallback"):
+                        api_meta = await fetch_discogs_release(rt.api, rid)
+                    if api_meta:
+                        print(f"      ℹ️ Metadata obtenida vía API para release {rid}")
+                        title, artist = merge_api_meta(meta, api_meta, title, artist)
+        except Exception as e:
+            print(f"      ⚠️ Fallback API falló para {url}: {e}")
+            METRICS.inc("errors", stage="api_fallback")
+
+        if not meta and not allow_empty:
+            print(f"   ⚠️ Sin metadata (detalle ni API) para {url}")
+            METRICS.inc("errors", stage="enrich")
+            return None
+        return rt.record_done(build_record(page_idx, idx, title, artist, url, meta, fetch_path))
+    except Exception as e:
+        print(f"   ⚠️ Error parseando item {idx}: {e}")
+        METRICS.inc("errors", stage="enrich")
+        return None
+
+
+async def enrich_cards_via_api(rt, api, page_idx, cards, workers=API_WORKERS, allow_empty=True):
+    # modo API-first: sin páginas de detalle; `workers` tareas consumen una cola
+    # de tarjetas y el resultado se coloca en su posición original (None si la API
+    # no dio nada y `allow_empty` es False)
+    records = [None] * len(cards)
+    queue = asyncio.Queue()
+    for pos, card in enumerate(cards):
+        queue.put_nowait((pos, card))
+
+    async def worker():
+        while True:
             try:
-                next_btn = page.query_selector('a[rel="next"], a.pagination_next, .pagination-next, .next')
-                if next_btn:
-                    next_href = next_btn.get_attribute("href")
-                    if next_href:
-                        next_url = next_href if next_href.startswith("http") else (BASE_URL + next_href)
-                        print(f"   → Siguiente página: {next_url}")
-                        page.goto(next_url, wait_until="networkidle", timeout=90000)
-                        page.wait_for_timeout(2000)
-                    else:
-                        print("   🚫 No hay más páginas.")
-                        break
+                pos, (idx, title, artist, url) = queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            try:
+                meta = {}
+                path = api_path_for_url(url)
+                with METRICS.stage("api_fetch"):
+                    api_meta = await api.fetch_meta(path) if path else None
+                rt.path_counts["api"] += 1
+                if api_meta:
+                    title, artist = merge_api_meta(meta, api_meta, title, artist)
                 else:
-                    print("   🚫 No hay más páginas.")
-                    break
+                    print(f"      ⚠️ Sin metadata de API para {url}")
+                    if not allow_empty:
+                        METRICS.inc("errors", stage="enrich")
+                        continue
+                records[pos] = rt.record_done(build_record(page_idx, idx, title, artist, url, meta, "api"))
             except Exception as e:
-                print(f"   ⚠️ Error en paginación: {e}")
-                break
+                print(f"   ⚠️ Error parseando item {idx}: {e}")
+                METRICS.inc("errors", stage="enrich")
+
+    await asyncio.gather(*[worker() for _ in range(max(1, min(workers, len(cards))))])
+    return records
+
+
+# ---------- PAGINACIÓN PARALELA ----------
+def search_page_url(page_number, limit=SEARCH_LIMIT):
+    return f"{BASE_URL}/search/?q=&type=release&page={page_number}&limit={limit}"
+
+
+async def iter_search_pages_parallel(browser, blocker, ready, page_urls, n_contexts,
+                                     card_extraction=CARD_EXTRACTION, card_stats=None, archive=None):
+    # descarga las páginas de búsqueda con `n_contexts` contextos aislados (cookies y
+    # caché propias) y entrega (page_idx, url, n_items, cards) en el orden de page_urls.
+    # n_items es None si la página falló tras los reintentos.
+    loop = asyncio.get_running_loop()
+    futures = {idx: loop.create_future() for idx, _ in page_urls}
+    queue = asyncio.Queue()
+    for item in page_urls:
+        queue.put_nowait(item)
+
+    async def worker(ctx):
+        pg = await ctx.new_page()
+        while True:
+            try:
+                idx, url = queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            try:
+                resp = await ready.goto(pg, url, "search")
+                blocker.take_page_stats(pg, url, "search")
+                if archive is not None:
+                    await archive.record_page(pg, url, "search", status_of(resp), page=idx)
+                t0 = time.perf_counter()
+                n_items, cards = await extract_search_cards(pg, card_extraction)
+                if card_stats is not None:
+                    card_stats["pages"] += 1
+                    card_stats["cards"] += len(cards)
+                    card_stats["extract_s"] += time.perf_counter() - t0
+                futures[idx].set_result((n_items, cards))
+            except Exception as e:
+                futures[idx].set_exception(e)
+
+    contexts = []
+    tasks = []
+    try:
+        for _ in range(max(1, min(n_contexts, len(page_urls)))):
+            ctx = await browser.new_context(user_agent=USER_AGENT, viewport={"width": 1280, "height": 800})
+            await blocker.install(ctx)
+            contexts.append(ctx)
+        tasks = [asyncio.create_task(worker(ctx)) for ctx in contexts]
+        for idx, url in page_urls:
+            try:
+                n_items, cards = await futures[idx]
+            except Exception as e:
+                print(f"   ⚠️ Página de búsqueda {idx + 1} omitida: {e}")
+                n_items, cards = None, []
+            yield idx, url, n_items, cards
+    finally:
+        for t in tasks:
+            t.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        for f in futures.values():
+            if f.done() and not f.cancelled():
+                f.exception()  # evita avisos de "exception never retrieved"
+        for ctx in contexts:
+            await ctx.close()
+
+
+def filter_cards(cards, seen, dedupe, ckpt=None, known=None):
+    # deja solo las tarjetas que hay que enriquecer: una por release/master y
+    # ejecución, sin lo ya completado en el checkpoint ni lo que ya está en el corpus
+    out, page_keys = [], set()
+    for card in cards:
+        key = entity_key(card[3])
+        if key in page_keys:
+            dedupe["within_page"] += 1
+            continue
+        if key in seen:
+            dedupe["across_pages"] += 1
+            continue
+        if ckpt is not None and ckpt.is_done(card[3]):
+            dedupe["checkpoint"] += 1
+            continue
+        if known and is_known_card(known, card):
+            dedupe["corpus"] += 1
+            continue
+        if key:
+            page_keys.add(key)
+        out.append(card)
+    seen.update(page_keys)
+    skipped = len(cards) - len(out)
+    if skipped:
+        print(f"   ⏭️ {skipped} tarjetas duplicadas o ya conocidas; se omiten.")
+    return out
+
+
+async def scrape_music_site_async(max_pages=MAX_PAGES, concurrency=CONCURRENCY, page_max_uses=PAGE_MAX_USES,
+                                  block_profile=BLOCK_PROFILE, readiness=READINESS,
+                                  card_extraction=CARD_EXTRACTION, detail_extraction=DETAIL_EXTRACTION,
+                                  fast_path=FAST_PATH, enrich_mode=ENRICH_MODE, api_workers=API_WORKERS,
+                                  http2=HTTP2, rate_limit=RATE_LIMIT, rate_share=1.0, retry_attempts=RETRY_ATTEMPTS,
+                                  http_cache=HTTP_CACHE, cache_file=CACHE_FILE,
+                                  checkpoint=CHECKPOINT, checkpoint_dir=CHECKPOINT_DIR,
+                                  checkpoint_every=CHECKPOINT_EVERY, resume=False, known=None,
+                                  pagination=PAGINATION, search_contexts=SEARCH_CONTEXTS,
+                                  search_limit=SEARCH_LIMIT, first_page=0, on_page=None,
+                                  on_record=None, keep_results=True, browser_endpoint=BROWSER_ENDPOINT,
+                                  capture_dir=CAPTURE_DIR):
+    # `known`: {entity_key: doc} del corpus existente (modo incremental); sus tarjetas
+    # no se vuelven a enriquecer salvo que el título/artista de la tarjeta haya cambiado.
+    # `first_page`/`max_pages` delimitan el rango [first_page, max_pages) de páginas de
+    # búsqueda (para repartirlas entre procesos); `on_page(page_idx, n_results)` se llama
+    # al terminar cada página. `on_record` (async) recibe cada registro en cuanto se
+    # completa (pipeline en flujo); con keep_results=False no se acumulan en memoria.
+    # `rate_share`: fracción de la cuota por host para este proceso (shards en paralelo).
+    # `capture_dir`: graba búsquedas, releases y API en un CrawlArchive para reprocesar sin red.
+    print(f"🎵 Iniciando scraping musical en Discogs (concurrencia {concurrency})...")
+    results = []
+    card_stats = {"mode": card_extraction, "pages": 0, "cards": 0, "extract_s": 0.0}
+
+    search_url = f"{BASE_URL}/search/?q=&type=release"
+    start_idx = first_page
+    if first_page:
+        search_url = search_page_url(first_page + 1, search_limit)
+    ckpt = None
+    dedupe = {"within_page": 0, "across_pages": 0, "checkpoint": 0, "corpus": 0}
+    if checkpoint:
+        ckpt = CrawlCheckpoint(checkpoint_dir, every=checkpoint_every)
+        state, results = ckpt.start(resume=resume)
+        if state.get("search_url"):
+            search_url = state["search_url"]
+            start_idx = state.get("page_idx", 0)
+            print(f"♻️ Reanudando en la página {start_idx + 1} con {len(results)} elementos ya completados.")
+    # claves de entidad ya vistas en esta ejecución (lo reanudado lo cubre el checkpoint)
+    seen = set()
+    n_done = len(results)
+    resumed = results
+    if not keep_results:
+        results = []
+
+    archive = CrawlArchive(capture_dir) if capture_dir else None
+
+    async with async_playwright() as p:
+        # con servidor persistente: sin arranque en frío y con caché/cookies de antes
+        handle = await open_browser(p, browser_endpoint, headless=HEADLESS, user_agent=USER_AGENT)
+        browser, context = handle.browser, handle.context
+        limiter = RateLimiter(share=rate_share) if rate_limit else None
+        # misma política de reintentos para page.goto y para httpx
+        retry = RetryPolicy(max_attempts=retry_attempts, extra_exceptions=(PlaywrightTimeoutError,))
+        blocker = await ResourceBlocker(block_profile, limiter=limiter).install(context, persistent=handle.remote)
+        ready = PageReadiness(readiness, retry=retry, limiter=limiter)
+        # todas las llamadas HTTP (API y ruta rápida) comparten conexiones
+        session = DiscogsSession(max_connections=concurrency + api_workers, http2=http2, limiter=limiter, retry=retry,
+                                 archive=archive)
+        cache = HttpCache(cache_file) if http_cache else None
+        api = DiscogsApiClient(session, token=os.environ.get("DISCOGS_TOKEN"), cache=cache)
+        pool, fast = None, None
+        try:
+            if enrich_mode != "api":
+                # en modo "api" no hay páginas de detalle: ni pool de pestañas ni ruta HTML
+                pool = await PagePool(context, size=concurrency, max_uses=page_max_uses,
+                                      setup=blocker.attach).start()
+                fast = ReleaseFastPath(session, USER_AGENT) if fast_path else None
+            rt = CrawlRuntime(pool, blocker, ready, detail_extraction, fast, api)
+            rt.checkpoint = ckpt
+            rt.archive = archive
 
-        browser.close()
+            async def emit(record):
+                if record is not None and on_record is not None:
+                    await on_record(record)
+                return record
 
-    print(f"\n✅ Scraping finalizado. Total: {len(results)} elementos extraídos.")
+            async def enrich_and_emit(page_idx, card):
+                return await emit(await enrich_card(rt, page_idx, card))
+
+            async def process_page(page_idx, cards):
+                nonlocal n_done
+                cards = filter_cards(cards, seen, dedupe, ckpt, known)
+                # gather conserva el orden de las tarjetas aunque terminen desordenadas
+                if enrich_mode == "api":
+                    records = await enrich_cards_via_api(rt, api, page_idx, cards, api_workers)
+                    for r in records:
+                        await emit(r)
+                else:
+                    records = await asyncio.gather(*[
+                        enrich_and_emit(page_idx, card) for card in cards
+                    ])
+                records = [r for r in records if r]
+                n_done += len(records)
+                if keep_results:
+                    results.extend(records)
+                if on_page is not None:
+                    on_page(page_idx, n_done)
+
+            # lo reanudado del checkpoint también tiene que llegar a la salida
+            for r in resumed:
+                await emit(r)
+            if not keep_results:
+                resumed = None
+
+            if pagination == "parallel":
+                # URLs de búsqueda calculadas de antemano (?page=N&limit=L), descargadas
+                # en paralelo en contextos aislados y procesadas en orden
+                page_urls = [(i, search_page_url(i + 1, search_limit)) for i in range(start_idx, max_pages)]
+                print(f"🔍 {len(page_urls)} páginas de búsqueda en {search_contexts} contextos paralelos")
+                pages = iter_search_pages_parallel(browser, blocker, ready, page_urls, search_contexts,
+                                                   card_extraction, card_stats, archive)
+                # aclosing: al salir con break se cancelan las descargas pendientes
+                async with aclosing(pages):
+                    async for page_idx, url, n_items, cards in pages:
+                        print(f"\n📄 Procesando página {page_idx + 1}...")
+                        if n_items is None:
+                            continue
+                        if not n_items:
+                            print("⚠️ No se encontraron resultados visibles.")
+                            break
+                        if ckpt is not None:
+                            ckpt.set_position(url, page_idx)
+                        await process_page(page_idx, cards)
+                        if ckpt is not None:
+                            ckpt.set_position(url, page_idx + 1)
+            else:
+                page = await context.new_page()
+                await blocker.attach(page)
+                print(f"🔍 Navegando a: {search_url}")
+                search_status = status_of(await ready.goto(page, search_url, "search"))
+                blocker.take_page_stats(page, search_url, "search")
+
+                for page_idx in range(start_idx, max_pages):
+                    print(f"\n📄 Procesando página {page_idx + 1}...")
+                    if ckpt is not None:
+                        ckpt.set_position(search_url, page_idx)
+                    if archive is not None:
+                        await archive.record_page(page, search_url, "search", search_status, page=page_idx)
+                    t0 = time.perf_counter()
+                    n_items, cards = await extract_search_cards(page, card_extraction)
+                    card_stats["pages"] += 1
+                    card_stats["cards"] += len(cards)
+                    card_stats["extract_s"] += time.perf_counter() - t0
+                    if not n_items:
+                        print("⚠️ No se encontraron resultados visibles.")
+                        break
+                    await process_page(page_idx, cards)
+
+                    # --- PAGINACIÓN ---
+                    try:
+                        next_btn = await page.query_selector('a[rel="next"], a.pagination_next, .pagination-next, .next')
+                        if next_btn:
+                            next_href = await next_btn.get_attribute("href")
+                            if next_href:
+                                next_url = next_href if next_href.startswith("http") else (BASE_URL + next_href)
+                                print(f"   → Siguiente página: {next_url}")
+                                search_url = next_url
+                                if ckpt is not None:
+                                    ckpt.set_position(search_url, page_idx + 1)
+                                search_status = status_of(await ready.goto(page, next_url, "pagination"))
+                                blocker.take_page_stats(page, next_url, "search")
+                            else:
+                                print("   🚫 No hay más páginas.")
+                                break
+                        else:
+                            print("   🚫 No hay más páginas.")
+                            break
+                    except Exception as e:
+                        print(f"   ⚠️ Error en paginación: {e}")
+                        break
+        finally:
+            # también ante Ctrl-C o un fallo: lo completado queda en el checkpoint
+            if ckpt is not None:
+                ckpt.close()
+            await session.aclose()
+            if cache is not None:
+                cache.close()
+            if pool is not None:
+                await pool.close()
+            await handle.close()
+            if archive is not None:
+                archive.close()
+
+    print(f"\n✅ Scraping finalizado. Total: {n_done} elementos extraídos.")
+    if pool is not None:
+        print(f"📊 Pool de páginas: {pool.summary()}")
+    print(f"📊 API Discogs: {api.summary()}")
+    print(f"📊 Conexiones HTTP: {session.summary()}")
+    if cache is not None:
+        print(f"📊 Caché HTTP de la API: {cache.summary()}")
+    if limiter is not None:
+        print(f"📊 Limitador por host: {limiter.summary()}")
+    print(f"📊 Reintentos y fallos definitivos: {retry.summary()}")
+    print(f"📊 Bloqueo de recursos: {blocker.summary()}")
+    print(f"📊 Esperas por tipo de página: {ready.summary()}")
+    if card_stats["pages"]:
+        card_stats["mean_extract_ms"] = round(card_stats["extract_s"] / card_stats["pages"] * 1000, 1)
+    print(f"📊 Extracción de tarjetas: {card_stats}")
+    print(f"📊 Deduplicación (tarjetas omitidas antes de enriquecer): {dedupe}")
+    print(f"📊 Extracción de detalle ({detail_extraction}): {rt.detail_timing.summary()}")
+    print(f"📊 Ruta de detalle: {rt.path_summary()}")
+    if archive is not None:
+        print(f"📦 Captura en {capture_dir}: {archive.summary()}")
+        METRICS.absorb("capture", archive.summary())
+    # los mismos resúmenes, como gauges de la exportación de métricas
+    METRICS.absorb("crawl", {"records": n_done, "dedupe": dedupe, "cards": card_stats})
+    METRICS.absorb("http", session.summary())
+    METRICS.absorb("api", api.summary())
+    METRICS.absorb("retry", retry.summary())
+    if limiter is not None:
+        METRICS.absorb("rate_limit", {"hosts": limiter.summary()})
+    METRICS.absorb("detail_path", rt.path_summary())
+    if pool is not None:
+        METRICS.absorb("page_pool", pool.summary())
+    if cache is not None:
+        METRICS.absorb("http_cache", cache.summary())
     return results
 
 
+def scrape_music_site(max_pages=MAX_PAGES, **options):
+    # envoltorio síncrono; `options` son los keywords de scrape_music_site_async
+    return asyncio.run(scrape_music_site_async(max_pages=max_pages, **options))
+
+
 def embed_music_data(docs, model_name=EMBED_MODEL):
     print("🧠 Generando embeddings con", model_name)
     model = SentenceTransformer(model_name)
@@ -277,30 +1227,279 @@ def embed_music_data(docs, model_name=EMBED_MODEL):
     if not texts:
         print("⚠️ No hay textos a indexar.")
         return docs
-    embeddings = model.encode(texts, show_progress_bar=True, convert_to_numpy=True)
+    with METRICS.stage("embed", items=len(texts)):
+        embeddings = model.encode(texts, show_progress_bar=True, convert_to_numpy=True)
     for i, d in enumerate(docs):
         d["embedding"] = embeddings[i].tolist()
     print("✅ Embeddings completados.")
     return docs
 
 
+# ---------- CORPUS INCREMENTAL ----------
+def load_corpus(filename=OUTPUT_FILE):
+    p = Path(filename)
+    if not p.exists():
+        return []
+    docs = list(iter_docs(p))
+    # corpus antiguos usan doc_id posicionales (pg0_i1422_<ts>): pasar a la clave de entidad
+    for d in docs:
+        key = entity_key(d.get("url"))
+        if key:
+            d["doc_id"] = key
+    return dedupe_docs(docs)
+
+
+def dedupe_docs(docs):
+    # un documento por clave de entidad; gana la última aparición
+    index = {}
+    out = []
+    for d in docs:
+        key = entity_key(d.get("url"))
+        if key is None:
+            out.append(d)
+        elif key in index:
+            out[index[key]] = d
+        else:
+            index[key] = len(out)
+            out.append(d)
+    if len(out) < len(docs):
+        print(f"🧹 {len(docs) - len(out)} documentos duplicados eliminados del corpus.")
+    return out
+
+
+def corpus_index(docs):
+    # {entity_key: doc}; los documentos sin release/master reconocible se ignoran
+    index = {}
+    for d in docs:
+        key = entity_key(d.get("url"))
+        if key:
+            index[key] = d
+    return index
+
+
+def is_known_card(known, card):
+    _, title, artist, url = card
+    doc = known.get(entity_key(url))
+    if doc is None:
+        return False
+    # tarjeta sin texto: no hay nada que compare; si lo hay, debe coincidir
+    return (not title or title == doc.get("title")) and (not artist or artist == doc.get("artist"))
+
+
+def reuse_embeddings(docs, known):
+    # si el texto no cambió se reaprovecha el embedding guardado (sin pasar por el encoder)
+    reused = 0
+    for d in docs:
+        old = known.get(entity_key(d.get("url")))
+        if old and old.get("embedding") and old.get("text") == d.get("text"):
+            d["embedding"] = old["embedding"]
+            reused += 1
+    return reused
+
+
+def merge_into_corpus(existing, new_docs):
+    # sustituye por clave de entidad los documentos que ya existían y añade el resto
+    pos = {}
+    for i, d in enumerate(existing):
+        key = entity_key(d.get("url"))
+        if key:
+            pos[key] = i
+    merged = list(existing)
+    added = updated = 0
+    for d in new_docs:
+        key = entity_key(d.get("url"))
+        if key in pos:
+            merged[pos[key]] = d
+            updated += 1
+        else:
+            if key:
+                pos[key] = len(merged)
+            merged.append(d)
+            added += 1
+    print(f"🔀 Corpus: {added} nuevos, {updated} actualizados, {len(merged)} en total.")
+    return merged
+
+
 def save_json(data, filename=OUTPUT_FILE):
+    with METRICS.stage("save", items=len(data)):
+        _save_json(data, filename)
+    print(f"💾 Datos guardados en {filename}")
+
+
+def _save_json(data, filename):
+    if is_jsonl(filename):
+        # .jsonl / .jsonl.gz: un documento por línea, escrito en flujo
+        write_docs(data, filename)
+        return
     p = Path(filename)
     p.parent.mkdir(parents=True, exist_ok=True)
     with p.open("w", encoding="utf-8") as f:
         json.dump(data, f, ensure_ascii=False, indent=2)
-    print(f"💾 Datos guardados en {filename}")
 
 
-def main():
-    docs = scrape_music_site(max_pages=MAX_PAGES)
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Scraper musical de Discogs + embeddings")
+    parser.add_argument("--max-pages", type=int, default=MAX_PAGES,
+                        help="páginas de búsqueda a recorrer")
+    parser.add_argument("--concurrency", type=int, default=CONCURRENCY,
+                        help="páginas de detalle procesadas en paralelo (tamaño del pool)")
+    parser.add_argument("--page-max-uses", type=int, default=PAGE_MAX_USES,
+                        help="navegaciones por pestaña antes de recrearla")
+    parser.add_argument("--block-profile", choices=["off", "text", "allowlist"], default=BLOCK_PROFILE,
+                        help="recursos de red a abortar (imágenes, fuentes, CSS, ads...)")
+    parser.add_argument("--readiness", choices=["selector", "legacy"], default=READINESS,
+                        help="esperar a selectores concretos o a networkidle + pausas fijas")
+    parser.add_argument("--card-extraction", choices=["batch", "legacy"], default=CARD_EXTRACTION,
+                        help="extraer tarjetas con un solo page.evaluate o elemento a elemento")
+    parser.add_argument("--detail-extraction", choices=["oneshot", "legacy", "compare"], default=DETAIL_EXTRACTION,
+                        help="perfil del release en una evaluación, selector a selector, o ambos comparando tiempos")
+    parser.add_argument("--fast-path", action=argparse.BooleanOptionalAction, default=FAST_PATH,
+                        help="leer primero el release por HTTP y usar Playwright solo si faltan campos")
+    parser.add_argument("--enrich-mode", choices=["detail", "api"], default=ENRICH_MODE,
+                        help="enriquecer con la página de release o solo con api.discogs.com")
+    parser.add_argument("--api-workers", type=int, default=API_WORKERS,
+                        help="peticiones simultáneas a la API en modo api")
+    parser.add_argument("--http2", action=argparse.BooleanOptionalAction, default=HTTP2,
+                        help="usar HTTP/2 si está instalado httpx[http2]")
+    parser.add_argument("--rate-limit", action=argparse.BooleanOptionalAction, default=RATE_LIMIT,
+                        help="limitar el ritmo por host según las cabeceras X-Discogs-Ratelimit")
+    parser.add_argument("--retry-attempts", type=int, default=RETRY_ATTEMPTS,
+                        help="intentos por llamada de red (page.goto y API) antes de darla por perdida")
+    parser.add_argument("--http-cache", action=argparse.BooleanOptionalAction, default=HTTP_CACHE,
+                        help="cachear en disco las respuestas de la API y revalidarlas con ETag")
+    parser.add_argument("--cache-file", default=CACHE_FILE, help="base de datos SQLite de la caché HTTP")
+    parser.add_argument("--pagination", choices=["sequential", "parallel"], default=PAGINATION,
+                        help="seguir el botón siguiente o descargar ?page=N en paralelo")
+    parser.add_argument("--search-contexts", type=int, default=SEARCH_CONTEXTS,
+                        help="contextos de navegador para la paginación paralela")
+    parser.add_argument("--search-limit", type=int, default=SEARCH_LIMIT,
+                        help="resultados por página de búsqueda en modo paralelo")
+    parser.add_argument("--incremental", action="store_true",
+                        help="cargar el corpus de --output, enriquecer y embeber solo releases nuevos y fusionarlos")
+    parser.add_argument("--checkpoint", action=argparse.BooleanOptionalAction, default=CHECKPOINT,
+                        help="guardar progreso periódicamente para poder reanudar")
+    parser.add_argument("--checkpoint-dir", default=CHECKPOINT_DIR, help="directorio del checkpoint")
+    parser.add_argument("--resume", action="store_true",
+                        help="continuar desde el último checkpoint sin repetir lo ya completado")
+    parser.add_argument("--stream", action=argparse.BooleanOptionalAction, default=STREAM,
+                        help="embeber y escribir cada registro mientras sigue el scraping")
+    parser.add_argument("--embed-batch", type=int, default=EMBED_BATCH,
+                        help="documentos por lote del encoder en modo --stream")
+    parser.add_argument("--browser-endpoint", default=BROWSER_ENDPOINT,
+                        help="conectarse al navegador de browser_server.py (URL CDP o 'auto') en vez de lanzar uno")
+    parser.add_argument("--capture", default=CAPTURE_DIR, metavar="DIR",
+                        help="grabar búsquedas, releases y respuestas de API para 'crawl_archive.py replay'")
+    parser.add_argument("--images", action=argparse.BooleanOptionalAction, default=IMAGES,
+                        help="descargar las portadas (almacén por hash + miniaturas) y usar rutas locales")
+    parser.add_argument("--image-dir", default=IMAGE_DIR, help="directorio del almacén de portadas")
+    parser.add_argument("--image-workers", type=int, default=IMAGE_WORKERS, help="descargas de portadas simultáneas")
+    parser.add_argument("--metrics-dir", default=METRICS_DIR,
+                        help="directorio de metrics.json y metrics.prom (formato Prometheus)")
+    parser.add_argument("--metrics-interval", type=float, default=METRICS_INTERVAL_S,
+                        help="segundos entre volcados de métricas durante el crawl (0 = solo al final)")
+    parser.add_argument("--output", default=OUTPUT_FILE,
+                        help="archivo de salida: .json (array) o .jsonl / .jsonl.gz (una línea por documento)")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    METRICS.start_periodic(args.metrics_dir, args.metrics_interval)
+    try:
+        run(args)
+    finally:
+        # también tras un fallo: las métricas parciales ayudan a diagnosticarlo
+        METRICS.stop_periodic()
+        METRICS.dump(args.metrics_dir)
+        print(f"📊 Métricas en {args.metrics_dir}/metrics.json y metrics.prom")
+
+
+def run(args):
+    existing, known = [], None
+    if args.incremental:
+        existing = load_corpus(args.output)
+        known = corpus_index(existing)
+        print(f"📚 Corpus existente: {len(existing)} documentos ({len(known)} releases conocidos).")
+    options = dict(concurrency=args.concurrency,
+                   page_max_uses=args.page_max_uses, block_profile=args.block_profile,
+                   readiness=args.readiness, card_extraction=args.card_extraction,
+                   detail_extraction=args.detail_extraction, fast_path=args.fast_path,
+                   enrich_mode=args.enrich_mode, api_workers=args.api_workers,
+                   http2=args.http2, rate_limit=args.rate_limit,
+                   retry_attempts=args.retry_attempts, http_cache=args.http_cache,
+                   cache_file=args.cache_file, checkpoint=args.checkpoint,
+                   checkpoint_dir=args.checkpoint_dir, resume=args.resume, known=known,
+                   pagination=args.pagination, search_contexts=args.search_contexts,
+                   search_limit=args.search_limit, browser_endpoint=args.browser_endpoint,
+                   capture_dir=args.capture)
+    if args.stream:
+        return main_stream(args, options, existing, known)
+    docs = scrape_music_site(max_pages=args.max_pages, **options)
     if not docs:
-        print("⚠️ No se extrajo ningún documento. Revisa los selectores.")
+        if args.incremental:
+            print("✅ Sin releases nuevos: el corpus no cambia.")
+            if args.checkpoint:
+                CrawlCheckpoint(args.checkpoint_dir).clear()
+        else:
+            print("⚠️ No se extrajo ningún documento. Revisa los selectores.")
         return
-    embedded = embed_music_data(docs)
-    save_json(embedded, OUTPUT_FILE)
+    if args.incremental:
+        reused = reuse_embeddings(docs, known)
+        pending = [d for d in docs if "embedding" not in d]
+        print(f"♻️ Embeddings reutilizados: {reused}; por calcular: {len(pending)}")
+        if pending:
+            embed_music_data(pending)
+        embedded = merge_into_corpus(existing, docs)
+    else:
+        embedded = embed_music_data(docs)
+    save_json(embedded, args.output)
+    if args.checkpoint:
+        # salida guardada: el siguiente crawl ya no debe reanudar este
+        CrawlCheckpoint(args.checkpoint_dir).clear()
+    if args.images:
+        localize_images(args)
     print("🎶 Pipeline completado.")
 
 
+def main_stream(args, options, existing, known):
+    # scraping, embeddings y escritura a la vez: cada registro pasa al encoder (por
+    # lotes) y al archivo de salida sin esperar al final del crawl
+    pipe = StreamPipeline(args.output, EMBED_MODEL, batch_size=args.embed_batch,
+                          known=known, existing=existing).start()
+    try:
+        scrape_music_site(max_pages=args.max_pages, on_record=pipe.submit, keep_results=False, **options)
+        if not pipe.stats["submitted"]:
+            # nada nuevo: se conserva la salida anterior tal cual
+            pipe.abort()
+            if args.incremental:
+                print("✅ Sin releases nuevos: el corpus no cambia.")
+                if args.checkpoint:
+                    CrawlCheckpoint(args.checkpoint_dir).clear()
+            else:
+                print("⚠️ No se extrajo ningún documento. Revisa los selectores.")
+            return
+        print(f"📊 Pipeline en flujo: {pipe.close()}")
+    finally:
+        # fallo o Ctrl-C durante el crawl: se detienen los hilos y se descarta el .part
+        # (lo completado sigue en el checkpoint para --resume). No-op si ya se cerró
+        pipe.abort()
+    if args.checkpoint:
+        CrawlCheckpoint(args.checkpoint_dir).clear()
+    if args.images:
+        localize_images(args)
+    print("🎶 Pipeline completado.")
+
+
+def localize_images(args):
+    # las portadas se resuelven sobre la salida ya guardada: un fallo aquí no pierde el
+    # crawl ni los embeddings (se repite con `python image_store.py --input <salida>`)
+    try:
+        localize_corpus(args.output, directory=args.image_dir, workers=args.image_workers,
+                        rate_limit=args.rate_limit)
+    except Exception as e:
+        print(f"⚠️ Portadas no descargadas ({type(e).__name__}: {e}); el corpus queda con las URLs "
+              f"originales. Reintenta con: python image_store.py --input {args.output}")
+
+
 if __name__ == "__main__":
     main()
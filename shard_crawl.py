@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+# shard_crawl.py — crawl repartido en varios procesos (un navegador por proceso)
+# Cada shard recorre un rango de páginas de búsqueda con scrape_music_site, escribe
+# su salida en WORK_DIR y al final se fusionan, deduplican y embeben en el corpus.
+
+import os
+import time
+import argparse
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+
+import scrape_music_rag as smr
+from corpus_io import iter_docs, write_docs
+
+# ------------------ CONFIG ------------------
+SHARDS = max(1, (os.cpu_count() or 2) - 1)
+TOTAL_PAGES = 8
+WORK_DIR = ".shards"
+# --------------------------------------------
+
+
+def shard_ranges(total_pages, shards):
+    # reparte [0, total_pages) en rangos contiguos lo más parejos posible
+    shards = max(1, min(shards, total_pages))
+    base, extra = divmod(total_pages, shards)
+    ranges, start = [], 0
+    for i in range(shards):
+        end = start + base + (1 if i < extra else 0)
+        ranges.append((start, end))
+        start = end
+    return ranges
+
+
+def run_shard(shard_id, first, end, options, work_dir, progress=None):
+    # se ejecuta en un proceso hijo: navegador, sesión HTTP y checkpoint propios
+    def on_page(page_idx, n_results):
+        if progress is not None:
+            progress.put((shard_id, page_idx + 1 - first, end - first, n_results))
+
+    t0 = time.perf_counter()
+    metrics_dir = Path(work_dir) / f"metrics_{shard_id:03d}"
+    try:
+        docs = smr.scrape_music_site(
+            max_pages=end, first_page=first, on_page=on_page,
+            checkpoint_dir=str(Path(work_dir) / f"checkpoint_{shard_id}"), **options,
+        )
+    finally:
+        # cada proceso tiene su propio registro METRICS
+        smr.METRICS.dump(metrics_dir)
+    out = Path(work_dir) / f"shard_{shard_id:03d}.jsonl"
+    write_docs(docs, out)
+    elapsed = time.perf_counter() - t0
+    return {
+        "shard": shard_id,
+        "pages": f"{first + 1}-{end}",
+        "docs": len(docs),
+        "elapsed_s": round(elapsed, 1),
+        "docs_per_s": round(len(docs) / elapsed, 2) if elapsed else 0.0,
+        "file": str(out),
+        "metrics": str(metrics_dir),
+    }
+
+
+def _print_progress(queue):
+    while True:
+        msg = queue.get()
+        if msg is None:
+            return
+        shard_id, done, total, n_results = msg
+        print(f"📈 Shard {shard_id}: página {done}/{total}, {n_results} documentos")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Crawl de Discogs repartido en varios procesos")
+    parser.add_argument("--pages", type=int, default=TOTAL_PAGES, help="páginas de búsqueda en total")
+    parser.add_argument("--shards", type=int, default=SHARDS, help="procesos (uno por navegador)")
+    parser.add_argument("--work-dir", default=WORK_DIR, help="salidas y checkpoints de cada shard")
+    parser.add_argument("--output", default=smr.OUTPUT_FILE, help="corpus final")
+    parser.add_argument("--concurrency", type=int, default=smr.CONCURRENCY,
+                        help="páginas de detalle en paralelo dentro de cada shard")
+    parser.add_argument("--enrich-mode", choices=["detail", "api"], default=smr.ENRICH_MODE)
+    parser.add_argument("--search-limit", type=int, default=smr.SEARCH_LIMIT)
+    parser.add_argument("--resume", action="store_true", help="reanudar cada shard desde su checkpoint")
+    parser.add_argument("--incremental", action="store_true",
+                        help="fusionar con el corpus de --output en vez de sobrescribirlo")
+    args = parser.parse_args(argv)
+
+    Path(args.work_dir).mkdir(parents=True, exist_ok=True)
+    ranges = shard_ranges(args.pages, args.shards)
+    # las páginas de cada shard son direccionables por ?page=N: paginación paralela.
+    # La cuota por host (RATE_LIMITS) es de la cuenta/IP, no del proceso: se reparte
+    options = {
+        "concurrency": args.concurrency, "enrich_mode": args.enrich_mode,
+        "search_limit": args.search_limit, "pagination": "parallel", "resume": args.resume,
+        "rate_share": 1.0 / len(ranges),
+    }
+    existing = []
+    if args.incremental:
+        existing = smr.load_corpus(args.output)
+        options["known"] = smr.corpus_index(existing)
+        print(f"📚 Corpus existente: {len(existing)} documentos ({len(options['known'])} releases conocidos).")
+    print(f"🚀 {args.pages} páginas en {len(ranges)} shards: {ranges}")
+
+    t0 = time.perf_counter()
+    summaries = []
+    ctx = multiprocessing.get_context("spawn")
+    with multiprocessing.Manager() as manager:
+        progress = manager.Queue()
+        printer = threading.Thread(target=_print_progress, args=(progress,), daemon=True)
+        printer.start()
+        with ProcessPoolExecutor(max_workers=len(ranges), mp_context=ctx) as ex:
+            futures = {
+                ex.submit(run_shard, i, first, end, options, args.work_dir, progress): i
+                for i, (first, end) in enumerate(ranges)
+            }
+            for fut in as_completed(futures):
+                shard_id = futures[fut]
+                try:
+                    summary = fut.result()
+                except Exception as e:
+                    print(f"❌ Shard {shard_id} falló: {e}")
+                    summaries.append({"shard": shard_id, "error": str(e)})
+                    continue
+                print(f"✅ Shard {shard_id} ({summary['pages']}): {summary['docs']} docs "
+                      f"en {summary['elapsed_s']} s ({summary['docs_per_s']} docs/s)")
+                summaries.append(summary)
+        progress.put(None)
+        printer.join()
+
+    # fusión en orden de shard (= orden de páginas) y deduplicación por entidad
+    docs = []
+    for s in sorted(summaries, key=lambda s: s["shard"]):
+        if "file" in s:
+            docs.extend(iter_docs(s["file"]))
+    docs = smr.dedupe_docs(docs)
+    wall = time.perf_counter() - t0
+
+    print("\n📊 Resumen por shard:")
+    for s in sorted(summaries, key=lambda s: s["shard"]):
+        print(f"   {s}")
+    print(f"📊 Total: {len(docs)} documentos únicos en {wall:.1f} s "
+          f"({len(docs) / wall if wall else 0:.2f} docs/s agregados)")
+    if not docs:
+        print("⚠️ Ningún shard produjo documentos.")
+        return
+
+    if args.incremental:
+        reused = smr.reuse_embeddings(docs, options["known"])
+        pending = [d for d in docs if "embedding" not in d]
+        print(f"♻️ Embeddings reutilizados: {reused}; por calcular: {len(pending)}")
+        if pending:
+            smr.embed_music_data(pending)
+        corpus = smr.merge_into_corpus(existing, docs)
+    else:
+        corpus = smr.embed_music_data(docs)
+    smr.save_json(corpus, args.output)
+    for i in range(len(ranges)):
+        smr.CrawlCheckpoint(str(Path(args.work_dir) / f"checkpoint_{i}")).clear()
+    print("🎶 Crawl por shards completado.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,210 @@
+#!/usr/bin/env python3
+# stream_pipeline.py — pipeline en flujo scrape -> embeddings -> escritura
+# Los registros del scraper entran en una cola acotada; un hilo los agrupa en lotes
+# para el encoder y otro los escribe en disco según llegan. Las colas acotadas frenan
+# al scraper si el encoder o el disco se quedan atrás (backpressure).
+
+import asyncio
+import queue
+import threading
+import time
+from collections import deque
+
+from sentence_transformers import SentenceTransformer
+
+from discogs_extract import entity_key
+from corpus_io import open_writer
+from crawl_metrics import METRICS, peak_rss_mb
+
+# ------------------ CONFIG ------------------
+EMBED_BATCH = 64               # documentos por llamada al encoder
+EMBED_FLUSH_S = 1.0            # si el scraper va lento, embeber un lote parcial tras esta espera
+QUEUE_SIZE = 256               # capacidad de cada cola entre etapas
+LATENCY_SAMPLES = 100_000      # latencias guardadas para p50/p99 (las más recientes)
+# --------------------------------------------
+
+_DONE = object()
+
+
+def _percentile(values, q):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+
+class StreamPipeline:
+    # uso desde el scraper (asyncio):
+    #   pipe = StreamPipeline(output, model_name).start()
+    #   await pipe.submit(record)      # por cada registro terminado
+    #   pipe.close()                   # al final: vacía las colas y cierra la salida
+    # Con `known` (corpus existente, modo incremental) se reutilizan los embeddings de
+    # textos sin cambios y `existing` se vuelca al final sin los documentos sustituidos.
+    def __init__(self, output, model_name, batch_size=EMBED_BATCH, queue_size=QUEUE_SIZE,
+                 flush_s=EMBED_FLUSH_S, known=None, existing=None, writer=None):
+        self.output = output
+        self.model_name = model_name
+        self.batch_size = max(1, batch_size)
+        self.flush_s = flush_s
+        self.known = known or {}
+        self.existing = existing or []
+        # .jsonl / .jsonl.gz: una línea por documento, volcado a disco por lote
+        self.writer = writer or open_writer(output, flush_every=self.batch_size)
+        self.in_q = queue.Queue(maxsize=queue_size)
+        self.out_q = queue.Queue(maxsize=queue_size)
+        self.written_keys = set()
+        self.latencies = deque(maxlen=LATENCY_SAMPLES)
+        self.errors = []
+        self.stats = {"submitted": 0, "embedded": 0, "reused": 0, "batches": 0,
+                      "written": 0, "embed_s": 0.0, "write_s": 0.0}
+        self._threads = []
+        self._t0 = None
+        self._stopped = False
+
+    def start(self):
+        self._t0 = time.perf_counter()
+        self._threads = [
+            threading.Thread(target=self._guard, args=(self._embed_loop, self.in_q), name="embed", daemon=True),
+            threading.Thread(target=self._guard, args=(self._write_loop, self.out_q), name="write", daemon=True),
+        ]
+        for t in self._threads:
+            t.start()
+        return self
+
+    def _guard(self, loop, source):
+        # si una etapa falla se descarta lo que le llegue para no bloquear a la anterior
+        try:
+            loop()
+        except Exception as e:
+            self.errors.append(e)
+            if source is self.in_q:
+                # el productor deja de enviar (submit lanza la excepción)
+                while True:
+                    try:
+                        if self.in_q.get_nowait() is _DONE:
+                            break
+                    except queue.Empty:
+                        break
+                self.out_q.put(_DONE)
+            else:
+                while source.get() is not _DONE:
+                    pass
+
+    async def submit(self, record):
+        # put bloqueante en un hilo: si la cola está llena el scraper espera sin
+        # bloquear el event loop (el resto de tareas siguen avanzando)
+        if self.errors:
+            raise RuntimeError(f"pipeline detenido: {self.errors[0]}")
+        await asyncio.to_thread(self.in_q.put, (record, time.perf_counter()))
+        self.stats["submitted"] += 1
+
+    # ---------- ETAPAS ----------
+    def _embed_loop(self):
+        print(f"🧠 Cargando modelo de embeddings {self.model_name} (en paralelo al scraping)...")
+        model = SentenceTransformer(self.model_name)
+        done = False
+        while not done:
+            batch = []
+            deadline = None
+            while len(batch) < self.batch_size:
+                timeout = None if deadline is None else max(0.0, deadline - time.perf_counter())
+                try:
+                    item = self.in_q.get(timeout=timeout)
+                except queue.Empty:
+                    break
+                if item is _DONE:
+                    done = True
+                    break
+                batch.append(item)
+                if deadline is None:
+                    deadline = time.perf_counter() + self.flush_s
+            if batch:
+                self._embed_batch(model, batch)
+        self.out_q.put(_DONE)
+
+    def _embed_batch(self, model, batch):
+        pending = []
+        for doc, _ in batch:
+            old = self.known.get(entity_key(doc.get("url")))
+            if old and old.get("embedding") and old.get("text") == doc.get("text"):
+                doc["embedding"] = old["embedding"]
+                self.stats["reused"] += 1
+            else:
+                pending.append(doc)
+        if pending:
+            t0 = time.perf_counter()
+            vectors = model.encode([d.get("text", "") for d in pending],
+                                   batch_size=self.batch_size, show_progress_bar=False,
+                                   convert_to_numpy=True)
+            for d, v in zip(pending, vectors):
+                d["embedding"] = v.tolist()
+            dt = time.perf_counter() - t0
+            self.stats["embed_s"] += dt
+            METRICS.observe("embed", dt, len(pending))
+            self.stats["embedded"] += len(pending)
+        self.stats["batches"] += 1
+        for item in batch:
+            self.out_q.put(item)
+
+    def _write_loop(self):
+        while True:
+            item = self.out_q.get()
+            if item is _DONE:
+                return
+            doc, submitted_at = item
+            t0 = time.perf_counter()
+            self.writer.write(doc)
+            key = entity_key(doc.get("url"))
+            if key:
+                self.written_keys.add(key)
+            self.stats["written"] += 1
+            if self.out_q.empty():
+                self.writer.flush()
+            now = time.perf_counter()
+            self.stats["write_s"] += now - t0
+            METRICS.observe("save", now - t0)
+            self.latencies.append(now - submitted_at)
+
+    # ---------- CIERRE ----------
+    def _stop(self):
+        # una sola vez: close() y abort() pueden llegar los dos (p.ej. abort en un finally)
+        if self._stopped:
+            return False
+        self._stopped = True
+        self.in_q.put(_DONE)
+        for t in self._threads:
+            t.join()
+        return True
+
+    def close(self):
+        if not self._stop():
+            return self.summary()
+        if self.errors:
+            # sin salida a medias: se conserva el archivo anterior
+            self.writer.abort()
+            raise RuntimeError(f"pipeline detenido: {self.errors[0]}")
+        # modo incremental: el resto del corpus existente, sin lo ya reescrito
+        kept = 0
+        for d in self.existing:
+            if entity_key(d.get("url")) not in self.written_keys:
+                self.writer.write(d)
+                kept += 1
+        self.writer.close()
+        self.stats["kept_from_corpus"] = kept
+        print(f"💾 Datos guardados en {self.output}")
+        return self.summary()
+
+    def abort(self):
+        if self._stop():
+            self.writer.abort()
+
+    def summary(self):
+        out = dict(self.stats)
+        out["embed_s"] = round(out["embed_s"], 2)
+        out["write_s"] = round(out["write_s"], 2)
+        if self._t0 is not None:
+            out["wall_s"] = round(time.perf_counter() - self._t0, 1)
+        out["latency_p50_s"] = round(_percentile(self.latencies, 0.5), 3)
+        out["latency_p99_s"] = round(_percentile(self.latencies, 0.99), 3)
+        out["peak_rss_mb"] = peak_rss_mb()
+        return out
@@ -0,0 +1,51 @@
+# tests/test_crawl_checkpoint.py — reanudación del crawl desde results.jsonl / state.json
+import json
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from crawl_checkpoint import CrawlCheckpoint  # noqa: E402
+
+
+def _crawl(directory, ids):
+    ckpt = CrawlCheckpoint(directory, every=1)
+    ckpt.start()
+    ckpt.set_position("https://www.discogs.com/search?page=2", 1)
+    for i in ids:
+        ckpt.add({"url": f"https://www.discogs.com/release/{i}-x", "title": f"t{i}"})
+    ckpt.close()
+
+
+def test_resume_skips_completed_and_tolerates_truncated_line(tmp_path):
+    _crawl(tmp_path, [1, 2])
+    # corte a mitad de escribir el tercer registro
+    with (tmp_path / "results.jsonl").open("a", encoding="utf-8") as f:
+        f.write('{"url": "https://www.discogs.com/release/3-x", "tit')
+
+    ckpt = CrawlCheckpoint(tmp_path)
+    state, results = ckpt.start(resume=True)
+    assert state["page_idx"] == 1
+    assert [r["title"] for r in results] == ["t1", "t2"]
+    assert ckpt.is_done("https://www.discogs.com/release/2-otro-slug")
+    assert not ckpt.is_done("https://www.discogs.com/release/3-x")
+    ckpt.add({"url": "https://www.discogs.com/release/3-x", "title": "t3"})
+    ckpt.close()
+    # la línea truncada se descartó al reanudar: el fichero vuelve a ser JSONL válido
+    lines = (tmp_path / "results.jsonl").read_text(encoding="utf-8").splitlines()
+    assert [json.loads(line)["title"] for line in lines] == ["t1", "t2", "t3"]
+
+
+def test_start_without_resume_keeps_previous_checkpoint(tmp_path):
+    _crawl(tmp_path, [1, 2])
+    ckpt = CrawlCheckpoint(tmp_path)
+    assert ckpt.start() == ({"completed": 0, "updated_at": ckpt.state["updated_at"]}, [])
+    ckpt.close()
+    backups = sorted(p.name for p in tmp_path.glob("results.*.jsonl"))
+    assert len(backups) == 1
+    lines = (tmp_path / backups[0]).read_text(encoding="utf-8").splitlines()
+    assert len(lines) == 2
+    assert list(tmp_path.glob("state.*.json"))
+    # un segundo arranque inmediato no pisa la copia anterior
+    _crawl(tmp_path, [4])
+    assert len(list(tmp_path.glob("results.*.jsonl"))) == 2
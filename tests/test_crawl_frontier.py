@@ -0,0 +1,78 @@
+# tests/test_crawl_frontier.py — leases, reintentos y dead-letter de la frontera compartida
+import asyncio
+import sys
+import time
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from crawl_frontier import CrawlFrontier, frontier as frontier_table  # noqa: E402
+
+
+@pytest.fixture
+def frontier(tmp_path):
+    f = CrawlFrontier(f"sqlite:///{tmp_path / 'frontier.sqlite'}", lease_s=60, max_attempts=2,
+                      retry_delay_s=0)
+    f.add_many([{"kind": "release", "key": "release:1", "url": "https://www.discogs.com/release/1-x",
+                 "payload": {"page_idx": 0, "idx": 0, "title": "t", "artist": "a"}}])
+    yield f
+    f.close()
+
+
+def _state(f):
+    with f.engine.connect() as conn:
+        row = conn.execute(frontier_table.select()).fetchone()
+    return row.state, row.attempts
+
+
+def _expire_leases(f):
+    with f.engine.begin() as conn:
+        conn.execute(frontier_table.update().values(lease_until=time.time() - 1))
+
+
+def test_expired_lease_at_max_attempts_is_dead(frontier):
+    # el worker muere dos veces con el elemento reclamado: el segundo lease caducado
+    # agota MAX_ATTEMPTS y pasa a dead-letter en el siguiente reclamo
+    assert frontier.claim("release", "w1")
+    _expire_leases(frontier)
+    [it] = frontier.claim("release", "w2")
+    assert it["attempts"] == 2 and frontier.summary()["lost_leases"] == 1
+    _expire_leases(frontier)
+    assert frontier.claim("release", "w3") == []
+    assert _state(frontier) == ("dead", 2)
+    assert frontier.dead_letters()[0]["error"] == "lease caducado"
+
+
+def test_failed_detail_is_retried_then_dead(frontier):
+    pytest.importorskip("playwright")
+    pytest.importorskip("sentence_transformers")
+    import scrape_music_rag as smr
+    import frontier_worker
+
+    class BrokenPool:
+        def page(self):
+            raise RuntimeError("Timeout 30000ms exceeded")
+
+    class EmptyApi:
+        async def fetch_meta(self, path):
+            return None
+
+    rt = smr.CrawlRuntime(BrokenPool(), None, None, fast_path=None, api=EmptyApi())
+    stats = {"done": 0, "failed": 0}
+
+    def attempt(owner):
+        claimed = frontier.claim("release", owner)
+        cards = [(it["payload"]["idx"], it["payload"]["title"], it["payload"]["artist"], it["url"])
+                 for it in claimed]
+        records = asyncio.run(smr.enrich_card(rt, 0, cards[0], allow_empty=False))
+        frontier_worker.settle(frontier, owner, claimed, [records], stats)
+
+    # detalle y API sin nada: no se guarda un registro vacío, se reintenta
+    attempt("w1")
+    assert _state(frontier) == ("pending", 1)
+    attempt("w2")
+    assert _state(frontier) == ("dead", 2)
+    assert stats == {"done": 0, "failed": 2}
+    assert not list(frontier.iter_results("release"))
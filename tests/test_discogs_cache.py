@@ -0,0 +1,64 @@
+# tests/test_discogs_cache.py — caché HTTP en SQLite: revalidación (304) y expulsión LRU
+import asyncio
+import itertools
+import os
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import discogs_cache  # noqa: E402
+from discogs_cache import HttpCache  # noqa: E402
+from discogs_http import DiscogsSession, DiscogsApiClient, RetryPolicy  # noqa: E402
+from fixture_server import FixtureServer, FIRST_RELEASE_ID  # noqa: E402
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    # reloj que avanza un segundo por consulta: órdenes LRU sin empates
+    ticks = itertools.count(1_000_000)
+    monkeypatch.setattr(discogs_cache.time, "time", lambda: float(next(ticks)))
+
+
+def test_304_refreshes_entry_and_returns_cached_body(tmp_path):
+    cache = HttpCache(tmp_path / "cache.sqlite")
+    path = f"releases/{FIRST_RELEASE_ID}"
+
+    async def fetch(server):
+        session = DiscogsSession(max_connections=2, retry=RetryPolicy())
+        api = DiscogsApiClient(session, base_url=server.url, cache=cache)
+        try:
+            first = await api.get_json(path)
+            # caducada a mano: la siguiente petición se revalida con If-None-Match
+            cache.db.execute("UPDATE responses SET expires_at = 0")
+            cache.db.commit()
+            second = await api.get_json(path)
+            return first, second
+        finally:
+            await session.aclose()
+
+    with FixtureServer(port=0, latency_ms=0, jitter_ms=0, rate_429=0.0, n_releases=5) as server:
+        first, second = asyncio.run(fetch(server))
+        assert server.summary()["not_modified"] == 1
+    assert second == first
+    assert cache.stats["stored"] == 1 and cache.stats["revalidated"] == 1
+    # el 304 renueva la frescura (max-age del servidor): ya no hace falta revalidar
+    assert cache.lookup(f"{server.url}/{path}")[3]
+    cache.close()
+
+
+def test_eviction_drops_least_recently_used(tmp_path, clock):
+    body = {u: os.urandom(1000) for u in ("a", "b", "c")}
+    # caben dos entradas; la tercera obliga a expulsar hasta el 90% del máximo
+    cache = HttpCache(tmp_path / "cache.sqlite", max_bytes=2500)
+    cache.store("a", body["a"], {})
+    cache.store("b", body["b"], {})
+    assert cache.lookup("a")[0] == body["a"]      # "a" pasa a ser la más reciente
+    cache.store("c", body["c"], {})
+    assert cache.stats["evicted"] == 1
+    assert cache.lookup("b") is None
+    assert cache.lookup("a")[0] == body["a"] and cache.lookup("c")[0] == body["c"]
+    assert cache.total_bytes <= 2500
+    cache.close()
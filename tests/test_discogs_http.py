@@ -0,0 +1,140 @@
+# tests/test_discogs_http.py — cliente de la API y ruta HTTP contra fixture_server.py
+import asyncio
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from crawl_archive import CrawlArchive  # noqa: E402
+from discogs_cache import HttpCache  # noqa: E402
+from discogs_extract import PROFILE_KEYS, META_KEYS, merge_api_meta  # noqa: E402
+from discogs_http import (DiscogsSession, DiscogsApiClient, HostLimiter, ReleaseFastPath,  # noqa: E402
+                         RetryPolicy)
+from fixture_server import FixtureServer, FIRST_RELEASE_ID, synthetic_release  # noqa: E402
+
+
+@pytest.fixture(scope="module")
+def server():
+    with FixtureServer(port=0, latency_ms=0, jitter_ms=0, rate_429=0.0, n_releases=20) as srv:
+        yield srv
+
+
+def _run(coro_fn):
+    async def wrapper():
+        session = DiscogsSession(max_connections=4, retry=RetryPolicy())
+        try:
+            return await coro_fn(session)
+        finally:
+            await session.aclose()
+    return asyncio.run(wrapper())
+
+
+def test_api_meta_keeps_profile_keys(server):
+    release = synthetic_release(FIRST_RELEASE_ID, server.url)
+
+    async def fetch(session):
+        api = DiscogsApiClient(session, base_url=server.url)
+        return await api.fetch_meta(f"releases/{release['id']}"), api.summary()
+
+    api_meta, stats = _run(fetch)
+    assert stats["ok"] == 1 and stats["errors"] == 0
+    assert api_meta["genre"] == ", ".join(release["genres"])
+
+    # con título y artista de la tarjeta, la API no añade claves propias a metadata
+    meta = {}
+    title, artist = merge_api_meta(meta, api_meta, "Card title", "Card artist")
+    assert (title, artist) == ("Card title", "Card artist")
+    assert set(meta) <= set(META_KEYS)
+    assert set(PROFILE_KEYS) - {"series"} <= set(meta)
+
+    # sin ellos, se rellenan desde la API
+    title, artist = merge_api_meta({}, api_meta, "", "")
+    assert title == release["title"]
+    assert artist == release["artists"][0]["name"]
+
+
+def test_api_missing_release_is_none(server):
+    async def fetch(session):
+        api = DiscogsApiClient(session, base_url=server.url)
+        return await api.fetch_meta("releases/not-a-release"), api.summary()
+
+    api_meta, stats = _run(fetch)
+    assert api_meta is None
+    assert stats["errors"] == 1
+
+
+def test_fast_path_parses_release_html(server):
+    release = synthetic_release(FIRST_RELEASE_ID + 1, server.url)
+
+    async def fetch(session):
+        fast = ReleaseFastPath(session, "pytest")
+        meta = await fast.fetch(f"{server.url}/release/{release['id']}", release["title"], "x")
+        return meta, fast.summary()
+
+    meta, stats = _run(fetch)
+    assert stats["hits"] == 1
+    assert meta["genre"] == ", ".join(release["genres"])
+    assert meta["format"].startswith(release["formats"][0]["name"])
+    assert set(meta) <= set(META_KEYS)
+
+
+def test_capture_includes_cache_hits(server, tmp_path):
+    # con --capture, las respuestas servidas por la caché también quedan en el archivo
+    archive = CrawlArchive(tmp_path / "archive")
+    cache = HttpCache(tmp_path / "cache.sqlite")
+
+    async def fetch():
+        session = DiscogsSession(max_connections=4, retry=RetryPolicy(), archive=archive)
+        api = DiscogsApiClient(session, base_url=server.url, cache=cache)
+        try:
+            for _ in range(3):
+                await api.fetch_meta(f"releases/{FIRST_RELEASE_ID}")
+        finally:
+            await session.aclose()
+
+    asyncio.run(fetch())
+    cache.close()
+    archive.close()
+    records = list(archive.iter_records())
+    assert len(records) == 3
+    assert {r["kind"] for r in records} == {"api"} and {r["status"] for r in records} == {200}
+    assert [bool(r.get("from_cache")) for r in records] == [False, True, True]
+    assert len({r["digest"] for r in records}) == 1
+
+
+def test_limiter_backs_off_once_per_burst():
+    async def burst():
+        host = HostLimiter("api.example", 6000)
+        host.limit = 8.0
+        for _ in range(8):
+            await host.acquire()
+        # 8 respuestas de la misma ventana con la cuota agotada: una sola reducción
+        for _ in range(8):
+            host.observe(429, {"retry-after": "0", "x-discogs-ratelimit-remaining": "0"})
+            await host.release()
+        assert host.limit == 4.0 and host.stats["decreases"] == 1
+        # todo lo que estaba en vuelo ya respondió: la siguiente señal vuelve a reducir
+        await host.acquire()
+        host.observe(429, {"retry-after": "0"})
+        await host.release()
+        assert host.limit == 2.0
+        # con la cuota casi agotada no se aumenta
+        host.observe(200, {"x-discogs-ratelimit-remaining": "1"})
+        assert host.stats["increases"] == 0
+
+    asyncio.run(burst())
+
+
+def test_limiter_ignores_zero_quota():
+    async def take():
+        host = HostLimiter("api.example", 60, share=0.0)
+        host.observe(200, {"x-discogs-ratelimit": "0"})
+        assert host.per_minute == 60 and host.rate > 0
+        # sin tokens espera al ritmo mínimo en lugar de dividir por cero
+        host.tokens = 0.0
+        with pytest.raises(asyncio.TimeoutError):
+            await asyncio.wait_for(host.take_token(), timeout=0.1)
+
+    asyncio.run(take())